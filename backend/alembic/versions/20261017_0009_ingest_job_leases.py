@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261017_0009"
+down_revision = "20260312_0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("ingest_jobs", sa.Column("lease_owner", sa.Text(), nullable=True))
+    op.add_column("ingest_jobs", sa.Column("lease_expires_at", sa.DateTime(timezone=True), nullable=True))
+    op.add_column("ingest_jobs", sa.Column("heartbeat_at", sa.DateTime(timezone=True), nullable=True))
+    op.add_column(
+        "ingest_jobs",
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.create_index("ix_ingest_jobs_status_created", "ingest_jobs", ["status", "created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ingest_jobs_status_created", table_name="ingest_jobs")
+    op.drop_column("ingest_jobs", "attempts")
+    op.drop_column("ingest_jobs", "heartbeat_at")
+    op.drop_column("ingest_jobs", "lease_expires_at")
+    op.drop_column("ingest_jobs", "lease_owner")
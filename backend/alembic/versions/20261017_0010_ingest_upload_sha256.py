@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261017_0010"
+down_revision = "20261017_0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("ingest_jobs", sa.Column("upload_sha256", sa.Text(), nullable=True))
+    op.execute(
+        """
+        UPDATE ingest_jobs
+        SET upload_sha256 = stats->>'upload_sha256'
+        WHERE stats ? 'upload_sha256'
+        """
+    )
+    op.create_index("ix_ingest_jobs_project_sha256", "ingest_jobs", ["project_id", "upload_sha256"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ingest_jobs_project_sha256", table_name="ingest_jobs")
+    op.drop_column("ingest_jobs", "upload_sha256")
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261017_0011"
+down_revision = "20261017_0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE ingest_status_enum ADD VALUE IF NOT EXISTS 'cancelled'")
+
+    op.add_column(
+        "ingest_jobs",
+        sa.Column("priority", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column("ingest_jobs", sa.Column("upload_size", sa.BigInteger(), nullable=True))
+    op.add_column("ingest_jobs", sa.Column("cancel_requested_at", sa.DateTime(timezone=True), nullable=True))
+    op.execute(
+        """
+        UPDATE ingest_jobs
+        SET upload_size = (stats->>'upload_size')::bigint
+        WHERE jsonb_typeof(stats->'upload_size') = 'number'
+        """
+    )
+    op.drop_index("ix_ingest_jobs_status_created", table_name="ingest_jobs")
+    op.create_index(
+        "ix_ingest_jobs_claim_order",
+        "ingest_jobs",
+        ["status", sa.text("priority DESC"), "upload_size", "created_at"],
+    )
+
+
+def downgrade() -> None:
+    # Postgres cannot drop an enum value; cancelled jobs are folded into failed.
+    op.execute("UPDATE ingest_jobs SET status = 'failed', error = 'cancelled' WHERE status = 'cancelled'")
+    op.drop_index("ix_ingest_jobs_claim_order", table_name="ingest_jobs")
+    op.create_index("ix_ingest_jobs_status_created", "ingest_jobs", ["status", "created_at"])
+    op.drop_column("ingest_jobs", "cancel_requested_at")
+    op.drop_column("ingest_jobs", "upload_size")
+    op.drop_column("ingest_jobs", "priority")
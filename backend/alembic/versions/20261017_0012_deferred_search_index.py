@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261017_0012"
+down_revision = "20261017_0011"
+branch_labels = None
+depends_on = None
+
+
+FINDINGS_VECTOR = """
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(description, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(remediation, '')), 'C')
+"""
+INSTANCES_VECTOR = "to_tsvector('english', coalesce(evidence_snippet, ''))"
+
+
+def upgrade() -> None:
+    for table in ("findings", "instances"):
+        op.add_column(
+            table,
+            sa.Column("search_dirty", sa.Boolean(), nullable=False, server_default=sa.text("false")),
+        )
+        op.execute(f"CREATE INDEX ix_{table}_search_dirty ON {table} (id) WHERE search_dirty")
+
+    # Triggers no longer run to_tsvector; they flag rows whose indexed text changed and the
+    # runner's background indexer (IngestRunner._index -> crud.reindex_search_vectors)
+    # rebuilds the vectors in batches.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_findings_search_vector()
+        RETURNS trigger AS $$
+        BEGIN
+          IF TG_OP = 'UPDATE' AND OLD.search_dirty AND NOT NEW.search_dirty THEN
+            -- the indexer clearing the flag, not an edit
+            RETURN NEW;
+          END IF;
+          IF TG_OP = 'INSERT'
+             OR NEW.title IS DISTINCT FROM OLD.title
+             OR NEW.description IS DISTINCT FROM OLD.description
+             OR NEW.remediation IS DISTINCT FROM OLD.remediation THEN
+            NEW.search_dirty := true;
+          END IF;
+          NEW.updated_at := now();
+          RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_instances_search_vector()
+        RETURNS trigger AS $$
+        BEGIN
+          IF TG_OP = 'INSERT' OR NEW.evidence_snippet IS DISTINCT FROM OLD.evidence_snippet THEN
+            NEW.search_dirty := true;
+          END IF;
+          RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    # last_seen bumps and status edits no longer fire the instances trigger at all.
+    op.execute("DROP TRIGGER IF EXISTS trg_instances_search ON instances")
+    op.execute(
+        "CREATE TRIGGER trg_instances_search BEFORE INSERT OR UPDATE OF evidence_snippet ON instances "
+        "FOR EACH ROW EXECUTE FUNCTION update_instances_search_vector();"
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        f"UPDATE findings SET search_vector = {FINDINGS_VECTOR}, search_dirty = false WHERE search_dirty"
+    )
+    op.execute(f"UPDATE instances SET search_vector = {INSTANCES_VECTOR} WHERE search_dirty")
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION update_findings_search_vector()
+        RETURNS trigger AS $$
+        BEGIN
+          NEW.search_vector := {FINDINGS_VECTOR.replace("coalesce(", "coalesce(NEW.")};
+          NEW.updated_at := now();
+          RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_instances_search_vector()
+        RETURNS trigger AS $$
+        BEGIN
+          NEW.search_vector := to_tsvector('english', coalesce(NEW.evidence_snippet, ''));
+          RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute("DROP TRIGGER IF EXISTS trg_instances_search ON instances")
+    op.execute(
+        "CREATE TRIGGER trg_instances_search BEFORE INSERT OR UPDATE ON instances "
+        "FOR EACH ROW EXECUTE FUNCTION update_instances_search_vector();"
+    )
+    for table in ("findings", "instances"):
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_search_dirty")
+        op.drop_column(table, "search_dirty")
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "20261017_0013"
+down_revision = "20261017_0012"
+branch_labels = None
+depends_on = None
+
+
+EVIDENCE_SHA256 = "encode(sha256(convert_to(evidence_snippet, 'UTF8')), 'hex')"
+
+
+def upgrade() -> None:
+    op.create_table(
+        "evidence_blobs",
+        sa.Column("sha256", sa.Text(), primary_key=True),
+        sa.Column("body", sa.Text(), nullable=False),
+        sa.Column("search_vector", postgresql.TSVECTOR(), nullable=False, server_default=sa.text("''::tsvector")),
+        sa.Column("search_dirty", sa.Boolean(), nullable=False, server_default=sa.text("true")),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()")),
+    )
+    op.create_index("ix_evidence_blobs_search_vector", "evidence_blobs", ["search_vector"], postgresql_using="gin")
+    op.execute("CREATE INDEX ix_evidence_blobs_search_dirty ON evidence_blobs (sha256) WHERE search_dirty")
+
+    # Every blob starts dirty; the background indexer builds the vectors once per distinct text.
+    op.execute(
+        f"""
+        INSERT INTO evidence_blobs (sha256, body)
+        SELECT DISTINCT ON (1) {EVIDENCE_SHA256}, evidence_snippet
+        FROM instances
+        WHERE evidence_snippet IS NOT NULL
+        ON CONFLICT (sha256) DO NOTHING
+        """
+    )
+    op.add_column(
+        "instances",
+        sa.Column("evidence_sha256", sa.Text(), sa.ForeignKey("evidence_blobs.sha256"), nullable=True),
+    )
+    op.execute(f"UPDATE instances SET evidence_sha256 = {EVIDENCE_SHA256} WHERE evidence_snippet IS NOT NULL")
+
+    op.execute("DROP TRIGGER IF EXISTS trg_instances_search ON instances")
+    op.execute("DROP FUNCTION IF EXISTS update_instances_search_vector()")
+    op.execute("DROP INDEX IF EXISTS ix_instances_search_dirty")
+    op.drop_index("ix_instances_search_vector", table_name="instances")
+    op.drop_column("instances", "search_dirty")
+    op.drop_column("instances", "search_vector")
+    op.drop_column("instances", "evidence_snippet")
+
+
+def downgrade() -> None:
+    op.add_column("instances", sa.Column("evidence_snippet", sa.Text(), nullable=True))
+    op.add_column(
+        "instances",
+        sa.Column("search_vector", postgresql.TSVECTOR(), nullable=False, server_default=sa.text("''::tsvector")),
+    )
+    op.add_column(
+        "instances",
+        sa.Column("search_dirty", sa.Boolean(), nullable=False, server_default=sa.text("false")),
+    )
+    op.execute(
+        """
+        UPDATE instances AS i
+        SET evidence_snippet = b.body,
+            search_vector = to_tsvector('english', b.body)
+        FROM evidence_blobs AS b
+        WHERE b.sha256 = i.evidence_sha256
+        """
+    )
+    op.create_index("ix_instances_search_vector", "instances", ["search_vector"], postgresql_using="gin")
+    op.execute("CREATE INDEX ix_instances_search_dirty ON instances (id) WHERE search_dirty")
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_instances_search_vector()
+        RETURNS trigger AS $$
+        BEGIN
+          IF TG_OP = 'INSERT' OR NEW.evidence_snippet IS DISTINCT FROM OLD.evidence_snippet THEN
+            NEW.search_dirty := true;
+          END IF;
+          RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER trg_instances_search BEFORE INSERT OR UPDATE OF evidence_snippet ON instances "
+        "FOR EACH ROW EXECUTE FUNCTION update_instances_search_vector();"
+    )
+    op.drop_column("instances", "evidence_sha256")
+    op.drop_table("evidence_blobs")
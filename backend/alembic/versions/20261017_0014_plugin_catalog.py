@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "20261017_0014"
+down_revision = "20261017_0013"
+branch_labels = None
+depends_on = None
+
+
+def _findings_trigger(description: str, remediation: str) -> str:
+    return f"""
+        CREATE OR REPLACE FUNCTION update_findings_search_vector()
+        RETURNS trigger AS $$
+        BEGIN
+          IF TG_OP = 'UPDATE' AND OLD.search_dirty AND NOT NEW.search_dirty THEN
+            -- the indexer clearing the flag, not an edit
+            RETURN NEW;
+          END IF;
+          IF TG_OP = 'INSERT'
+             OR NEW.title IS DISTINCT FROM OLD.title
+             OR NEW.{description} IS DISTINCT FROM OLD.{description}
+             OR NEW.{remediation} IS DISTINCT FROM OLD.{remediation} THEN
+            NEW.search_dirty := true;
+          END IF;
+          NEW.updated_at := now();
+          RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+
+
+def upgrade() -> None:
+    op.create_table(
+        "plugin_catalog",
+        sa.Column("scanner", sa.Text(), primary_key=True),
+        sa.Column("scanner_id", sa.Text(), primary_key=True),
+        sa.Column("title", sa.Text(), nullable=False),
+        sa.Column("severity", postgresql.ENUM(name="severity_enum", create_type=False), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("remediation", sa.Text(), nullable=True),
+        sa.Column("references", postgresql.JSONB(), nullable=False, server_default=sa.text("'[]'::jsonb")),
+        sa.Column("search_vector", postgresql.TSVECTOR(), nullable=False, server_default=sa.text("''::tsvector")),
+        sa.Column("search_dirty", sa.Boolean(), nullable=False, server_default=sa.text("true")),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()")),
+    )
+    op.create_index("ix_plugin_catalog_search_vector", "plugin_catalog", ["search_vector"], postgresql_using="gin")
+    op.execute(
+        "CREATE INDEX ix_plugin_catalog_search_dirty ON plugin_catalog (scanner, scanner_id) WHERE search_dirty"
+    )
+    # The copy of each plugin's text from the most recent scan becomes the shared one.
+    # updated_at is no guide: any edit, even toggling `tested`, bumps it.
+    op.execute(
+        """
+        INSERT INTO plugin_catalog (scanner, scanner_id, title, severity, description, remediation, "references")
+        SELECT DISTINCT ON (f.scanner, f.scanner_id)
+            f.scanner, f.scanner_id, f.title, f.severity, f.description, f.remediation, f."references"
+        FROM findings AS f
+        LEFT JOIN LATERAL (
+            SELECT max(i.last_seen) AS last_seen FROM instances AS i WHERE i.finding_id = f.id
+        ) AS seen ON true
+        WHERE f.scanner_id IS NOT NULL
+        ORDER BY f.scanner, f.scanner_id, seen.last_seen DESC NULLS LAST, f.created_at DESC
+        """
+    )
+
+    op.alter_column("findings", "description", new_column_name="description_override")
+    op.alter_column("findings", "remediation", new_column_name="remediation_override")
+    op.alter_column("findings", "references", new_column_name="references_override")
+    op.alter_column("findings", "references_override", nullable=True, server_default=None)
+    op.execute(_findings_trigger("description_override", "remediation_override"))
+    # Scanner findings read whatever matches the catalog from there; text that differs (an
+    # older scan, or an operator's edit) stays on the finding as its override. This is not an
+    # edit, so the trigger is kept from bumping updated_at.
+    op.execute("ALTER TABLE findings DISABLE TRIGGER trg_findings_search")
+    op.execute(
+        """
+        UPDATE findings AS f
+        SET description_override = CASE WHEN f.description_override IS NOT DISTINCT FROM c.description
+                THEN NULL ELSE f.description_override END,
+            remediation_override = CASE WHEN f.remediation_override IS NOT DISTINCT FROM c.remediation
+                THEN NULL ELSE f.remediation_override END,
+            references_override = CASE WHEN f.references_override IS NOT DISTINCT FROM c."references"
+                THEN NULL ELSE f.references_override END,
+            search_dirty = true
+        FROM plugin_catalog AS c
+        WHERE c.scanner = f.scanner AND c.scanner_id = f.scanner_id
+        """
+    )
+    op.execute("ALTER TABLE findings ENABLE TRIGGER trg_findings_search")
+    op.create_foreign_key(
+        "fk_findings_plugin_catalog",
+        "findings",
+        "plugin_catalog",
+        ["scanner", "scanner_id"],
+        ["scanner", "scanner_id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("fk_findings_plugin_catalog", "findings", type_="foreignkey")
+    op.execute("ALTER TABLE findings DISABLE TRIGGER trg_findings_search")
+    op.execute(
+        """
+        UPDATE findings AS f
+        SET description_override = COALESCE(f.description_override, c.description),
+            remediation_override = COALESCE(f.remediation_override, c.remediation),
+            references_override = COALESCE(f.references_override, c."references"),
+            search_dirty = true
+        FROM plugin_catalog AS c
+        WHERE c.scanner = f.scanner AND c.scanner_id = f.scanner_id
+        """
+    )
+    op.execute("ALTER TABLE findings ENABLE TRIGGER trg_findings_search")
+    op.execute("UPDATE findings SET references_override = '[]'::jsonb WHERE references_override IS NULL")
+    op.alter_column(
+        "findings", "references_override", nullable=False, server_default=sa.text("'[]'::jsonb")
+    )
+    op.alter_column("findings", "description_override", new_column_name="description")
+    op.alter_column("findings", "remediation_override", new_column_name="remediation")
+    op.alter_column("findings", "references_override", new_column_name="references")
+    op.execute(_findings_trigger("description", "remediation"))
+    op.drop_table("plugin_catalog")
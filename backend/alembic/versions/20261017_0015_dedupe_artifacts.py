@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+import shutil
+import zlib
+from pathlib import Path
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import settings
+
+
+revision = "20261017_0015"
+down_revision = "20261017_0014"
+branch_labels = None
+depends_on = None
+
+
+# Artifacts used to be keyed on the SHA-256 of their gzip copy, whose header carries an mtime,
+# so the same content uploaded twice was stored twice. This rekeys every artifact on its
+# content as uploaded, points references at one artifact per content and deletes the rest.
+# Files are only ever added here: until the transaction commits, a rollback would restore
+# rows pointing at the old paths. `doghouse prune-artifacts` removes the stale ones afterwards.
+
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def _artifact_relpath(sha256_hex: str) -> str:
+    return f"artifacts/{sha256_hex[0:2]}/{sha256_hex[2:4]}/{sha256_hex}"
+
+
+def _sha256(f) -> str:
+    h = hashlib.sha256()
+    while chunk := f.read(CHUNK_SIZE):
+        h.update(chunk)
+    return h.hexdigest()
+
+
+def _content_sha256(path: Path) -> str | None:
+    if not path.is_file():
+        return None
+    try:
+        with gzip.open(path, "rb") as f:
+            return _sha256(f)
+    except (gzip.BadGzipFile, EOFError, zlib.error):
+        # Stored as uploaded (.zip, .zst), not gzipped by us.
+        with path.open("rb") as f:
+            return _sha256(f)
+
+
+def _place(src: Path, dst: Path) -> None:
+    if dst.exists() or not src.is_file():
+        return
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    data_dir = settings.data_dir
+    rows = conn.execute(
+        sa.text(
+            """
+            SELECT a.id, a.relative_path, COALESCE(
+                (SELECT j.upload_sha256 FROM ingest_jobs j
+                 WHERE j.artifact_id = a.id AND j.upload_sha256 IS NOT NULL LIMIT 1),
+                (SELECT f->>'upload_sha256'
+                 FROM ingest_jobs j,
+                    jsonb_array_elements(
+                        CASE WHEN jsonb_typeof(j.stats->'files') = 'array'
+                            THEN j.stats->'files' ELSE '[]'::jsonb END
+                    ) AS f
+                 WHERE j.source_type = 'batch'
+                    AND f->>'artifact_id' = a.id::text
+                    AND f->>'upload_sha256' IS NOT NULL
+                 LIMIT 1)
+            )
+            FROM artifacts a
+            ORDER BY a.created_at, a.id
+            """
+        )
+    ).all()
+
+    groups: dict[str, list[tuple]] = {}
+    for artifact_id, rel, upload_sha256 in rows:
+        # Scan uploads already record the hash of the file as uploaded, on the job or, for a
+        # batch, on its file entry.
+        sha = upload_sha256 or _content_sha256(data_dir / rel)
+        if sha is None:
+            continue  # file missing on disk: leave the row as it is
+        groups.setdefault(sha, []).append((artifact_id, rel))
+
+    keep: dict[str, tuple] = {}
+    for sha, members in groups.items():
+        # Prefer a row whose file already sits at the new path, else the oldest.
+        members.sort(key=lambda m: m[1] != _artifact_relpath(sha))
+        keep[sha] = members[0]
+        keep_id = str(members[0][0])
+        for dupe_id, _ in members[1:]:
+            params = {"keep": keep_id, "dupe": str(dupe_id)}
+            for table in ("ingest_jobs", "tool_outputs", "domain_user_lists"):
+                conn.execute(
+                    sa.text(
+                        f"UPDATE {table} SET artifact_id = CAST(:keep AS uuid) "
+                        "WHERE artifact_id = CAST(:dupe AS uuid)"
+                    ),
+                    params,
+                )
+            # Batch jobs list each file's artifact in stats.
+            conn.execute(
+                sa.text(
+                    "UPDATE ingest_jobs SET stats = replace(stats::text, :dupe, :keep)::jsonb "
+                    "WHERE strpos(stats::text, :dupe) > 0"
+                ),
+                params,
+            )
+            conn.execute(sa.text("DELETE FROM artifacts WHERE id = CAST(:dupe AS uuid)"), params)
+
+    # Park the survivors' keys first so a new key never collides with an old one.
+    conn.execute(
+        sa.text("UPDATE artifacts SET sha256 = 'rekey:' || id::text WHERE id = ANY(:ids)"),
+        {"ids": [artifact_id for artifact_id, _ in keep.values()]},
+    )
+    for sha, (artifact_id, rel) in keep.items():
+        new_rel = _artifact_relpath(sha)
+        if rel != new_rel:
+            _place(data_dir / rel, data_dir / new_rel)
+        conn.execute(
+            sa.text("UPDATE artifacts SET sha256 = :sha, relative_path = :rel WHERE id = :id"),
+            {"sha": sha, "rel": new_rel, "id": artifact_id},
+        )
+
+
+def downgrade() -> None:
+    # Collapsed duplicates cannot be split again; the content keys work with older code too.
+    pass
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+from app import crud
+from app.config import settings
+from app.db import SessionLocal, engine
+from app.enums import IngestStatus
+from app.ingest.runner import IngestRunner
+from app.ingest.streams import sniff_source_type
+from app.logging import configure_logging
+from app.models import IngestJob, Project
+from app.services.artifacts import hash_file, prune_artifact_files
+
+_PROGRESS_SECONDS = 2.0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="doghouse")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser(
+        "ingest", help="ingest Nmap / Nessus files straight from disk, without the HTTP API"
+    )
+    ingest.add_argument("files", nargs="+", type=Path)
+    ingest.add_argument("--project", required=True, type=uuid.UUID)
+    ingest.add_argument("--source-type", choices=["auto", "nmap", "nessus"], default="auto")
+    ingest.add_argument(
+        "--mode",
+        choices=["copy", "bulk", "row"],
+        default="copy",
+        help="copy stages every row with COPY and merges once; bulk and row commit as they go "
+        "and can resume after a crash",
+    )
+    ingest.add_argument("--priority", type=int, default=0)
+    ingest.add_argument("--force", action="store_true", help="re-ingest files already imported")
+
+    prune = commands.add_parser(
+        "prune-artifacts", help="delete artifact files no artifact record points at"
+    )
+    prune.add_argument(
+        "--older-than",
+        type=float,
+        default=3600,
+        metavar="SECONDS",
+        help="keep files modified more recently than this, which may belong to an upload in flight",
+    )
+    return parser
+
+
+def _runner(mode: str) -> IngestRunner:
+    runner = IngestRunner.from_settings(SessionLocal, settings)
+    runner.mode = "row" if mode == "row" else "bulk"
+    if mode == "copy":
+        runner.copy_threshold_bytes = 0
+    return runner
+
+
+def _print_files(job: IngestJob) -> None:
+    for entry in job.stats.get("files", []):
+        records = sum(entry.get(key, 0) for key in ("assets", "services", "findings", "instances"))
+        if entry["status"] == "duplicate":
+            print(f"{entry['name']}: duplicate of job {entry['duplicate_of']}, skipped")
+            continue
+        seconds = entry.get("parse_seconds") or 0
+        mb = entry["upload_size"] / (1024 * 1024)
+        rate = f"{mb / seconds:.1f} MB/s, {records / seconds:.0f} records/s" if seconds else "-"
+        print(
+            f"{entry['name']}: {entry['status']}, {entry.get('hosts', 0)} hosts, "
+            f"{records} records, {mb:.1f} MB in {seconds:.1f}s ({rate})"
+        )
+
+
+async def _watch(job_id: uuid.UUID, task: asyncio.Task) -> None:
+    while not task.done():
+        await asyncio.sleep(_PROGRESS_SECONDS)
+        async with SessionLocal() as session:
+            job = await session.get(IngestJob, job_id)
+        if job is not None and job.status == IngestStatus.running:
+            stats = job.stats or {}
+            eta = stats.get("eta_seconds")
+            print(
+                f"{job.progress}% {stats.get('hosts', 0)} hosts, "
+                f"{stats.get('records_per_sec', 0)} records/s, eta {'-' if eta is None else eta}s",
+                file=sys.stderr,
+            )
+
+
+# Runs the same batch job as POST /imports/batch, but reads the files where they are: nothing
+# is copied into DATA_DIR and no artifact is stored.
+async def ingest(args: argparse.Namespace) -> int:
+    paths = [path.resolve() for path in args.files]
+    missing = [str(path) for path in paths if not path.is_file()]
+    if missing:
+        print(f"not a file: {', '.join(missing)}", file=sys.stderr)
+        return 2
+
+    runner = _runner(args.mode)
+    async with SessionLocal() as session:
+        if await session.get(Project, args.project) is None:
+            print(f"project {args.project} not found", file=sys.stderr)
+            return 2
+        entries = []
+        for path in paths:
+            source_type = args.source_type
+            if source_type == "auto":
+                source_type = await asyncio.to_thread(sniff_source_type, path)
+            if source_type is None:
+                print(f"not an Nmap or Nessus export: {path}", file=sys.stderr)
+                return 2
+            sha256 = await asyncio.to_thread(hash_file, path)
+            entries.append(
+                await crud.batch_file_entry(
+                    session,
+                    args.project,
+                    name=path.name,
+                    source_type=source_type,
+                    upload_relative_path=str(path),
+                    upload_sha256=sha256,
+                    upload_size=path.stat().st_size,
+                    force=args.force,
+                )
+            )
+        # Jobs in one project run one at a time, whether a worker or the CLI runs them.
+        waiting = False
+        while True:
+            job = await crud.create_claimed_ingest_job(
+                session,
+                args.project,
+                "batch",
+                f"{len(entries)} files",
+                os.path.commonpath([str(path.parent) for path in paths]),
+                worker_id=runner.worker_id,
+                lease_seconds=runner.lease_seconds,
+                upload_size=sum(entry["upload_size"] for entry in entries),
+                files=entries,
+                priority=args.priority,
+            )
+            if job is not None:
+                break
+            if not waiting:
+                print(f"waiting for the running ingest job in project {args.project}", file=sys.stderr)
+                waiting = True
+            await asyncio.sleep(runner.poll_seconds)
+
+    print(f"ingest job {job.id}: {len(entries)} files", file=sys.stderr)
+    await runner.start(claim_jobs=False)
+    try:
+        task = asyncio.create_task(runner.run_claimed(job.id))
+        await asyncio.gather(task, _watch(job.id, task))
+        # No worker may be running to catch search up, so do it before returning.
+        indexed = await runner.reindex()
+        print(f"indexed {indexed} findings / evidence blobs for search", file=sys.stderr)
+    finally:
+        await runner.stop()
+
+    async with SessionLocal() as session:
+        job = await session.get(IngestJob, job.id)
+    _print_files(job)
+    stats = job.stats or {}
+    print(
+        f"job {job.id} {job.status}: {stats.get('hosts', 0)} hosts, {stats.get('assets', 0)} assets, "
+        f"{stats.get('services', 0)} services, {stats.get('findings', 0)} findings, "
+        f"{stats.get('instances', 0)} instances in {stats.get('elapsed_seconds', 0)}s"
+    )
+    if job.error:
+        print(job.error, file=sys.stderr)
+    return 0 if job.status == IngestStatus.succeeded else 1
+
+
+# Run after `alembic upgrade` past 20261017_0015, which leaves the files it superseded.
+async def prune_artifacts(args: argparse.Namespace) -> int:
+    async with SessionLocal() as session:
+        removed = await prune_artifact_files(
+            session, data_dir=settings.data_dir, older_than=args.older_than
+        )
+    for path in removed:
+        print(path)
+    print(f"removed {len(removed)} unreferenced artifact files", file=sys.stderr)
+    return 0
+
+
+async def _run(args: argparse.Namespace) -> int:
+    command = prune_artifacts if args.command == "prune-artifacts" else ingest
+    try:
+        return await command(args)
+    finally:
+        await engine.dispose()
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    configure_logging(settings.log_level)
+    return asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
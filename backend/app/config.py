@@ -18,6 +18,20 @@ class Settings(BaseSettings):
     frontend_dist_dir: Path = Path("../frontend/dist")
     dev_frontend_origins: str = "http://127.0.0.1:5173,http://localhost:5173"
     log_level: str = "INFO"
+    ingest_mode: str = "bulk"
+    ingest_embedded_worker: bool = True
+    ingest_batch_size: int = 1000
+    ingest_workers: int = 2
+    ingest_parse_processes: int = 2
+    ingest_parse_queue_size: int = 8
+    ingest_xml_backend: str = "auto"
+    ingest_copy_threshold_bytes: int = 256 * 1024 * 1024
+    ingest_shard_threshold_bytes: int = 512 * 1024 * 1024
+    ingest_shard_bytes: int = 64 * 1024 * 1024
+    ingest_index_batch_size: int = 1000
+    ingest_lease_seconds: int = 60
+    ingest_poll_seconds: float = 2.0
+    ingest_max_attempts: int = 3
 
     @field_validator("data_dir", "frontend_dist_dir", mode="before")
     @classmethod
@@ -4,23 +4,28 @@ import csv
 import io
 import ipaddress
 import uuid
-from datetime import UTC, datetime
+from datetime import UTC, datetime, timedelta
 from typing import Any
 
-from sqlalchemy import asc, desc, func, select, update
+from sqlalchemy import and_, asc, desc, exists, func, literal_column, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
 from app.enums import IngestStatus, InstanceStatus, Severity
+from app.ingest.normalize import evidence_sha256
 from app.models import (
     Asset,
     Domain,
     DomainFinding,
     DomainUserList,
+    EvidenceBlob,
     Finding,
     IngestJob,
     Instance,
     LootCredential,
     Note,
+    PluginCatalog,
     Project,
     Service,
     ToolOutput,
@@ -42,6 +47,18 @@ def truncate_evidence(value: str | None) -> str | None:
     return value[:65536]
 
 
+# Stores evidence text once in evidence_blobs and returns the key instances refer to it by.
+async def store_evidence(session: AsyncSession, value: str | None) -> str | None:
+    body = truncate_evidence(value)
+    if body is None:
+        return None
+    sha256 = evidence_sha256(body)
+    await session.execute(
+        insert(EvidenceBlob).values(sha256=sha256, body=body).on_conflict_do_nothing(index_elements=["sha256"])
+    )
+    return sha256
+
+
 async def create_project(session: AsyncSession, name: str, description: str | None) -> Project:
     project = Project(name=name, description=description)
     session.add(project)
@@ -279,20 +296,157 @@ async def list_projects(session: AsyncSession) -> list[Project]:
     return list(result.scalars().all())
 
 
+INGEST_NOTIFY_CHANNEL = "doghouse_ingest"
+
+
 async def create_ingest_job(
     session: AsyncSession,
     project_id: uuid.UUID,
     source_type: str,
     original_filename: str,
     upload_relative_path: str,
+    *,
+    job_id: uuid.UUID | None = None,
+    artifact_id: uuid.UUID | None = None,
+    upload_sha256: str | None = None,
+    upload_size: int | None = None,
+    files: list[dict] | None = None,
+    priority: int = 0,
+    lease_owner: str | None = None,
+    lease_seconds: int = 60,
 ) -> IngestJob:
+    stats = {
+        "upload_relative_path": upload_relative_path,
+        "upload_sha256": upload_sha256,
+        "upload_size": upload_size,
+    }
+    if files is not None:
+        stats["files"] = files
     job = IngestJob(
+        id=job_id or uuid.uuid4(),
         project_id=project_id,
+        artifact_id=artifact_id,
         source_type=source_type,
         original_filename=original_filename,
         status=IngestStatus.queued,
         progress=0,
-        stats={"upload_relative_path": upload_relative_path},
+        stats=stats,
+        upload_sha256=upload_sha256,
+        upload_size=upload_size,
+        priority=priority,
+    )
+    if lease_owner is not None:
+        # Created already claimed; see create_claimed_ingest_job.
+        job.status = IngestStatus.running
+        job.lease_owner = lease_owner
+        job.lease_expires_at = utcnow() + timedelta(seconds=lease_seconds)
+        job.heartbeat_at = utcnow()
+        job.attempts = 1
+    session.add(job)
+    if lease_owner is None:
+        # Delivered on commit, to ingest runners in any process (see IngestRunner._listen).
+        await session.execute(select(func.pg_notify(INGEST_NOTIFY_CHANNEL, str(job.id))))
+    await session.commit()
+    await session.refresh(job)
+    return job
+
+
+# Single imports record the upload hash on the job, batch jobs on each of their files.
+async def find_ingested_upload(
+    session: AsyncSession, project_id: uuid.UUID, upload_sha256: str
+) -> IngestJob | None:
+    batch_file = {"upload_sha256": upload_sha256, "status": "succeeded"}
+    result = await session.execute(
+        select(IngestJob)
+        .where(
+            IngestJob.project_id == project_id,
+            or_(
+                IngestJob.upload_sha256 == upload_sha256,
+                IngestJob.stats.contains({"files": [batch_file]}),
+            ),
+            IngestJob.status == IngestStatus.succeeded,
+            ~IngestJob.stats.has_key("duplicate_of"),
+        )
+        .order_by(IngestJob.finished_at.desc())
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+# One entry of a batch job's stats["files"]. A file this project has already ingested is
+# marked as a duplicate of that job and is not parsed again, unless `force` is set.
+async def batch_file_entry(
+    session: AsyncSession,
+    project_id: uuid.UUID,
+    *,
+    name: str,
+    source_type: str,
+    upload_relative_path: str,
+    upload_sha256: str,
+    upload_size: int,
+    artifact_id: uuid.UUID | None = None,
+    force: bool = False,
+) -> dict[str, Any]:
+    entry: dict[str, Any] = {
+        "name": name,
+        "source_type": source_type,
+        "upload_relative_path": upload_relative_path,
+        "upload_sha256": upload_sha256,
+        "upload_size": upload_size,
+        "artifact_id": str(artifact_id) if artifact_id else None,
+        "status": "queued",
+    }
+    original = None if force else await find_ingested_upload(session, project_id, upload_sha256)
+    if original is not None:
+        entry.update(status="duplicate", duplicate_of=str(original.id), done=True, bytes_read=upload_size)
+    return entry
+
+
+DUPLICATE_STATS_KEYS = ("hosts", "assets", "services", "findings", "instances")
+
+
+# Where `original` (see find_ingested_upload) keeps the source type and record counts of the
+# upload: the job itself, or the file entry of a batch job.
+def ingested_upload_entry(original: IngestJob, upload_sha256: str) -> dict[str, Any]:
+    if original.source_type != "batch":
+        return {**(original.stats or {}), "source_type": original.source_type}
+    for entry in (original.stats or {}).get("files", []):
+        if entry.get("upload_sha256") == upload_sha256 and entry.get("status") == "succeeded":
+            return entry
+    raise ValueError(f"Ingest job {original.id} has no succeeded file {upload_sha256}")
+
+
+# A byte-identical re-upload is recorded as an already finished job pointing at the import
+# that did the work, with that import's record counts.
+async def create_duplicate_ingest_job(
+    session: AsyncSession,
+    original: IngestJob,
+    original_filename: str,
+    *,
+    upload_sha256: str,
+    upload_size: int,
+    artifact_id: uuid.UUID | None = None,
+) -> IngestJob:
+    now = utcnow()
+    entry = ingested_upload_entry(original, upload_sha256)
+    stats = {key: entry[key] for key in DUPLICATE_STATS_KEYS if key in entry}
+    stats.update(
+        duplicate_of=str(original.id),
+        upload_sha256=upload_sha256,
+        upload_size=upload_size,
+    )
+    job = IngestJob(
+        project_id=original.project_id,
+        artifact_id=artifact_id,
+        source_type=entry["source_type"],
+        original_filename=original_filename,
+        status=IngestStatus.succeeded,
+        progress=100,
+        stats=stats,
+        upload_sha256=upload_sha256,
+        upload_size=upload_size,
+        started_at=now,
+        finished_at=now,
     )
     session.add(job)
     await session.commit()
@@ -658,7 +812,18 @@ async def list_findings(
     if scanner:
         query = query.where(Finding.scanner == scanner)
     if q:
-        query = query.where(Finding.search_vector.op("@@")(func.plainto_tsquery("english", q)))
+        tsquery = func.plainto_tsquery("english", q)
+        # Plugin text is indexed once in the catalog rather than per project.
+        query = query.where(
+            or_(
+                Finding.search_vector.op("@@")(tsquery),
+                exists().where(
+                    PluginCatalog.scanner == Finding.scanner,
+                    PluginCatalog.scanner_id == Finding.scanner_id,
+                    PluginCatalog.search_vector.op("@@")(tsquery),
+                ),
+            )
+        )
     if status:
         query = query.join(Instance, Instance.finding_id == Finding.id).where(Instance.status == status).distinct()
 
@@ -735,12 +900,25 @@ async def get_finding_with_instances(
     return finding, rows
 
 
-async def patch_finding(session: AsyncSession, finding_id: uuid.UUID, *, tested: bool | None = None) -> Finding | None:
+async def patch_finding(
+    session: AsyncSession,
+    finding_id: uuid.UUID,
+    *,
+    tested: bool | None = None,
+    description: str | None = None,
+    remediation: str | None = None,
+) -> Finding | None:
     finding = await session.get(Finding, finding_id)
     if not finding:
         return None
     if tested is not None:
         finding.tested = tested
+    # Overrides replace the shared plugin text for this project only; an empty string drops
+    # the override again.
+    if description is not None:
+        finding.description_override = description or None
+    if remediation is not None:
+        finding.remediation_override = remediation or None
     await session.commit()
     await session.refresh(finding)
     return finding
@@ -753,7 +931,7 @@ async def patch_instance(session: AsyncSession, instance_id: uuid.UUID, payload:
     if payload.status is not None:
         instance.status = payload.status
     if payload.evidence_snippet is not None:
-        instance.evidence_snippet = truncate_evidence(payload.evidence_snippet)
+        instance.evidence_sha256 = await store_evidence(session, payload.evidence_snippet)
     if payload.analyst_note is not None:
         instance.analyst_note = payload.analyst_note
     await session.commit()
@@ -844,9 +1022,7 @@ async def create_manual_finding_for_asset(
         finding_key=f"manual:{uuid.uuid4()}",
         title=title,
         severity=Severity(severity),
-        description=description,
-        remediation=None,
-        references=[],
+        description_override=description,
         scanner="manual",
         scanner_id=None,
     )
@@ -863,7 +1039,7 @@ async def create_manual_finding_for_asset(
         asset_id=asset.id,
         service_id=None,
         status=InstanceStatus.open,
-        evidence_snippet=truncate_evidence(combined_detail),
+        evidence_sha256=await store_evidence(session, combined_detail),
         first_seen=utcnow(),
         last_seen=utcnow(),
     )
@@ -1250,3 +1426,220 @@ async def update_job_status(
         values["artifact_id"] = artifact_id
     await session.execute(update(IngestJob).where(IngestJob.id == job_id).values(**values))
     await session.commit()
+
+
+# Serializes claims across processes so the "project already running" check below sees
+# every committed claim; the claim transaction itself is only a few statements long.
+INGEST_CLAIM_LOCK_KEY = 0x646F6768  # "dogh"
+
+
+# Whether another job in the project holds a live lease: at most one job per project runs.
+def _project_busy(project_id: Any, job_id: Any = None) -> Any:
+    busy = aliased(IngestJob)
+    conditions = [
+        busy.project_id == project_id,
+        busy.status == IngestStatus.running,
+        busy.lease_expires_at >= func.now(),
+    ]
+    if job_id is not None:
+        conditions.append(busy.id != job_id)
+    return exists().where(*conditions)
+
+
+async def claim_ingest_job(
+    session: AsyncSession,
+    *,
+    worker_id: str,
+    lease_seconds: int,
+    max_attempts: int,
+) -> uuid.UUID | None:
+    await session.execute(select(func.pg_advisory_xact_lock(INGEST_CLAIM_LOCK_KEY)))
+    expired = and_(IngestJob.status == IngestStatus.running, IngestJob.lease_expires_at < func.now())
+    await session.execute(
+        update(IngestJob)
+        .where(expired, IngestJob.attempts >= max_attempts)
+        .values(
+            status=IngestStatus.failed,
+            progress=100,
+            error="ingest job lease expired too many times",
+            finished_at=func.now(),
+        )
+    )
+    # A job whose worker died after a cancel was requested is not picked up again.
+    await session.execute(
+        update(IngestJob)
+        .where(expired, IngestJob.cancel_requested_at.is_not(None))
+        .values(status=IngestStatus.cancelled, finished_at=func.now())
+    )
+
+    job_id = await session.scalar(
+        select(IngestJob.id)
+        .where(
+            or_(IngestJob.status == IngestStatus.queued, expired),
+            ~_project_busy(IngestJob.project_id, IngestJob.id),
+        )
+        # Explicit priority first, then shortest job first, so a small scan is not stuck
+        # behind a multi-gigabyte export; age breaks ties.
+        .order_by(
+            IngestJob.priority.desc(),
+            IngestJob.upload_size.asc().nulls_last(),
+            IngestJob.created_at,
+        )
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    if job_id is not None:
+        await session.execute(
+            update(IngestJob)
+            .where(IngestJob.id == job_id)
+            .values(
+                status=IngestStatus.running,
+                lease_owner=worker_id,
+                lease_expires_at=func.now() + timedelta(seconds=lease_seconds),
+                heartbeat_at=func.now(),
+                attempts=IngestJob.attempts + 1,
+            )
+        )
+    await session.commit()
+    return job_id
+
+
+# For callers that run the job themselves (the CLI): creates it already claimed by
+# `worker_id`, under the same lock and per-project rule as claim_ingest_job. Returns None, and
+# creates nothing, while another job in the project is running.
+async def create_claimed_ingest_job(
+    session: AsyncSession,
+    project_id: uuid.UUID,
+    source_type: str,
+    original_filename: str,
+    upload_relative_path: str,
+    *,
+    worker_id: str,
+    lease_seconds: int,
+    upload_size: int | None = None,
+    files: list[dict] | None = None,
+    priority: int = 0,
+) -> IngestJob | None:
+    await session.execute(select(func.pg_advisory_xact_lock(INGEST_CLAIM_LOCK_KEY)))
+    if await session.scalar(select(_project_busy(project_id))):
+        # Nothing was written; this just releases the lock.
+        await session.commit()
+        return None
+    return await create_ingest_job(
+        session,
+        project_id,
+        source_type,
+        original_filename,
+        upload_relative_path,
+        upload_size=upload_size,
+        files=files,
+        priority=priority,
+        lease_owner=worker_id,
+        lease_seconds=lease_seconds,
+    )
+
+
+async def renew_ingest_job_lease(
+    session: AsyncSession,
+    job_id: uuid.UUID,
+    *,
+    worker_id: str,
+    lease_seconds: int,
+) -> bool:
+    result = await session.execute(
+        update(IngestJob)
+        .where(
+            IngestJob.id == job_id,
+            IngestJob.lease_owner == worker_id,
+            IngestJob.status == IngestStatus.running,
+        )
+        .values(lease_expires_at=func.now() + timedelta(seconds=lease_seconds), heartbeat_at=func.now())
+    )
+    await session.commit()
+    return result.rowcount > 0
+
+
+# Queued jobs are cancelled on the spot. Running ones are flagged, and their worker stops at
+# its next commit (see ingest_cancel_requested). Returns None for an unknown job.
+async def cancel_ingest_job(session: AsyncSession, job_id: uuid.UUID) -> IngestJob | None:
+    job = await session.get(IngestJob, job_id, with_for_update=True)
+    if job is None:
+        return None
+    if job.status == IngestStatus.queued:
+        job.status = IngestStatus.cancelled
+        job.cancel_requested_at = job.finished_at = utcnow()
+    elif job.status == IngestStatus.running and job.cancel_requested_at is None:
+        job.cancel_requested_at = utcnow()
+    await session.commit()
+    await session.refresh(job)
+    return job
+
+
+async def ingest_cancel_requested(session: AsyncSession, job_id: uuid.UUID) -> bool:
+    requested = await session.scalar(select(IngestJob.cancel_requested_at).where(IngestJob.id == job_id))
+    return requested is not None
+
+
+async def ingest_queue_stats(session: AsyncSession) -> tuple[int, list[IngestJob]]:
+    queued = await session.scalar(
+        select(func.count()).select_from(IngestJob).where(IngestJob.status == IngestStatus.queued)
+    )
+    rows = await session.execute(
+        select(IngestJob)
+        .where(IngestJob.status == IngestStatus.running, IngestJob.lease_expires_at >= func.now())
+        .order_by(IngestJob.started_at)
+    )
+    return int(queued or 0), list(rows.scalars().all())
+
+
+def _search_vector(*columns: tuple[Any, str]) -> Any:
+    vector = None
+    for column, weight in columns:
+        text = func.to_tsvector("english", func.coalesce(column, ""))
+        part = func.setweight(text, literal_column(f"'{weight}'"))
+        vector = part if vector is None else vector.op("||")(part)
+    return vector
+
+
+# Findings whose indexed text changed (flagged by their row trigger), changed catalog plugins
+# and new evidence blobs are marked search_dirty; this rebuilds up to `limit` of each and
+# returns how many it did.
+# SKIP LOCKED lets several indexers, and the ingest writing new rows, run side by side.
+async def reindex_search_vectors(session: AsyncSession, *, limit: int) -> int:
+    indexed = 0
+    for model, keys, vector in (
+        (
+            Finding,
+            [Finding.id],
+            _search_vector(
+                (Finding.title, "A"),
+                (Finding.description_override, "B"),
+                (Finding.remediation_override, "C"),
+            ),
+        ),
+        (
+            PluginCatalog,
+            [PluginCatalog.scanner, PluginCatalog.scanner_id],
+            _search_vector(
+                (PluginCatalog.title, "A"),
+                (PluginCatalog.description, "B"),
+                (PluginCatalog.remediation, "C"),
+            ),
+        ),
+        (EvidenceBlob, [EvidenceBlob.sha256], func.to_tsvector("english", EvidenceBlob.body)),
+    ):
+        dirty = (
+            select(*keys)
+            .where(model.search_dirty.is_(True))
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        result = await session.execute(
+            update(model)
+            .where(tuple_(*keys).in_(dirty))
+            .values(search_vector=vector, search_dirty=False)
+            .execution_options(synchronize_session=False)
+        )
+        indexed += result.rowcount or 0
+    await session.commit()
+    return indexed
@@ -22,4 +22,5 @@ class IngestStatus(StrEnum):
     queued = "queued"
     running = "running"
     succeeded = "succeeded"
-    failed = "failed"
\ No newline at end of file
+    failed = "failed"
+    cancelled = "cancelled"
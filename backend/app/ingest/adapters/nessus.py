@@ -1,18 +1,21 @@
 from __future__ import annotations
 
-from collections.abc import Iterator
-from xml.etree.ElementTree import iterparse
+import sys
+from collections.abc import Callable, Iterator
+from datetime import datetime
+from xml.etree.ElementTree import Element
 
+from app.ingest.adapters.xmlstream import iter_elements
+from app.ingest.identity import IdentityMap
 from app.ingest.normalize import (
-    AssetRecord,
-    FindingRecord,
-    InstanceRecord,
-    ServiceRecord,
+    Record,
+    RecordBatch,
     normalize_hostname,
     normalize_ip,
     truncate_evidence,
     utcnow,
 )
+from app.ingest.streams import open_scan
 
 SEVERITY_MAP = {
     "0": "info",
@@ -23,107 +26,143 @@ SEVERITY_MAP = {
 }
 
 
-def parse_nessus_xml(path: str) -> Iterator[AssetRecord | ServiceRecord | FindingRecord | InstanceRecord]:
-    context = iterparse(path, events=("end",))
-    for _, elem in context:
-        if elem.tag != "ReportHost":
+def parse_nessus_xml(
+    path: str,
+    identity: IdentityMap | None = None,
+    stats: dict[str, int] | None = None,
+    skip_hosts: int = 0,
+    xml_backend: str = "auto",
+) -> Iterator[Record]:
+    for batch in iter_nessus_batches(
+        path, identity=identity, stats=stats, skip_hosts=skip_hosts, xml_backend=xml_backend
+    ):
+        yield from batch.records()
+
+
+def iter_nessus_batches(
+    path: str,
+    identity: IdentityMap | None = None,
+    stats: dict[str, int] | None = None,
+    skip_hosts: int = 0,
+    xml_backend: str = "auto",
+    batch_size: int = 1000,
+    byte_range: tuple[int, int] | None = None,
+) -> Iterator[RecordBatch]:
+    normalize = identity.normalize_ip if identity else normalize_ip
+    stats = stats if stats is not None else {}
+    stats.setdefault("duplicate_findings_suppressed", 0)
+    stats["hosts"] = 0
+    stats["bytes_read"] = 0
+    # Plugin text is identical on every host it fires on, so each finding is emitted once
+    # per file; instances are still emitted per host. Doubles as the finding key cache.
+    finding_keys: dict[str, str] = {}
+    now = utcnow()
+    batch = RecordBatch()
+    with open_scan(path, byte_range) as (stream, raw):
+        for elem in iter_elements(stream, "ReportHost", xml_backend):
+            # Hosts before skip_hosts were committed by an earlier attempt at this job.
+            if stats["hosts"] >= skip_hosts:
+                _add_host(batch, elem, normalize, finding_keys, stats, now)
+            # Batches end on host boundaries, so "hosts" always counts hosts whose rows
+            # are entirely in batches already handed out.
+            stats["hosts"] += 1
+            stats["bytes_read"] = raw.tell()
+            if len(batch) >= batch_size:
+                yield batch
+                batch = RecordBatch()
+    if batch:
+        yield batch
+
+
+def _add_host(
+    batch: RecordBatch,
+    elem: Element,
+    normalize: Callable[[str], str],
+    finding_keys: dict[str, str],
+    stats: dict[str, int],
+    now: datetime,
+) -> None:
+    report_host_name = elem.get("name", "")
+    maybe_ip = None
+    hostnames: list[str] = []
+    os_name: str | None = None
+
+    host_props = elem.find("HostProperties")
+    if host_props is not None:
+        for tag in host_props.findall("tag"):
+            name = tag.get("name")
+            val = (tag.text or "").strip()
+            if name in {"host-ip", "host-fqdn", "netbios-name"} and val:
+                if name == "host-ip":
+                    maybe_ip = val
+                else:
+                    hn = normalize_hostname(val)
+                    if hn:
+                        hostnames.append(hn)
+            if name == "operating-system" and val:
+                os_name = val
+
+    if not maybe_ip:
+        try:
+            maybe_ip = normalize(report_host_name)
+        except Exception:
+            maybe_ip = None
+            hn = normalize_hostname(report_host_name)
+            if hn:
+                hostnames.append(hn)
+
+    if not maybe_ip:
+        return
+
+    ip = normalize(maybe_ip)
+    primary = hostnames[0] if hostnames else None
+    batch.assets.append((ip, primary, sorted(set(hostnames)), os_name, now))
+
+    for item in elem.findall("ReportItem"):
+        plugin_id = item.get("pluginID")
+        if not plugin_id:
             continue
 
-        now = utcnow()
-        report_host_name = elem.attrib.get("name", "")
-        maybe_ip = None
-        hostnames: list[str] = []
-        os_name: str | None = None
-
-        host_props = elem.find("HostProperties")
-        if host_props is not None:
-            for tag in host_props.findall("tag"):
-                name = tag.attrib.get("name")
-                val = (tag.text or "").strip()
-                if name in {"host-ip", "host-fqdn", "netbios-name"} and val:
-                    if name == "host-ip":
-                        maybe_ip = val
-                    else:
-                        hn = normalize_hostname(val)
-                        if hn:
-                            hostnames.append(hn)
-                if name == "operating-system" and val:
-                    os_name = val
-
-        if not maybe_ip:
-            try:
-                maybe_ip = normalize_ip(report_host_name)
-            except Exception:
-                maybe_ip = None
-                hn = normalize_hostname(report_host_name)
-                if hn:
-                    hostnames.append(hn)
-
-        if not maybe_ip:
-            elem.clear()
-            continue
-
-        ip = normalize_ip(maybe_ip)
-        primary = hostnames[0] if hostnames else None
-        yield AssetRecord(
-            ip=ip,
-            primary_hostname=primary,
-            hostnames=sorted(set(hostnames)),
-            os_name=os_name,
-            seen_at=now,
-        )
-
-        for item in elem.findall("ReportItem"):
-            plugin_id = item.attrib.get("pluginID")
-            if not plugin_id:
-                continue
-
-            svc_name = item.attrib.get("svc_name")
-            proto = (item.attrib.get("protocol") or "tcp").lower()
-            port = int(item.attrib.get("port", "0"))
-
-            if port > 0:
-                yield ServiceRecord(
-                    asset_ip=ip,
-                    proto=proto,
-                    port=port,
-                    name=svc_name,
-                    product=item.attrib.get("pluginFamily"),
-                    version=None,
-                    banner=None,
-                    seen_at=now,
-                )
-
-            severity = SEVERITY_MAP.get(item.attrib.get("severity", "0"), "info")
-            title = item.attrib.get("pluginName") or f"Nessus plugin {plugin_id}"
-            description = (item.findtext("description") or "").strip() or None
-            remediation = (item.findtext("solution") or "").strip() or None
-            plugin_output = (item.findtext("plugin_output") or "").strip() or None
+        svc_name = item.get("svc_name")
+        proto = sys.intern((item.get("protocol") or "tcp").lower())
+        port = int(item.get("port", "0"))
+
+        if port > 0:
+            batch.services.append((ip, proto, port, svc_name, item.get("pluginFamily"), None, None, now))
+
+        # One pass over the item's children instead of a findtext() search per field; the
+        # first occurrence wins, as it did with findtext().
+        fields: dict = {}
+        for child in item:
+            fields.setdefault(child.tag, child.text)
+
+        finding_key = finding_keys.get(plugin_id)
+        if finding_key is not None:
+            stats["duplicate_findings_suppressed"] += 1
+        else:
+            finding_key = finding_keys[plugin_id] = sys.intern(f"nessus:{plugin_id}")
+            severity = SEVERITY_MAP.get(item.get("severity", "0"), "info")
+            title = item.get("pluginName") or f"Nessus plugin {plugin_id}"
+            description = (fields.get("description") or "").strip() or None
+            remediation = (fields.get("solution") or "").strip() or None
             refs = []
             for key in ("see_also", "cve", "bid"):
-                txt = (item.findtext(key) or "").strip()
+                txt = (fields.get(key) or "").strip()
                 if txt:
                     refs.append(f"{key}:{txt}")
-
-            finding_key = f"nessus:{plugin_id}"
-            yield FindingRecord(
-                finding_key=finding_key,
-                title=title,
-                severity=severity,
-                description=description,
-                remediation=remediation,
-                references=refs,
-                scanner="nessus",
-                scanner_id=plugin_id,
-            )
-            yield InstanceRecord(
-                finding_key=finding_key,
-                asset_ip=ip,
-                service_proto=proto if port > 0 else None,
-                service_port=port if port > 0 else None,
-                evidence_snippet=truncate_evidence(plugin_output),
-                status="open",
-                seen_at=now,
+            batch.findings.append(
+                (finding_key, title, severity, description, remediation, refs, "nessus", plugin_id)
             )
 
-        elem.clear()
+        plugin_output = (fields.get("plugin_output") or "").strip() or None
+        batch.instances.append(
+            (
+                finding_key,
+                ip,
+                proto if port > 0 else None,
+                port if port > 0 else None,
+                truncate_evidence(plugin_output),
+                "open",
+                now,
+            )
+        )
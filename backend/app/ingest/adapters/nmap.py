@@ -1,70 +1,105 @@
 from __future__ import annotations
 
-from collections.abc import Iterator
-from xml.etree.ElementTree import iterparse
+import sys
+from collections.abc import Callable, Iterator
+from datetime import datetime
+from xml.etree.ElementTree import Element
 
-from app.ingest.normalize import AssetRecord, ServiceRecord, normalize_hostname, normalize_ip, utcnow
+from app.ingest.adapters.xmlstream import iter_elements
+from app.ingest.identity import IdentityMap
+from app.ingest.normalize import Record, RecordBatch, normalize_hostname, normalize_ip, utcnow
+from app.ingest.streams import open_scan
 
 
-def parse_nmap_xml(path: str) -> Iterator[AssetRecord | ServiceRecord]:
+def parse_nmap_xml(
+    path: str,
+    identity: IdentityMap | None = None,
+    stats: dict[str, int] | None = None,
+    skip_hosts: int = 0,
+    xml_backend: str = "auto",
+) -> Iterator[Record]:
+    for batch in iter_nmap_batches(
+        path, identity=identity, stats=stats, skip_hosts=skip_hosts, xml_backend=xml_backend
+    ):
+        yield from batch.records()
+
+
+def iter_nmap_batches(
+    path: str,
+    identity: IdentityMap | None = None,
+    stats: dict[str, int] | None = None,
+    skip_hosts: int = 0,
+    xml_backend: str = "auto",
+    batch_size: int = 1000,
+) -> Iterator[RecordBatch]:
+    normalize = identity.normalize_ip if identity else normalize_ip
+    stats = stats if stats is not None else {}
+    stats["hosts"] = 0
+    stats["bytes_read"] = 0
     now = utcnow()
-    context = iterparse(path, events=("end",))
-    for _, elem in context:
-        if elem.tag != "host":
-            continue
+    batch = RecordBatch()
+    with open_scan(path) as (stream, raw):
+        for elem in iter_elements(stream, "host", xml_backend, prefer="stdlib"):
+            if stats["hosts"] >= skip_hosts:
+                _add_host(batch, elem, normalize, now)
+            stats["hosts"] += 1
+            stats["bytes_read"] = raw.tell()
+            if len(batch) >= batch_size:
+                yield batch
+                batch = RecordBatch()
+    if batch:
+        yield batch
+
 
-        ip = None
-        hostnames: list[str] = []
-        for child in elem:
-            if child.tag == "address" and child.attrib.get("addrtype") in {"ipv4", "ipv6"}:
-                ip = child.attrib.get("addr")
-            if child.tag == "hostnames":
-                for h in child.findall("hostname"):
-                    hn = normalize_hostname(h.attrib.get("name"))
-                    if hn:
-                        hostnames.append(hn)
+def _add_host(
+    batch: RecordBatch, elem: Element, normalize: Callable[[str], str], now: datetime
+) -> None:
+    ip = None
+    hostnames: list[str] = []
+    for child in elem:
+        if child.tag == "address" and child.get("addrtype") in {"ipv4", "ipv6"}:
+            ip = child.get("addr")
+        if child.tag == "hostnames":
+            for h in child.findall("hostname"):
+                hn = normalize_hostname(h.get("name"))
+                if hn:
+                    hostnames.append(hn)
 
-        if not ip:
-            elem.clear()
-            continue
+    if not ip:
+        return
 
-        norm_ip = normalize_ip(ip)
-        primary = hostnames[0] if hostnames else None
-        os_name = None
-        os_elem = elem.find("os")
-        if os_elem is not None:
-            match = os_elem.find("osmatch")
-            if match is not None:
-                os_name = match.attrib.get("name")
+    norm_ip = normalize(ip)
+    primary = hostnames[0] if hostnames else None
+    os_name = None
+    os_elem = elem.find("os")
+    if os_elem is not None:
+        match = os_elem.find("osmatch")
+        if match is not None:
+            os_name = match.get("name")
 
-        yield AssetRecord(
-            ip=norm_ip,
-            primary_hostname=primary,
-            hostnames=sorted(set(hostnames)),
-            os_name=os_name,
-            seen_at=now,
-        )
+    batch.assets.append((norm_ip, primary, sorted(set(hostnames)), os_name, now))
 
-        ports = elem.find("ports")
-        if ports is not None:
-            for p in ports.findall("port"):
-                if p.find("state") is not None and p.find("state").attrib.get("state") != "open":
-                    continue
-                proto = (p.attrib.get("protocol") or "tcp").lower()
-                portid = int(p.attrib.get("portid", "0"))
-                svc = p.find("service")
-                name = svc.attrib.get("name") if svc is not None else None
-                product = svc.attrib.get("product") if svc is not None else None
-                version = svc.attrib.get("version") if svc is not None else None
-                banner = svc.attrib.get("extrainfo") if svc is not None else None
-                yield ServiceRecord(
-                    asset_ip=norm_ip,
-                    proto=proto,
-                    port=portid,
-                    name=name,
-                    product=product,
-                    version=version,
-                    banner=banner,
-                    seen_at=now,
+    ports = elem.find("ports")
+    if ports is not None:
+        for p in ports.findall("port"):
+            state = p.find("state")
+            if state is not None and state.get("state") != "open":
+                continue
+            proto = sys.intern((p.get("protocol") or "tcp").lower())
+            portid = int(p.get("portid", "0"))
+            svc = p.find("service")
+            if svc is None:
+                batch.services.append((norm_ip, proto, portid, None, None, None, None, now))
+            else:
+                batch.services.append(
+                    (
+                        norm_ip,
+                        proto,
+                        portid,
+                        svc.get("name"),
+                        svc.get("product"),
+                        svc.get("version"),
+                        svc.get("extrainfo"),
+                        now,
+                    )
                 )
-        elem.clear()
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from typing import Any, BinaryIO
+from xml.etree.ElementTree import Element, iterparse
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # optional: pip install doghouse-backend[lxml]
+    lxml_etree = None
+
+XML_BACKENDS = ("auto", "lxml", "stdlib")
+
+
+def resolve_backend(backend: str = "auto", prefer: str = "lxml") -> str:
+    if backend not in XML_BACKENDS:
+        raise ValueError(f"unknown XML backend {backend!r}")
+    if backend == "auto":
+        return "lxml" if prefer == "lxml" and lxml_etree is not None else "stdlib"
+    if backend == "lxml" and lxml_etree is None:
+        raise RuntimeError("the lxml XML backend requires the 'lxml' package")
+    return backend
+
+
+# `prefer` is what "auto" picks when lxml is available; adapters set it from
+# benchmarks/parse_speed.py, since lxml's faster tokenizer is offset by slower element
+# access on hosts made of many small elements.
+def iter_elements(
+    source: BinaryIO, tag: str, backend: str = "auto", prefer: str = "lxml"
+) -> Iterator[Any]:
+    if resolve_backend(backend, prefer) == "lxml":
+        return _iter_lxml(source, tag)
+    return _iter_stdlib(source, tag)
+
+
+# libxml2 only materialises events for `tag`; processed hosts and anything in front of them
+# are deleted from the parent once the consumer moves on.
+def _iter_lxml(source: BinaryIO, tag: str) -> Iterator[Any]:
+    context = lxml_etree.iterparse(
+        source, events=("end",), tag=tag, huge_tree=True, resolve_entities=False, no_network=True
+    )
+    for _, elem in context:
+        yield elem
+        elem.clear(keep_tail=False)
+        parent = elem.getparent()
+        if parent is not None:
+            while elem.getprevious() is not None:
+                del parent[0]
+
+
+# Yields each `tag` element once it is complete, then detaches it from its parent. Everything
+# outside those elements (policies, preferences, scan metadata) is dropped as soon as it
+# closes, so memory is bounded by the largest single host rather than by the file size.
+def _iter_stdlib(source: BinaryIO, tag: str) -> Iterator[Element]:
+    stack: list[Element] = []
+    # Stack depth of the `tag` element being built, while inside one.
+    level: int | None = None
+    for event, elem in iterparse(source, events=("start", "end")):
+        if event == "start":
+            if level is None and elem.tag == tag:
+                level = len(stack)
+            stack.append(elem)
+            continue
+        stack.pop()
+        if level is not None:
+            if len(stack) > level:
+                # Released together with the enclosing element.
+                continue
+            level = None
+            yield elem
+        elem.clear()
+        if stack:
+            stack[-1].remove(elem)
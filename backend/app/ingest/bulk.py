@@ -0,0 +1,624 @@
+from __future__ import annotations
+
+import uuid
+from collections.abc import Iterable
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import and_, func, literal_column, or_, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.enums import InstanceStatus, Severity
+from app.ingest.identity import IdentityMap, InstanceIdKey, ServiceIdKey
+from app.ingest.normalize import (
+    AssetRecord,
+    FindingRecord,
+    InstanceRecord,
+    Record,
+    RecordBatch,
+    ServiceRecord,
+    evidence_sha256,
+    truncate_evidence,
+)
+from app.models import Asset, EvidenceBlob, Finding, Instance, PluginCatalog, Service
+
+# asyncpg caps a statement at 32767 bind parameters; the widest table here has ten columns.
+MAX_ROWS_PER_STATEMENT = 2000
+
+INSTANCE_CONFLICT_TARGET = [
+    "project_id",
+    "finding_id",
+    "asset_id",
+    literal_column("COALESCE(service_id, '00000000-0000-0000-0000-000000000000'::uuid)"),
+]
+
+ServiceKey = tuple[str, str, int]
+InstanceKey = tuple[str, str, str | None, int | None]
+
+TOUCH_ASSETS_SQL = """
+UPDATE assets AS t SET last_seen = k.seen
+FROM unnest(CAST(:ids AS uuid[]), CAST(:seen AS timestamptz[])) AS k(id, seen)
+WHERE t.id = k.id AND t.last_seen < k.seen
+"""
+
+TOUCH_SERVICES_SQL = """
+UPDATE services AS t SET last_seen = k.seen
+FROM unnest(CAST(:ids AS uuid[]), CAST(:seen AS timestamptz[])) AS k(id, seen)
+WHERE t.id = k.id AND t.last_seen < k.seen
+"""
+
+TOUCH_INSTANCES_SQL = """
+UPDATE instances AS t SET last_seen = k.seen
+FROM unnest(
+    CAST(:finding_ids AS uuid[]), CAST(:asset_ids AS uuid[]), CAST(:service_ids AS uuid[]),
+    CAST(:seen AS timestamptz[])
+) AS k(finding_id, asset_id, service_id, seen)
+WHERE t.project_id = CAST(:project_id AS uuid)
+    AND t.finding_id = k.finding_id
+    AND t.asset_id = k.asset_id
+    AND t.service_id IS NOT DISTINCT FROM k.service_id
+    AND t.last_seen < k.seen
+"""
+
+
+def _chunks(rows: list[dict[str, Any]]) -> list[list[dict[str, Any]]]:
+    return [rows[i : i + MAX_ROWS_PER_STATEMENT] for i in range(0, len(rows), MAX_ROWS_PER_STATEMENT)]
+
+
+# The merge helpers accept plain row tuples as well as records: both are laid out in the
+# record's field order.
+def merge_asset(prev: tuple, rec: tuple) -> AssetRecord:
+    ip, prev_primary, prev_names, prev_os, _ = prev
+    _, primary, names, os_name, seen_at = rec
+    return AssetRecord(
+        ip=ip,
+        primary_hostname=prev_primary or primary,
+        hostnames=sorted(set(prev_names) | set(names)),
+        os_name=prev_os or os_name,
+        seen_at=seen_at,
+    )
+
+
+def merge_service(prev: tuple, rec: tuple) -> ServiceRecord:
+    asset_ip, proto, port, prev_name, prev_product, prev_version, prev_banner, _ = prev
+    _, _, _, name, product, version, banner, seen_at = rec
+    return ServiceRecord(
+        asset_ip=asset_ip,
+        proto=proto,
+        port=port,
+        name=name or prev_name,
+        product=product or prev_product,
+        version=version or prev_version,
+        banner=banner or prev_banner,
+        seen_at=seen_at,
+    )
+
+
+def merge_instance(prev: tuple, rec: tuple) -> InstanceRecord:
+    finding_key, asset_ip, proto, port, prev_evidence, status, _ = prev
+    evidence, seen_at = rec[4], rec[6]
+    return InstanceRecord(
+        finding_key=finding_key,
+        asset_ip=asset_ip,
+        service_proto=proto,
+        service_port=port,
+        evidence_snippet=evidence if evidence is not None else prev_evidence,
+        status=status,
+        seen_at=seen_at,
+    )
+
+
+# Scanner findings keep their plugin text in plugin_catalog and carry none themselves, so
+# their description, remediation and references columns stay free for project overrides.
+# Findings without a scanner id have no catalog entry and keep their own text.
+def project_finding(row: tuple) -> tuple:
+    if row[7] is None:
+        return row
+    return (*row[:3], None, None, None, *row[6:])
+
+
+# Plugins whose text is unchanged are not rewritten, so re-imports cost no catalog writes.
+# The conflict check still locks every existing row, so rows go in key order: concurrent
+# imports of overlapping plugins then wait on each other instead of deadlocking.
+async def upsert_plugins(session: AsyncSession, findings: Iterable[tuple]) -> None:
+    rows = {
+        (scanner, scanner_id): {
+            "scanner": scanner,
+            "scanner_id": scanner_id,
+            "title": title,
+            "severity": Severity(severity),
+            "description": description,
+            "remediation": remediation,
+            "references": references,
+        }
+        for _, title, severity, description, remediation, references, scanner, scanner_id in findings
+        if scanner_id is not None
+    }
+    for chunk in _chunks([rows[key] for key in sorted(rows)]):
+        stmt = insert(PluginCatalog).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["scanner", "scanner_id"],
+            set_={
+                "title": stmt.excluded.title,
+                "severity": stmt.excluded.severity,
+                "description": stmt.excluded.description,
+                "remediation": stmt.excluded.remediation,
+                "references": stmt.excluded.references,
+                "search_dirty": True,
+                "updated_at": func.now(),
+            },
+            where=tuple_(
+                PluginCatalog.title,
+                PluginCatalog.severity,
+                PluginCatalog.description,
+                PluginCatalog.remediation,
+                PluginCatalog.references,
+            ).is_distinct_from(
+                tuple_(
+                    stmt.excluded.title,
+                    stmt.excluded.severity,
+                    stmt.excluded.description,
+                    stmt.excluded.remediation,
+                    stmt.excluded.references,
+                )
+            ),
+        )
+        await session.execute(stmt)
+
+
+# plugin_catalog is shared by every project, so imports upsert it in a transaction of its
+# own: its row locks are released at once instead of being held for the rest of the import's
+# transaction.
+async def store_plugins(
+    sessionmaker: async_sessionmaker[AsyncSession], findings: Iterable[tuple]
+) -> None:
+    async with sessionmaker() as session:
+        await upsert_plugins(session, findings)
+        await session.commit()
+
+
+# evidence_blobs is shared by every project. Imports that write overlapping digests insert
+# them in digest order, so they wait on each other instead of deadlocking.
+async def insert_evidence(session: AsyncSession, blobs: Iterable[tuple[str, str]]) -> None:
+    rows = [{"sha256": sha256, "body": body} for sha256, body in sorted(blobs)]
+    for chunk in _chunks(rows):
+        await session.execute(
+            insert(EvidenceBlob).values(chunk).on_conflict_do_nothing(index_elements=["sha256"])
+        )
+
+
+def _note(seen: dict, key: Any, at: datetime) -> None:
+    prev = seen.get(key)
+    if prev is None or at > prev:
+        seen[key] = at
+
+
+# Upserts only rewrite a row when one of its content columns changes, so a re-import of
+# an unchanged scan leaves the tuples (and the search triggers) alone. Rows that were
+# seen but not rewritten are collected here and get their last_seen bumped by a single
+# set-based UPDATE per table when the job commits.
+class LastSeen:
+    def __init__(self) -> None:
+        self.assets: dict[uuid.UUID, datetime] = {}
+        self.services: dict[uuid.UUID, datetime] = {}
+        self.instances: dict[InstanceIdKey, datetime] = {}
+
+    def asset(self, asset_id: uuid.UUID, seen_at: datetime) -> None:
+        _note(self.assets, asset_id, seen_at)
+
+    def service(self, service_id: uuid.UUID, seen_at: datetime) -> None:
+        _note(self.services, service_id, seen_at)
+
+    def instance(self, key: InstanceIdKey, seen_at: datetime) -> None:
+        _note(self.instances, key, seen_at)
+
+    async def apply(self, session: AsyncSession, project_id: uuid.UUID) -> None:
+        if self.assets:
+            await session.execute(
+                text(TOUCH_ASSETS_SQL), {"ids": list(self.assets), "seen": list(self.assets.values())}
+            )
+        if self.services:
+            await session.execute(
+                text(TOUCH_SERVICES_SQL), {"ids": list(self.services), "seen": list(self.services.values())}
+            )
+        if self.instances:
+            keys = list(self.instances)
+            await session.execute(
+                text(TOUCH_INSTANCES_SQL),
+                {
+                    "project_id": project_id,
+                    "finding_ids": [k[0] for k in keys],
+                    "asset_ids": [k[1] for k in keys],
+                    "service_ids": [k[2] for k in keys],
+                    "seen": list(self.instances.values()),
+                },
+            )
+        self.assets.clear()
+        self.services.clear()
+        self.instances.clear()
+
+
+class BulkWriter:
+    def __init__(
+        self,
+        session: AsyncSession,
+        project_id: uuid.UUID,
+        *,
+        identity: IdentityMap | None = None,
+        batch_size: int = 1000,
+        catalog: async_sessionmaker[AsyncSession] | None = None,
+    ):
+        self.session = session
+        self.project_id = project_id
+        # Sessions for plugin_catalog upserts (see store_plugins); without one they run in
+        # `session`.
+        self.catalog = catalog
+        self.identity = identity or IdentityMap()
+        self.batch_size = batch_size
+        # Row tuples in record field order, deduplicated on their natural keys.
+        self.assets: dict[str, tuple] = {}
+        self.services: dict[ServiceKey, tuple] = {}
+        self.findings: dict[str, tuple] = {}
+        self.instances: dict[InstanceKey, tuple] = {}
+        self.last_seen = LastSeen()
+        # Digests of evidence already in evidence_blobs, so each text is sent at most once.
+        self.stored_evidence: set[str] = set()
+        self.stored_plugins: set[tuple[str, str]] = set()
+
+    @property
+    def pending(self) -> int:
+        return len(self.assets) + len(self.services) + len(self.findings) + len(self.instances)
+
+    @property
+    def full(self) -> bool:
+        return self.pending >= self.batch_size
+
+    def add(self, rec: Record) -> None:
+        if isinstance(rec, AssetRecord):
+            self._add_assets((rec,))
+        elif isinstance(rec, ServiceRecord):
+            self._add_services((rec,))
+        elif isinstance(rec, FindingRecord):
+            self._add_findings((rec,))
+        elif isinstance(rec, InstanceRecord):
+            self._add_instances((rec,))
+
+    def add_batch(self, batch: RecordBatch) -> None:
+        self._add_assets(batch.assets)
+        self._add_services(batch.services)
+        self._add_findings(batch.findings)
+        self._add_instances(batch.instances)
+
+    def _add_assets(self, rows: Iterable[tuple]) -> None:
+        assets = self.assets
+        for row in rows:
+            prev = assets.get(row[0])
+            assets[row[0]] = merge_asset(prev, row) if prev else row
+
+    def _add_services(self, rows: Iterable[tuple]) -> None:
+        services = self.services
+        for row in rows:
+            key = row[:3]
+            prev = services.get(key)
+            services[key] = merge_service(prev, row) if prev else row
+
+    def _add_findings(self, rows: Iterable[tuple]) -> None:
+        findings = self.findings
+        for row in rows:
+            findings[row[0]] = row
+
+    def _add_instances(self, rows: Iterable[tuple]) -> None:
+        instances = self.instances
+        for row in rows:
+            key = row[:4]
+            prev = instances.get(key)
+            instances[key] = merge_instance(prev, row) if prev else row
+
+    async def flush(self) -> None:
+        if self.assets:
+            await self._flush_assets()
+        if self.services:
+            await self._flush_services()
+        if self.findings:
+            await self._flush_findings()
+        if self.instances:
+            await self._flush_instances()
+
+    async def sync(self) -> None:
+        await self.flush()
+        await self.last_seen.apply(self.session, self.project_id)
+
+    async def _flush_assets(self) -> None:
+        rows = [
+            {
+                "project_id": self.project_id,
+                "ip": ip,
+                "primary_hostname": primary,
+                "hostnames": hostnames,
+                "os_name": os_name,
+                "tags": [],
+                "first_seen": seen_at,
+                "last_seen": seen_at,
+            }
+            for ip, primary, hostnames, os_name, seen_at in self.assets.values()
+        ]
+        seen = {row["ip"]: row["last_seen"] for row in rows}
+        self.assets.clear()
+        written: set[str] = set()
+        for chunk in _chunks(rows):
+            stmt = insert(Asset).values(chunk)
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_assets_project_ip",
+                set_={
+                    "hostnames": literal_column(
+                        "ARRAY(SELECT DISTINCT h FROM unnest(assets.hostnames || excluded.hostnames) AS h "
+                        "ORDER BY h)"
+                    ),
+                    "primary_hostname": func.coalesce(Asset.primary_hostname, stmt.excluded.primary_hostname),
+                    "os_name": func.coalesce(Asset.os_name, stmt.excluded.os_name),
+                    "last_seen": stmt.excluded.last_seen,
+                },
+                where=or_(
+                    ~Asset.hostnames.contains(stmt.excluded.hostnames),
+                    and_(Asset.primary_hostname.is_(None), stmt.excluded.primary_hostname.is_not(None)),
+                    and_(Asset.os_name.is_(None), stmt.excluded.os_name.is_not(None)),
+                ),
+            ).returning(Asset.id, Asset.ip)
+            for asset_id, ip in await self.session.execute(stmt):
+                self.identity.assets.ids[str(ip)] = asset_id
+                written.add(str(ip))
+        # Unchanged rows are not returned by the upsert; look them up and defer last_seen.
+        unchanged = [ip for ip in seen if ip not in written]
+        await self._select_asset_ids([ip for ip in unchanged if ip not in self.identity.assets.ids])
+        for ip in unchanged:
+            asset_id = self.identity.assets.ids.get(ip)
+            if asset_id is not None:
+                self.last_seen.asset(asset_id, seen[ip])
+
+    async def _flush_services(self) -> None:
+        await self._resolve_asset_ids({ip for ip, _, _ in self.services})
+        asset_ids = self.identity.assets.ids
+        rows = []
+        for ip, proto, port, name, product, version, banner, seen_at in self.services.values():
+            asset_id = asset_ids.get(ip)
+            if asset_id is None:
+                continue
+            rows.append(
+                {
+                    "project_id": self.project_id,
+                    "asset_id": asset_id,
+                    "proto": proto,
+                    "port": port,
+                    "name": name,
+                    "product": product,
+                    "version": version,
+                    "banner": banner,
+                    "first_seen": seen_at,
+                    "last_seen": seen_at,
+                }
+            )
+        self.services.clear()
+        written: set[ServiceIdKey] = set()
+        for chunk in _chunks(rows):
+            stmt = insert(Service).values(chunk)
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_services_asset_proto_port",
+                set_={
+                    "name": func.coalesce(func.nullif(stmt.excluded.name, ""), Service.name),
+                    "product": func.coalesce(func.nullif(stmt.excluded.product, ""), Service.product),
+                    "version": func.coalesce(func.nullif(stmt.excluded.version, ""), Service.version),
+                    "banner": func.coalesce(func.nullif(stmt.excluded.banner, ""), Service.banner),
+                    "last_seen": stmt.excluded.last_seen,
+                },
+                where=or_(
+                    *(
+                        and_(func.nullif(new, "").is_not(None), new.is_distinct_from(old))
+                        for new, old in (
+                            (stmt.excluded.name, Service.name),
+                            (stmt.excluded.product, Service.product),
+                            (stmt.excluded.version, Service.version),
+                            (stmt.excluded.banner, Service.banner),
+                        )
+                    )
+                ),
+            ).returning(Service.id, Service.asset_id, Service.proto, Service.port)
+            for service_id, asset_id, proto, port in await self.session.execute(stmt):
+                self.identity.services.ids[(asset_id, proto, port)] = service_id
+                written.add((asset_id, proto, port))
+        unchanged = {
+            (row["asset_id"], row["proto"], row["port"]): row["last_seen"]
+            for row in rows
+            if (row["asset_id"], row["proto"], row["port"]) not in written
+        }
+        await self._select_service_ids([key for key in unchanged if key not in self.identity.services.ids])
+        for key, seen_at in unchanged.items():
+            service_id = self.identity.services.ids.get(key)
+            if service_id is not None:
+                self.last_seen.service(service_id, seen_at)
+
+    async def _flush_findings(self) -> None:
+        findings = list(self.findings.values())
+        self.findings.clear()
+        await self._flush_plugins(findings)
+        rows = [
+            {
+                "project_id": self.project_id,
+                "finding_key": finding_key,
+                "title": title,
+                "severity": Severity(severity),
+                "description_override": description,
+                "remediation_override": remediation,
+                "references_override": references,
+                "scanner": scanner,
+                "scanner_id": scanner_id,
+            }
+            for (
+                finding_key,
+                title,
+                severity,
+                description,
+                remediation,
+                references,
+                scanner,
+                scanner_id,
+            ) in map(project_finding, findings)
+        ]
+        for chunk in _chunks(rows):
+            stmt = insert(Finding).values(chunk)
+            # A NULL override (every scanner finding) leaves whatever the project set alone.
+            overrides = [
+                (getattr(stmt.excluded, name), getattr(Finding, name))
+                for name in ("description_override", "remediation_override", "references_override")
+            ]
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_findings_project_key",
+                set_={
+                    "title": stmt.excluded.title,
+                    "severity": stmt.excluded.severity,
+                    "scanner": stmt.excluded.scanner,
+                    "scanner_id": stmt.excluded.scanner_id,
+                    **{new.key: func.coalesce(new, old) for new, old in overrides},
+                },
+                where=or_(
+                    tuple_(Finding.title, Finding.severity, Finding.scanner, Finding.scanner_id).is_distinct_from(
+                        tuple_(
+                            stmt.excluded.title,
+                            stmt.excluded.severity,
+                            stmt.excluded.scanner,
+                            stmt.excluded.scanner_id,
+                        )
+                    ),
+                    *(and_(new.is_not(None), new.is_distinct_from(old)) for new, old in overrides),
+                ),
+            ).returning(Finding.id, Finding.finding_key)
+            for finding_id, finding_key in await self.session.execute(stmt):
+                self.identity.findings.ids[finding_key] = finding_id
+        keys = [row["finding_key"] for row in rows]
+        await self._select_finding_ids([key for key in keys if key not in self.identity.findings.ids])
+
+    # Each plugin is upserted at most once per job; shards and batch files repeat them.
+    async def _flush_plugins(self, findings: list[tuple]) -> None:
+        fresh = [row for row in findings if row[7] is not None and (row[6], row[7]) not in self.stored_plugins]
+        if not fresh:
+            return
+        if self.catalog is None:
+            await upsert_plugins(self.session, fresh)
+        else:
+            await store_plugins(self.catalog, fresh)
+        self.stored_plugins.update((row[6], row[7]) for row in fresh)
+
+    async def _flush_instances(self) -> None:
+        await self._resolve_asset_ids({key[1] for key in self.instances})
+        await self._resolve_finding_ids({key[0] for key in self.instances})
+        asset_ids = self.identity.assets.ids
+        finding_ids = self.identity.findings.ids
+        service_ids = self.identity.services.ids
+        service_keys = {
+            (asset_ids[ip], proto, port)
+            for _, ip, proto, port in self.instances
+            if proto and port and ip in asset_ids
+        }
+        await self._resolve_service_ids(service_keys)
+
+        rows: dict[tuple[uuid.UUID, uuid.UUID, uuid.UUID | None], dict[str, Any]] = {}
+        blobs: dict[str, str] = {}
+        for finding_key, ip, proto, port, evidence, status, seen_at in self.instances.values():
+            asset_id = asset_ids.get(ip)
+            finding_id = finding_ids.get(finding_key)
+            if asset_id is None or finding_id is None:
+                continue
+            service_id = service_ids.get((asset_id, proto, port)) if proto and port else None
+            key = (finding_id, asset_id, service_id)
+            prev = rows.get(key)
+            evidence = truncate_evidence(evidence)
+            sha256 = None
+            if evidence is not None:
+                sha256 = evidence_sha256(evidence)
+                blobs[sha256] = evidence
+            elif prev:
+                sha256 = prev["evidence_sha256"]
+            rows[key] = {
+                "project_id": self.project_id,
+                "finding_id": finding_id,
+                "asset_id": asset_id,
+                "service_id": service_id,
+                "status": InstanceStatus(status),
+                "evidence_sha256": sha256,
+                "first_seen": prev["first_seen"] if prev else seen_at,
+                "last_seen": seen_at,
+            }
+        self.instances.clear()
+        await insert_evidence(self.session, await self._new_evidence(blobs))
+        for chunk in _chunks(list(rows.values())):
+            stmt = insert(Instance).values(chunk)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=INSTANCE_CONFLICT_TARGET,
+                set_={
+                    "evidence_sha256": stmt.excluded.evidence_sha256,
+                    "last_seen": stmt.excluded.last_seen,
+                },
+                where=and_(
+                    stmt.excluded.evidence_sha256.is_not(None),
+                    stmt.excluded.evidence_sha256.is_distinct_from(Instance.evidence_sha256),
+                ),
+            ).returning(Instance.finding_id, Instance.asset_id, Instance.service_id)
+            written = {tuple(row) for row in await self.session.execute(stmt)}
+            for row in chunk:
+                key = (row["finding_id"], row["asset_id"], row["service_id"])
+                if key not in written:
+                    self.last_seen.instance(key, row["last_seen"])
+
+    # Returns the blobs that still have to be written, dropping digests this job already
+    # stored and ones an earlier import left in evidence_blobs, whose bodies are not resent.
+    async def _new_evidence(self, blobs: dict[str, str]) -> list[tuple[str, str]]:
+        missing = [sha256 for sha256 in blobs if sha256 not in self.stored_evidence]
+        stored: set[str] = set()
+        for i in range(0, len(missing), MAX_ROWS_PER_STATEMENT):
+            chunk = missing[i : i + MAX_ROWS_PER_STATEMENT]
+            result = await self.session.execute(
+                select(EvidenceBlob.sha256).where(EvidenceBlob.sha256.in_(chunk))
+            )
+            stored.update(result.scalars())
+        self.stored_evidence.update(missing)
+        return [(sha256, blobs[sha256]) for sha256 in missing if sha256 not in stored]
+
+    async def _resolve_asset_ids(self, ips: set[str]) -> None:
+        await self._select_asset_ids(self.identity.assets.missing(ips))
+
+    async def _select_asset_ids(self, missing: list[str]) -> None:
+        if not missing:
+            return
+        result = await self.session.execute(
+            select(Asset.id, Asset.ip).where(Asset.project_id == self.project_id, Asset.ip.in_(missing))
+        )
+        for asset_id, ip in result:
+            self.identity.assets.ids[str(ip)] = asset_id
+
+    async def _resolve_finding_ids(self, keys: set[str]) -> None:
+        await self._select_finding_ids(self.identity.findings.missing(keys))
+
+    async def _select_finding_ids(self, missing: list[str]) -> None:
+        if not missing:
+            return
+        result = await self.session.execute(
+            select(Finding.id, Finding.finding_key).where(
+                Finding.project_id == self.project_id, Finding.finding_key.in_(missing)
+            )
+        )
+        for finding_id, finding_key in result:
+            self.identity.findings.ids[finding_key] = finding_id
+
+    async def _resolve_service_ids(self, keys: set[ServiceIdKey]) -> None:
+        await self._select_service_ids(self.identity.services.missing(keys))
+
+    async def _select_service_ids(self, missing: list[ServiceIdKey]) -> None:
+        if not missing:
+            return
+        result = await self.session.execute(
+            select(Service.id, Service.asset_id, Service.proto, Service.port).where(
+                tuple_(Service.asset_id, Service.proto, Service.port).in_(missing)
+            )
+        )
+        for service_id, asset_id, proto, port in result:
+            self.identity.services.ids[(asset_id, proto, port)] = service_id
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import sys
+import uuid
+from collections.abc import Hashable, Iterable
+
+from app.ingest.normalize import normalize_ip
+
+ServiceIdKey = tuple[uuid.UUID, str, int]
+InstanceIdKey = tuple[uuid.UUID, uuid.UUID, uuid.UUID | None]
+
+
+class _Cache:
+    __slots__ = ("ids", "hits", "misses")
+
+    def __init__(self) -> None:
+        self.ids: dict[Hashable, uuid.UUID] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> uuid.UUID | None:
+        found = self.ids.get(key)
+        if found is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return found
+
+    def missing(self, keys: Iterable[Hashable]) -> list[Hashable]:
+        out = []
+        for key in keys:
+            if key in self.ids:
+                self.hits += 1
+            else:
+                self.misses += 1
+                out.append(key)
+        return out
+
+
+class IdentityMap:
+    def __init__(self) -> None:
+        self.assets = _Cache()
+        self.services = _Cache()
+        self.findings = _Cache()
+        self.instances = _Cache()
+        self._ips: dict[str, str] = {}
+
+    def normalize_ip(self, raw: str) -> str:
+        found = self._ips.get(raw)
+        if found is None:
+            found = sys.intern(normalize_ip(raw))
+            self._ips[raw] = found
+        return found
+
+    def asset_id(self, ip: str) -> uuid.UUID | None:
+        return self.assets.get(ip)
+
+    def finding_id(self, finding_key: str) -> uuid.UUID | None:
+        return self.findings.get(finding_key)
+
+    def service_id(self, key: ServiceIdKey) -> uuid.UUID | None:
+        return self.services.get(key)
+
+    def instance_id(self, key: InstanceIdKey) -> uuid.UUID | None:
+        return self.instances.get(key)
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {
+            name: {"hits": cache.hits, "misses": cache.misses, "size": len(cache.ids)}
+            for name, cache in (
+                ("assets", self.assets),
+                ("services", self.services),
+                ("findings", self.findings),
+                ("instances", self.instances),
+            )
+        }
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import hashlib
 import ipaddress
-from dataclasses import dataclass
+from collections.abc import Iterator
+from dataclasses import dataclass, field
 from datetime import UTC, datetime
+from typing import NamedTuple
 
 
 def utcnow() -> datetime:
@@ -26,8 +29,14 @@ def truncate_evidence(value: str | None) -> str | None:
     return value[:65536]
 
 
-@dataclass(slots=True)
-class AssetRecord:
+# Evidence is stored once per distinct text in evidence_blobs, keyed by this digest.
+def evidence_sha256(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+# Records are named tuples so that the plain tuples adapters put in a RecordBatch line up
+# field-for-field with them; RecordBatch.records() only wraps, it never copies.
+class AssetRecord(NamedTuple):
     ip: str
     primary_hostname: str | None
     hostnames: list[str]
@@ -35,8 +44,7 @@ class AssetRecord:
     seen_at: datetime
 
 
-@dataclass(slots=True)
-class ServiceRecord:
+class ServiceRecord(NamedTuple):
     asset_ip: str
     proto: str
     port: int
@@ -47,8 +55,7 @@ class ServiceRecord:
     seen_at: datetime
 
 
-@dataclass(slots=True)
-class FindingRecord:
+class FindingRecord(NamedTuple):
     finding_key: str
     title: str
     severity: str
@@ -59,8 +66,7 @@ class FindingRecord:
     scanner_id: str | None
 
 
-@dataclass(slots=True)
-class InstanceRecord:
+class InstanceRecord(NamedTuple):
     finding_key: str
     asset_ip: str
     service_proto: str | None
@@ -68,3 +74,27 @@ class InstanceRecord:
     evidence_snippet: str | None
     status: str
     seen_at: datetime
+
+
+Record = AssetRecord | ServiceRecord | FindingRecord | InstanceRecord
+
+
+# What adapters yield: one column of plain tuples per entity, cut at host boundaries. Rows
+# within a batch share interned IP strings, finding keys and a single timestamp, which
+# keeps both the pickled size (the pool ships batches between processes) and the writer's
+# per-row work small.
+@dataclass(slots=True)
+class RecordBatch:
+    assets: list[tuple] = field(default_factory=list)
+    services: list[tuple] = field(default_factory=list)
+    findings: list[tuple] = field(default_factory=list)
+    instances: list[tuple] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.assets) + len(self.services) + len(self.findings) + len(self.instances)
+
+    def records(self) -> Iterator[Record]:
+        yield from map(AssetRecord._make, self.assets)
+        yield from map(ServiceRecord._make, self.services)
+        yield from map(FindingRecord._make, self.findings)
+        yield from map(InstanceRecord._make, self.instances)
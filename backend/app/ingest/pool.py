@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import multiprocessing
+import queue as queue_mod
+from collections.abc import AsyncIterator, Callable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any
+
+from app.ingest.adapters.nessus import iter_nessus_batches, parse_nessus_xml
+from app.ingest.adapters.nmap import iter_nmap_batches, parse_nmap_xml
+from app.ingest.adapters.xmlstream import resolve_backend
+from app.ingest.identity import IdentityMap
+from app.ingest.normalize import Record, RecordBatch
+
+PARSERS: dict[str, Callable[..., Iterator[Record]]] = {
+    "nmap": parse_nmap_xml,
+    "nessus": parse_nessus_xml,
+}
+
+BATCH_PARSERS: dict[str, Callable[..., Iterator[RecordBatch]]] = {
+    "nmap": iter_nmap_batches,
+    "nessus": iter_nessus_batches,
+}
+
+_POLL_SECONDS = 0.5
+
+
+class _Abandoned(Exception):
+    pass
+
+
+def _put(out: Any, item: Any, stop: Any) -> None:
+    while True:
+        try:
+            out.put(item, timeout=_POLL_SECONDS)
+            return
+        except queue_mod.Full:
+            if stop.is_set():
+                raise _Abandoned from None
+
+
+def _parse_into_queue(
+    source_type: str,
+    path: str,
+    out: Any,
+    stop: Any,
+    batch_size: int,
+    skip_hosts: int,
+    xml_backend: str,
+    part: int | None = None,
+    byte_range: tuple[int, int] | None = None,
+) -> None:
+    parser = BATCH_PARSERS[source_type]
+    stats: dict[str, int] = {}
+    kwargs = {"byte_range": byte_range} if byte_range is not None else {}
+    try:
+        batches = parser(
+            path,
+            identity=IdentityMap(),
+            stats=stats,
+            skip_hosts=skip_hosts,
+            xml_backend=xml_backend,
+            batch_size=batch_size,
+            **kwargs,
+        )
+        for batch in batches:
+            _put(out, (part, batch, dict(stats)), stop)
+        _put(out, (part, RecordBatch(), dict(stats)), stop)
+    except _Abandoned:
+        return
+    finally:
+        if not stop.is_set():
+            _put(out, (part, None, None), stop)
+
+
+def _next_item(out: Any, futures: list[Future]) -> tuple | None:
+    while True:
+        try:
+            return out.get(timeout=_POLL_SECONDS)
+        except queue_mod.Empty:
+            if all(future.done() for future in futures):
+                return None
+
+
+class ParserPool:
+    def __init__(self, *, processes: int = 2, queue_size: int = 8, xml_backend: str = "auto"):
+        self.processes = max(1, processes)
+        self.queue_size = max(1, queue_size)
+        resolve_backend(xml_backend)
+        self.xml_backend = xml_backend
+        self._executor: ProcessPoolExecutor | None = None
+        self._manager: Any = None
+
+    # Streams start the pool on first use, so a process that never parses (an API server
+    # without ingest workers, a CLI run of duplicate files) doesn't spawn it. Calling this
+    # up front just warms it.
+    def start(self) -> None:
+        if self._executor is not None:
+            return
+        ctx = multiprocessing.get_context("spawn")
+        self._manager = ctx.Manager()
+        self._executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=ctx)
+
+    def stop(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+    async def stream(
+        self,
+        source_type: str,
+        path: str,
+        *,
+        batch_size: int = 1000,
+        stats: dict | None = None,
+        skip_hosts: int = 0,
+    ) -> AsyncIterator[RecordBatch]:
+        self.start()
+        out = self._manager.Queue(maxsize=self.queue_size)
+        stop = self._manager.Event()
+        # A resumed parse only counts duplicates among the hosts it parses.
+        suppressed = stats.get("duplicate_findings_suppressed", 0) if stats and skip_hosts else 0
+        future = self._executor.submit(
+            _parse_into_queue, source_type, path, out, stop, batch_size, skip_hosts, self.xml_backend
+        )
+        try:
+            while True:
+                item = await asyncio.to_thread(_next_item, out, [future])
+                if item is None:
+                    break
+                _, batch, parser_stats = item
+                if batch is None:
+                    break
+                # Parser-side counters ride along with each batch and are merged into the
+                # caller's stats, so they are current whenever a batch is handed over.
+                # Batches end on host boundaries, which makes "hosts" usable as a resume
+                # checkpoint.
+                if stats is not None:
+                    stats.update(parser_stats)
+                    if "duplicate_findings_suppressed" in parser_stats:
+                        stats["duplicate_findings_suppressed"] += suppressed
+                if batch:
+                    yield batch
+            await asyncio.wrap_future(future)
+        finally:
+            stop.set()
+
+    # Parses several inputs at once, one task per part, so they are spread over every parser
+    # process. A part is (source_type, path, byte_range or None); its entry in `state` keeps
+    # "hosts", "bytes_read" and "done" current as batches are handed over, and a part already
+    # marked done is skipped. Batches arrive interleaved across parts, tagged with the part's
+    # index. The empty batch that ends each part is passed on too.
+    async def stream_parts(
+        self,
+        parts: list[tuple[str, str, tuple[int, int] | None]],
+        state: list[dict],
+        *,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[tuple[int, RecordBatch]]:
+        todo = [index for index in range(len(parts)) if not state[index].get("done")]
+        if not todo:
+            return
+        self.start()
+        out = self._manager.Queue(maxsize=self.queue_size)
+        stop = self._manager.Event()
+        futures: dict[int, Future] = {}
+        suppressed: dict[int, int] = {}
+        for index in todo:
+            source_type, path, byte_range = parts[index]
+            if state[index].get("hosts", 0):
+                suppressed[index] = state[index].get("duplicate_findings_suppressed", 0)
+            futures[index] = self._executor.submit(
+                _parse_into_queue,
+                source_type,
+                path,
+                out,
+                stop,
+                batch_size,
+                state[index].get("hosts", 0),
+                self.xml_backend,
+                index,
+                byte_range,
+            )
+        try:
+            pending = set(futures)
+            while pending:
+                item = await asyncio.to_thread(_next_item, out, list(futures.values()))
+                if item is None:
+                    break
+                index, batch, parser_stats = item
+                if batch is None:
+                    pending.discard(index)
+                    await asyncio.wrap_future(futures[index])
+                    continue
+                entry = state[index]
+                byte_range = parts[index][2]
+                start = byte_range[0] if byte_range else 0
+                # The trailing empty batch is only sent once the whole part has been parsed.
+                entry["done"] = not batch
+                entry["hosts"] = parser_stats["hosts"]
+                entry["bytes_read"] = max(entry.get("bytes_read", 0), parser_stats["bytes_read"] - start)
+                entry["duplicate_findings_suppressed"] = suppressed.get(index, 0) + parser_stats.get(
+                    "duplicate_findings_suppressed", 0
+                )
+                yield index, batch
+            for future in futures.values():
+                await asyncio.wrap_future(future)
+        finally:
+            stop.set()
+            for future in futures.values():
+                future.cancel()
+
+    # Parses the shards of one file (see app.ingest.shards.plan_shards) in parallel. Each
+    # shard emits the findings its own instances reference, so rows resolve whatever order
+    # shards land in.
+    async def stream_shards(
+        self,
+        source_type: str,
+        path: str,
+        shards: list[dict],
+        *,
+        batch_size: int = 1000,
+        stats: dict | None = None,
+    ) -> AsyncIterator[RecordBatch]:
+        parts = [(source_type, path, (shard["start"], shard["end"])) for shard in shards]
+        batches = self.stream_parts(parts, shards, batch_size=batch_size)
+        async with contextlib.aclosing(batches):
+            async for _, batch in batches:
+                if stats is not None:
+                    stats["shards"] = len(shards)
+                    stats["hosts"] = sum(s["hosts"] for s in shards)
+                    stats["bytes_read"] = shards[0]["start"] + sum(s["bytes_read"] for s in shards)
+                    stats["duplicate_findings_suppressed"] = sum(
+                        s.get("duplicate_findings_suppressed", 0) for s in shards
+                    )
+                if batch:
+                    yield batch
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import time
+
+
+# Progress is the share of the upload the parser has consumed, so it tracks real work on
+# files of any size. Rates only cover the current attempt: a resumed job starts measuring
+# from its checkpoint rather than from the beginning of the file.
+class IngestProgress:
+    def __init__(self, total_bytes: int, *, start_bytes: int = 0, start_hosts: int = 0):
+        self.total_bytes = max(1, total_bytes)
+        self.start_bytes = start_bytes
+        self.start_hosts = start_hosts
+        self.records = 0
+        self.started = time.monotonic()
+
+    def percent(self, bytes_read: int) -> int:
+        # 100 is reserved for the final status update after the last commit.
+        return max(1, min(99, bytes_read * 100 // self.total_bytes))
+
+    def update(self, counters: dict) -> int:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        bytes_read = counters.get("bytes_read", 0)
+        byte_rate = max(0, bytes_read - self.start_bytes) / elapsed
+        counters["upload_bytes"] = self.total_bytes
+        counters["elapsed_seconds"] = round(elapsed, 1)
+        counters["records_per_sec"] = round(self.records / elapsed, 1)
+        counters["hosts_per_sec"] = round(max(0, counters.get("hosts", 0) - self.start_hosts) / elapsed, 2)
+        counters["eta_seconds"] = (
+            round(max(0, self.total_bytes - bytes_read) / byte_rate) if byte_rate > 0 else None
+        )
+        return self.percent(bytes_read)
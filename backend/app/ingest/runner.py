@@ -3,60 +3,310 @@ from __future__ import annotations
 import asyncio
 import contextlib
 import logging
+import os
+import socket
+import time
 import uuid
+from collections.abc import AsyncIterator
 from pathlib import Path
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import noload
 
-from app.crud import truncate_evidence, update_job_status, utcnow
+from app.config import Settings
+from app.crud import (
+    INGEST_NOTIFY_CHANNEL,
+    claim_ingest_job,
+    ingest_cancel_requested,
+    ingest_queue_stats,
+    reindex_search_vectors,
+    renew_ingest_job_lease,
+    store_evidence,
+    update_job_status,
+    utcnow,
+)
 from app.enums import IngestStatus, InstanceStatus, Severity
-from app.ingest.adapters.nessus import parse_nessus_xml
-from app.ingest.adapters.nmap import parse_nmap_xml
-from app.ingest.normalize import AssetRecord, FindingRecord, InstanceRecord, ServiceRecord
+from app.ingest.bulk import BulkWriter, LastSeen, insert_evidence, project_finding, store_plugins
+from app.ingest.identity import IdentityMap
+from app.ingest.normalize import (
+    AssetRecord,
+    FindingRecord,
+    InstanceRecord,
+    RecordBatch,
+    ServiceRecord,
+    evidence_sha256,
+    truncate_evidence,
+)
+from app.ingest.pool import ParserPool
+from app.ingest.progress import IngestProgress
+from app.ingest.shards import plan_shards
+from app.ingest.staging import StagingWriter
 from app.models import Asset, Finding, IngestJob, Instance, Service
 
 log = logging.getLogger(__name__)
 
 
+def _count(counters: dict, batch: RecordBatch) -> None:
+    counters["assets"] += len(batch.assets)
+    counters["services"] += len(batch.services)
+    counters["findings"] += len(batch.findings)
+    counters["instances"] += len(batch.instances)
+
+
+class IngestCancelled(Exception):
+    pass
+
+
+# Called right after each commit, so a cancelled job stops on a consistent state.
+async def _stop_if_cancelled(session: AsyncSession, job_id: uuid.UUID) -> None:
+    if await ingest_cancel_requested(session, job_id):
+        raise IngestCancelled
+
+
+def _reset_file(entry: dict) -> dict:
+    if entry.get("duplicate_of"):
+        return dict(entry)
+    return {
+        **entry,
+        "status": "queued",
+        "hosts": 0,
+        "bytes_read": 0,
+        "done": False,
+        "duplicate_findings_suppressed": 0,
+        "assets": 0,
+        "services": 0,
+        "findings": 0,
+        "instances": 0,
+    }
+
+
+def _checkpoint(counters: dict, shards: list[dict] | None = None) -> dict:
+    checkpoint = {
+        "hosts": counters.get("hosts", 0),
+        "offset": counters.get("bytes_read", 0),
+        "duplicate_findings_suppressed": counters.get("duplicate_findings_suppressed", 0),
+    }
+    if shards:
+        checkpoint["shards"] = [dict(shard) for shard in shards]
+    return checkpoint
+
+
 class IngestRunner:
-    def __init__(self, sessionmaker: async_sessionmaker[AsyncSession], data_dir: Path):
+    def __init__(
+        self,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        data_dir: Path,
+        *,
+        mode: str = "bulk",
+        batch_size: int = 1000,
+        workers: int = 2,
+        parse_processes: int = 2,
+        parse_queue_size: int = 8,
+        xml_backend: str = "auto",
+        copy_threshold_bytes: int = 256 * 1024 * 1024,
+        shard_threshold_bytes: int = 512 * 1024 * 1024,
+        shard_bytes: int = 64 * 1024 * 1024,
+        index_batch_size: int = 1000,
+        lease_seconds: int = 60,
+        poll_seconds: float = 2.0,
+        max_attempts: int = 3,
+    ):
+        if mode not in {"bulk", "row"}:
+            raise ValueError("ingest mode must be bulk or row")
         self.sessionmaker = sessionmaker
         self.data_dir = data_dir
-        self.queue: asyncio.Queue[uuid.UUID] = asyncio.Queue()
-        self._task: asyncio.Task | None = None
+        self.mode = mode
+        self.batch_size = batch_size
+        self.copy_threshold_bytes = copy_threshold_bytes
+        self.shard_threshold_bytes = shard_threshold_bytes
+        self.shard_bytes = max(1, shard_bytes)
+        self.index_batch_size = max(1, index_batch_size)
+        self.workers = max(1, workers)
+        self.parsers = ParserPool(
+            processes=parse_processes, queue_size=parse_queue_size, xml_backend=xml_backend
+        )
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._running: dict[uuid.UUID, asyncio.Task] = {}
+        self._tasks: list[asyncio.Task] = []
         self._stop = asyncio.Event()
+        self._wake = asyncio.Event()
+        self._index_wake = asyncio.Event()
 
-    async def start(self) -> None:
+    @classmethod
+    def from_settings(
+        cls, sessionmaker: async_sessionmaker[AsyncSession], settings: Settings
+    ) -> IngestRunner:
+        return cls(
+            sessionmaker,
+            settings.data_dir,
+            mode=settings.ingest_mode,
+            batch_size=settings.ingest_batch_size,
+            workers=settings.ingest_workers,
+            parse_processes=settings.ingest_parse_processes,
+            parse_queue_size=settings.ingest_parse_queue_size,
+            xml_backend=settings.ingest_xml_backend,
+            copy_threshold_bytes=settings.ingest_copy_threshold_bytes,
+            shard_threshold_bytes=settings.ingest_shard_threshold_bytes,
+            shard_bytes=settings.ingest_shard_bytes,
+            index_batch_size=settings.ingest_index_batch_size,
+            lease_seconds=settings.ingest_lease_seconds,
+            poll_seconds=settings.ingest_poll_seconds,
+            max_attempts=settings.ingest_max_attempts,
+        )
+
+    async def start(self, *, claim_jobs: bool = True) -> None:
         self._stop.clear()
-        self._task = asyncio.create_task(self._loop(), name="ingest-runner")
+        if not claim_jobs:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"ingest-worker-{n}") for n in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._listen(), name="ingest-listen"))
+        self._tasks.append(asyncio.create_task(self._index(), name="ingest-search-index"))
 
     async def stop(self) -> None:
         self._stop.set()
-        if self._task:
-            self._task.cancel()
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
             with contextlib.suppress(asyncio.CancelledError):
-                await self._task
+                await task
+        self._tasks = []
+        self.parsers.stop()
+
+    async def enqueue(self, job_id: uuid.UUID, project_id: uuid.UUID) -> None:
+        # The job row is already queued in Postgres; just cut the idle poll short.
+        self._wake.set()
 
-    async def enqueue(self, job_id: uuid.UUID) -> None:
-        await self.queue.put(job_id)
+    async def snapshot(self, session: AsyncSession) -> dict:
+        queued, running = await ingest_queue_stats(session)
+        # Queue depth and running jobs are global; the worker counts only cover this process,
+        # which has none when ingest runs in a separate doghouse-worker.
+        return {
+            "workers": self.workers if self._tasks else 0,
+            "active_workers": len(self._running),
+            "queue_depth": queued,
+            "running_jobs": [
+                {"project_id": row.project_id, "job_id": row.id, "lease_owner": row.lease_owner} for row in running
+            ],
+        }
+
+    async def _worker(self) -> None:
+        while not self._stop.is_set():
+            async with self.sessionmaker() as session:
+                job_id = await claim_ingest_job(
+                    session,
+                    worker_id=self.worker_id,
+                    lease_seconds=self.lease_seconds,
+                    max_attempts=self.max_attempts,
+                )
+            if job_id is None:
+                self._wake.clear()
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_seconds)
+                continue
+
+            await self.run_claimed(job_id)
+
+    # Runs a job this runner holds the lease on, renewing the lease until it is done. Workers
+    # get here through claim_ingest_job; the CLI through create_claimed_ingest_job.
+    async def run_claimed(self, job_id: uuid.UUID) -> None:
+        task = asyncio.create_task(self._run_job(job_id), name=f"ingest-job-{job_id}")
+        self._running[job_id] = task
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, task))
+        try:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        finally:
+            heartbeat.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await heartbeat
+            del self._running[job_id]
+            self._index_wake.set()
+
+    # Rebuilds the search vectors of every flagged row, one batch per transaction.
+    async def reindex(self) -> int:
+        total = 0
+        while True:
+            async with self.sessionmaker() as session:
+                indexed = await reindex_search_vectors(session, limit=self.index_batch_size)
+            if not indexed:
+                return total
+            total += indexed
+
+    # Row triggers only flag changed text; this catches search up in the background. It holds
+    # off while this process has jobs running, so imports don't wait on text analysis, and
+    # otherwise wakes when a job ends or every poll interval for edits made through the API.
+    async def _index(self) -> None:
+        while not self._stop.is_set():
+            indexed = 0
+            if not self._running:
+                try:
+                    async with self.sessionmaker() as session:
+                        indexed = await reindex_search_vectors(session, limit=self.index_batch_size)
+                except Exception:  # noqa: BLE001
+                    log.warning("search indexing failed", exc_info=True)
+            if indexed:
+                continue
+            self._index_wake.clear()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._index_wake.wait(), timeout=self.poll_seconds)
+
+    # Jobs created by any process (API, CLI) NOTIFY on commit, which wakes idle workers here
+    # straight away; the poll in _worker remains the fallback if this connection drops.
+    async def _listen(self) -> None:
+        engine = self.sessionmaker.kw["bind"]
+
+        def _notified(*_: object) -> None:
+            self._wake.set()
 
-    async def _loop(self) -> None:
         while not self._stop.is_set():
-            job_id = await self.queue.get()
             try:
-                await self._process_job(job_id)
-            except Exception as exc:  # noqa: BLE001
-                log.exception("ingest job failed", extra={"job_id": str(job_id)})
-                async with self.sessionmaker() as session:
-                    await update_job_status(
-                        session,
-                        job_id,
-                        status=IngestStatus.failed,
-                        progress=100,
-                        error=str(exc),
-                        finished_at=utcnow(),
-                    )
+                async with engine.connect() as conn:
+                    raw = (await conn.get_raw_connection()).driver_connection
+                    await raw.add_listener(INGEST_NOTIFY_CHANNEL, _notified)
+                    try:
+                        while not raw.is_closed() and not self._stop.is_set():
+                            with contextlib.suppress(asyncio.TimeoutError):
+                                await asyncio.wait_for(self._stop.wait(), timeout=self.lease_seconds)
+                    finally:
+                        if not raw.is_closed():
+                            await raw.remove_listener(INGEST_NOTIFY_CHANNEL, _notified)
+            except Exception:  # noqa: BLE001
+                log.warning("ingest notification listener failed", exc_info=True)
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._stop.wait(), timeout=self.poll_seconds)
+
+    async def _heartbeat(self, job_id: uuid.UUID, task: asyncio.Task) -> None:
+        while not task.done():
+            await asyncio.sleep(self.lease_seconds / 3)
+            async with self.sessionmaker() as session:
+                owned = await renew_ingest_job_lease(
+                    session, job_id, worker_id=self.worker_id, lease_seconds=self.lease_seconds
+                )
+            if not owned and not task.done():
+                log.warning("ingest job lease lost", extra={"job_id": str(job_id)})
+                task.cancel()
+                return
+
+    async def _run_job(self, job_id: uuid.UUID) -> None:
+        try:
+            await self._process_job(job_id)
+        except Exception as exc:  # noqa: BLE001
+            log.exception("ingest job failed", extra={"job_id": str(job_id)})
+            async with self.sessionmaker() as session:
+                await update_job_status(
+                    session,
+                    job_id,
+                    status=IngestStatus.failed,
+                    progress=100,
+                    error=str(exc),
+                    finished_at=utcnow(),
+                )
 
     async def _process_job(self, job_id: uuid.UUID) -> None:
         async with self.sessionmaker() as session:
@@ -67,47 +317,116 @@ class IngestRunner:
             upload_rel = stats.get("upload_relative_path")
             if not upload_rel:
                 raise RuntimeError("job missing upload path")
+            files = stats.get("files") if job.source_type == "batch" else None
 
             await update_job_status(
                 session,
                 job_id,
                 status=IngestStatus.running,
-                progress=1,
-                started_at=utcnow(),
+                progress=job.progress or 1,
+                started_at=job.started_at or utcnow(),
             )
 
             upload_path = self.data_dir / upload_rel
-            if not upload_path.exists():
+            if not upload_path.exists() or any(
+                not (self.data_dir / entry["upload_relative_path"]).exists()
+                for entry in files or []
+                if not entry.get("duplicate_of")
+            ):
                 raise RuntimeError("upload file not found")
 
-            parser = parse_nmap_xml if job.source_type == "nmap" else parse_nessus_xml
-            counters = {"assets": 0, "services": 0, "findings": 0, "instances": 0}
+            source_type = "nmap" if job.source_type == "nmap" else "nessus"
+            # A job reclaimed after a crash resumes after the last host it committed; the
+            # record counters in its stats already cover everything before that point.
+            checkpoint = stats.get("checkpoint") or {}
+            skip_hosts = int(checkpoint.get("hosts", 0))
+            counters: dict = dict(stats)
+            if skip_hosts:
+                counters["resumed"] = counters.get("resumed", 0) + 1
+                # The parser adds to this. A finding it already saw before the checkpoint is
+                # emitted again the first time it recurs, so that recurrence is not counted.
+                counters["duplicate_findings_suppressed"] = int(
+                    checkpoint.get("duplicate_findings_suppressed", 0)
+                )
+            else:
+                counters.update(assets=0, services=0, findings=0, instances=0)
+            identity = IdentityMap()
+            if files is not None:
+                upload_size = sum(entry["upload_size"] for entry in files)
+            else:
+                upload_size = upload_path.stat().st_size
+            # Big Nessus exports are split into runs of whole hosts that are parsed in
+            # parallel. A sharded job resumes from the shards in its checkpoint; one that
+            # was checkpointed serially stays serial.
+            shards = checkpoint.get("shards")
+            if (
+                shards is None
+                and not skip_hosts
+                and files is None
+                and source_type == "nessus"
+                and self.shard_threshold_bytes
+                and upload_size >= self.shard_threshold_bytes
+            ):
+                shards = await asyncio.to_thread(plan_shards, upload_path, self.shard_bytes)
+            if files is not None:
+                shards = None
+                # Per-file state in the stats is committed together with the checkpoint, so
+                # a resumed batch carries on from it; otherwise every file starts over.
+                files = [dict(entry) if skip_hosts else _reset_file(entry) for entry in files]
+                counters["files"] = files
+                batches = self._stream_files(files, counters)
+            elif shards and len(shards) > 1:
+                batches = self.parsers.stream_shards(
+                    source_type, str(upload_path), shards, batch_size=self.batch_size, stats=counters
+                )
+            else:
+                shards = None
+                batches = self.parsers.stream(
+                    source_type,
+                    str(upload_path),
+                    batch_size=self.batch_size,
+                    stats=counters,
+                    skip_hosts=skip_hosts,
+                )
 
-            for idx, rec in enumerate(parser(str(upload_path)), start=1):
-                if isinstance(rec, AssetRecord):
-                    await self._upsert_asset(session, job.project_id, rec)
-                    counters["assets"] += 1
-                elif isinstance(rec, ServiceRecord):
-                    await self._upsert_service(session, job.project_id, rec)
-                    counters["services"] += 1
-                elif isinstance(rec, FindingRecord):
-                    await self._upsert_finding(session, job.project_id, rec)
-                    counters["findings"] += 1
-                elif isinstance(rec, InstanceRecord):
-                    await self._upsert_instance(session, job.project_id, rec)
-                    counters["instances"] += 1
+            progress = IngestProgress(
+                upload_size, start_bytes=int(checkpoint.get("offset", 0)), start_hosts=skip_hosts
+            )
+            mode = self.mode
+            if mode == "bulk" and upload_size >= self.copy_threshold_bytes:
+                mode = "copy"
+            counters["ingest_mode"] = mode
 
-                if idx % 250 == 0:
-                    await session.commit()
-                    await update_job_status(
-                        session,
-                        job_id,
-                        status=IngestStatus.running,
-                        progress=min(95, 1 + idx // 250),
-                        stats=counters,
-                    )
+            try:
+                async with contextlib.aclosing(batches):
+                    if mode == "copy":
+                        await self._ingest_copy(
+                            session, job_id, job.project_id, batches, counters, identity, progress
+                        )
+                    elif mode == "bulk":
+                        await self._ingest_bulk(
+                            session, job_id, job.project_id, batches, counters, identity, progress, shards
+                        )
+                    else:
+                        await self._ingest_rows(
+                            session, job_id, job.project_id, batches, counters, identity, progress, shards
+                        )
+            except IngestCancelled:
+                # Everything up to the last commit stays; staged copy-mode rows are rolled
+                # back with their session, so nothing of theirs was written.
+                await session.rollback()
+                if mode == "copy":
+                    counters.update(assets=0, services=0, findings=0, instances=0)
+                counters.pop("checkpoint", None)
+                await update_job_status(
+                    session, job_id, status=IngestStatus.cancelled, stats=counters, finished_at=utcnow()
+                )
+                return
 
-            await session.commit()
+            progress.update(counters)
+            counters["eta_seconds"] = 0
+            counters["identity_cache"] = identity.stats()
+            counters.pop("checkpoint", None)
             await update_job_status(
                 session,
                 job_id,
@@ -117,21 +436,228 @@ class IngestRunner:
                 finished_at=utcnow(),
             )
 
-    async def _upsert_asset(self, session: AsyncSession, project_id: uuid.UUID, rec: AssetRecord) -> Asset:
-        row = await session.scalar(
-            select(Asset).where(Asset.project_id == project_id, Asset.ip == rec.ip)
+    # All files of a batch job are parsed concurrently and feed one writer, so they share its
+    # identity caches and buffers.
+    # CLI imports reference files in place by absolute path, which the data_dir join keeps.
+    async def _stream_files(self, files: list[dict], counters: dict) -> AsyncIterator[RecordBatch]:
+        parts = [
+            (entry["source_type"], str(self.data_dir / entry["upload_relative_path"]), None)
+            for entry in files
+        ]
+        started = time.monotonic()
+        batches = self.parsers.stream_parts(parts, files, batch_size=self.batch_size)
+        async with contextlib.aclosing(batches):
+            async for index, batch in batches:
+                entry = files[index]
+                _count(entry, batch)
+                entry["status"] = "succeeded" if entry["done"] else "running"
+                entry["parse_seconds"] = round(time.monotonic() - started, 3)
+                counters["hosts"] = sum(f["hosts"] for f in files)
+                counters["bytes_read"] = sum(f["bytes_read"] for f in files)
+                counters["duplicate_findings_suppressed"] = sum(
+                    f.get("duplicate_findings_suppressed", 0) for f in files
+                )
+                if batch:
+                    yield batch
+
+    async def _ingest_bulk(
+        self,
+        session: AsyncSession,
+        job_id: uuid.UUID,
+        project_id: uuid.UUID,
+        batches: AsyncIterator[RecordBatch],
+        counters: dict,
+        identity: IdentityMap,
+        progress: IngestProgress,
+        shards: list[dict] | None = None,
+    ) -> None:
+        writer = BulkWriter(
+            session, project_id, identity=identity, batch_size=self.batch_size, catalog=self.sessionmaker
         )
+        async for batch in batches:
+            writer.add_batch(batch)
+            _count(counters, batch)
+            progress.records += len(batch)
+            if writer.full:
+                await writer.sync()
+                # update_job_status commits, so the checkpoint lands in the same
+                # transaction as the rows it covers.
+                await update_job_status(
+                    session,
+                    job_id,
+                    status=IngestStatus.running,
+                    progress=progress.update(counters),
+                    stats={
+                        **counters,
+                        "checkpoint": _checkpoint(counters, shards),
+                        "identity_cache": identity.stats(),
+                    },
+                )
+                await _stop_if_cancelled(session, job_id)
+        await writer.sync()
+        await session.commit()
+
+    async def _ingest_copy(
+        self,
+        session: AsyncSession,
+        job_id: uuid.UUID,
+        project_id: uuid.UUID,
+        batches: AsyncIterator[RecordBatch],
+        counters: dict,
+        identity: IdentityMap,
+        progress: IngestProgress,
+    ) -> None:
+        # Staging runs on its own session: progress updates commit `session`, while the
+        # staging transaction must stay open until the merge.
+        async with self.sessionmaker() as staging:
+            writer = StagingWriter(
+                staging, project_id, identity=identity, batch_size=self.batch_size, catalog=self.sessionmaker
+            )
+            async for batch in batches:
+                writer.add_batch(batch)
+                _count(counters, batch)
+                progress.records += len(batch)
+                if writer.full:
+                    await writer.flush()
+                    counters["copy_seconds"] = round(writer.copy_seconds, 3)
+                    await update_job_status(
+                        session,
+                        job_id,
+                        status=IngestStatus.running,
+                        progress=progress.update(counters),
+                        stats={**counters, "identity_cache": identity.stats()},
+                    )
+                    await _stop_if_cancelled(session, job_id)
+            await _stop_if_cancelled(session, job_id)
+            await writer.merge()
+            await staging.commit()
+        counters["copy_seconds"] = round(writer.copy_seconds, 3)
+        counters["merge_seconds"] = round(writer.merge_seconds, 3)
+
+    async def _ingest_rows(
+        self,
+        session: AsyncSession,
+        job_id: uuid.UUID,
+        project_id: uuid.UUID,
+        batches: AsyncIterator[RecordBatch],
+        counters: dict,
+        identity: IdentityMap,
+        progress: IngestProgress,
+        shards: list[dict] | None = None,
+    ) -> None:
+        touched = LastSeen()
+        stored_plugins: set[tuple[str, str]] = set()
+        async for batch in batches:
+            # The batch's catalog plugins are committed first, on their own (see store_plugins).
+            plugins = [
+                row for row in batch.findings if row[7] is not None and (row[6], row[7]) not in stored_plugins
+            ]
+            if plugins:
+                await store_plugins(self.sessionmaker, plugins)
+                stored_plugins.update((row[6], row[7]) for row in plugins)
+            # The batch's evidence goes in first, in digest order (see insert_evidence); the
+            # per-record inserts below then find it already there.
+            blobs: dict[str, str] = {}
+            for row in batch.instances:
+                evidence = truncate_evidence(row[4])
+                if evidence is not None:
+                    blobs[evidence_sha256(evidence)] = evidence
+            await insert_evidence(session, blobs.items())
+            for rec in batch.records():
+                if isinstance(rec, AssetRecord):
+                    await self._upsert_asset(session, project_id, rec, identity, touched)
+                elif isinstance(rec, ServiceRecord):
+                    await self._upsert_service(session, project_id, rec, identity, touched)
+                elif isinstance(rec, FindingRecord):
+                    await self._upsert_finding(session, project_id, rec, identity)
+                elif isinstance(rec, InstanceRecord):
+                    await self._upsert_instance(session, project_id, rec, identity, touched)
+            _count(counters, batch)
+            progress.records += len(batch)
+            await touched.apply(session, project_id)
+            await update_job_status(
+                session,
+                job_id,
+                status=IngestStatus.running,
+                progress=progress.update(counters),
+                stats={
+                    **counters,
+                    "checkpoint": _checkpoint(counters, shards),
+                    "identity_cache": identity.stats(),
+                },
+            )
+            await _stop_if_cancelled(session, job_id)
+        await touched.apply(session, project_id)
+        await session.commit()
+
+    async def _asset_id(
+        self, session: AsyncSession, project_id: uuid.UUID, ip: str, identity: IdentityMap
+    ) -> uuid.UUID | None:
+        asset_id = identity.asset_id(ip)
+        if asset_id is None:
+            asset_id = await session.scalar(
+                select(Asset.id).where(Asset.project_id == project_id, Asset.ip == ip)
+            )
+            if asset_id is not None:
+                identity.assets.ids[ip] = asset_id
+        return asset_id
+
+    async def _finding_id(
+        self, session: AsyncSession, project_id: uuid.UUID, finding_key: str, identity: IdentityMap
+    ) -> uuid.UUID | None:
+        finding_id = identity.finding_id(finding_key)
+        if finding_id is None:
+            finding_id = await session.scalar(
+                select(Finding.id).where(Finding.project_id == project_id, Finding.finding_key == finding_key)
+            )
+            if finding_id is not None:
+                identity.findings.ids[finding_key] = finding_id
+        return finding_id
+
+    async def _service_id(
+        self, session: AsyncSession, key: tuple[uuid.UUID, str, int], identity: IdentityMap
+    ) -> uuid.UUID | None:
+        service_id = identity.service_id(key)
+        if service_id is None:
+            asset_id, proto, port = key
+            service_id = await session.scalar(
+                select(Service.id).where(
+                    Service.asset_id == asset_id, Service.proto == proto, Service.port == port
+                )
+            )
+            if service_id is not None:
+                identity.services.ids[key] = service_id
+        return service_id
+
+    async def _upsert_asset(
+        self,
+        session: AsyncSession,
+        project_id: uuid.UUID,
+        rec: AssetRecord,
+        identity: IdentityMap,
+        touched: LastSeen,
+    ) -> Asset:
+        asset_id = await self._asset_id(session, project_id, rec.ip, identity)
+        row = await session.get(Asset, asset_id) if asset_id else None
         if row:
+            changed = False
             names = set(row.hostnames or [])
-            names.update(rec.hostnames)
-            row.hostnames = sorted(names)
+            if not names.issuperset(rec.hostnames):
+                row.hostnames = sorted(names.union(rec.hostnames))
+                changed = True
             if rec.primary_hostname and not row.primary_hostname:
                 row.primary_hostname = rec.primary_hostname
+                changed = True
             if rec.os_name and not row.os_name:
                 row.os_name = rec.os_name
-            row.last_seen = rec.seen_at
+                changed = True
+            if changed:
+                row.last_seen = rec.seen_at
+            else:
+                touched.asset(row.id, rec.seen_at)
             return row
         row = Asset(
+            id=uuid.uuid4(),
             project_id=project_id,
             ip=rec.ip,
             primary_hostname=rec.primary_hostname,
@@ -142,29 +668,42 @@ class IngestRunner:
             last_seen=rec.seen_at,
         )
         session.add(row)
+        await session.flush()
+        identity.assets.ids[rec.ip] = row.id
         return row
 
-    async def _upsert_service(self, session: AsyncSession, project_id: uuid.UUID, rec: ServiceRecord) -> Service | None:
-        asset = await session.scalar(
-            select(Asset).where(Asset.project_id == project_id, Asset.ip == rec.asset_ip)
-        )
-        if not asset:
+    async def _upsert_service(
+        self,
+        session: AsyncSession,
+        project_id: uuid.UUID,
+        rec: ServiceRecord,
+        identity: IdentityMap,
+        touched: LastSeen,
+    ) -> Service | None:
+        asset_id = await self._asset_id(session, project_id, rec.asset_ip, identity)
+        if not asset_id:
             return None
-        row = await session.scalar(
-            select(Service).where(
-                Service.asset_id == asset.id, Service.proto == rec.proto, Service.port == rec.port
-            )
-        )
+        key = (asset_id, rec.proto, rec.port)
+        service_id = await self._service_id(session, key, identity)
+        row = await session.get(Service, service_id) if service_id else None
         if row:
-            row.name = rec.name or row.name
-            row.product = rec.product or row.product
-            row.version = rec.version or row.version
-            row.banner = rec.banner or row.banner
-            row.last_seen = rec.seen_at
+            current = (row.name, row.product, row.version, row.banner)
+            merged = (
+                rec.name or row.name,
+                rec.product or row.product,
+                rec.version or row.version,
+                rec.banner or row.banner,
+            )
+            if merged != current:
+                row.name, row.product, row.version, row.banner = merged
+                row.last_seen = rec.seen_at
+            else:
+                touched.service(row.id, rec.seen_at)
             return row
         row = Service(
+            id=uuid.uuid4(),
             project_id=project_id,
-            asset_id=asset.id,
+            asset_id=asset_id,
             proto=rec.proto,
             port=rec.port,
             name=rec.name,
@@ -175,80 +714,102 @@ class IngestRunner:
             last_seen=rec.seen_at,
         )
         session.add(row)
+        await session.flush()
+        identity.services.ids[key] = row.id
         return row
 
-    async def _upsert_finding(self, session: AsyncSession, project_id: uuid.UUID, rec: FindingRecord) -> Finding:
-        row = await session.scalar(
-            select(Finding).where(Finding.project_id == project_id, Finding.finding_key == rec.finding_key)
-        )
+    async def _upsert_finding(
+        self, session: AsyncSession, project_id: uuid.UUID, rec: FindingRecord, identity: IdentityMap
+    ) -> Finding:
+        rec = FindingRecord(*project_finding(rec))
+        finding_id = await self._finding_id(session, project_id, rec.finding_key, identity)
+        row = await session.get(Finding, finding_id, options=[noload(Finding.plugin)]) if finding_id else None
         if row:
-            row.title = rec.title
-            row.severity = Severity(rec.severity)
-            row.description = rec.description
-            row.remediation = rec.remediation
-            row.references = rec.references
-            row.scanner = rec.scanner
-            row.scanner_id = rec.scanner_id
-            row.updated_at = utcnow()
+            incoming = (rec.title, Severity(rec.severity), rec.scanner, rec.scanner_id)
+            # updated_at is maintained by the findings trigger, which only fires on a real write.
+            if incoming != (row.title, row.severity, row.scanner, row.scanner_id):
+                row.title, row.severity, row.scanner, row.scanner_id = incoming
+            # Scanner findings carry no text, which leaves the project's overrides alone.
+            for name, value in (
+                ("description_override", rec.description),
+                ("remediation_override", rec.remediation),
+                ("references_override", rec.references),
+            ):
+                if value is not None and value != getattr(row, name):
+                    setattr(row, name, value)
             return row
         row = Finding(
+            id=uuid.uuid4(),
             project_id=project_id,
             finding_key=rec.finding_key,
             title=rec.title,
             severity=Severity(rec.severity),
-            description=rec.description,
-            remediation=rec.remediation,
-            references=rec.references,
+            description_override=rec.description,
+            remediation_override=rec.remediation,
+            references_override=rec.references,
             scanner=rec.scanner,
             scanner_id=rec.scanner_id,
         )
         session.add(row)
+        await session.flush()
+        identity.findings.ids[rec.finding_key] = row.id
         return row
 
-    async def _upsert_instance(self, session: AsyncSession, project_id: uuid.UUID, rec: InstanceRecord) -> Instance | None:
-        asset = await session.scalar(
-            select(Asset).where(Asset.project_id == project_id, Asset.ip == rec.asset_ip)
-        )
-        finding = await session.scalar(
-            select(Finding).where(Finding.project_id == project_id, Finding.finding_key == rec.finding_key)
-        )
-        if not asset or not finding:
+    async def _upsert_instance(
+        self,
+        session: AsyncSession,
+        project_id: uuid.UUID,
+        rec: InstanceRecord,
+        identity: IdentityMap,
+        touched: LastSeen,
+    ) -> Instance | None:
+        asset_id = await self._asset_id(session, project_id, rec.asset_ip, identity)
+        finding_id = await self._finding_id(session, project_id, rec.finding_key, identity)
+        if not asset_id or not finding_id:
             return None
 
         service_id = None
         if rec.service_proto and rec.service_port:
-            svc = await session.scalar(
-                select(Service).where(
-                    Service.asset_id == asset.id,
-                    Service.proto == rec.service_proto,
-                    Service.port == rec.service_port,
+            service_id = await self._service_id(session, (asset_id, rec.service_proto, rec.service_port), identity)
+
+        key = (finding_id, asset_id, service_id)
+        instance_id = identity.instance_id(key)
+        # Only the evidence digest is compared here, so the blob itself is not loaded.
+        if instance_id:
+            row = await session.get(Instance, instance_id, options=[noload(Instance.evidence)])
+        else:
+            row = await session.scalar(
+                select(Instance)
+                .options(noload(Instance.evidence))
+                .where(
+                    Instance.project_id == project_id,
+                    Instance.finding_id == finding_id,
+                    Instance.asset_id == asset_id,
+                    Instance.service_id.is_(service_id) if service_id is None else Instance.service_id == service_id,
                 )
             )
-            service_id = svc.id if svc else None
-
-        row = await session.scalar(
-            select(Instance).where(
-                Instance.project_id == project_id,
-                Instance.finding_id == finding.id,
-                Instance.asset_id == asset.id,
-                Instance.service_id.is_(service_id) if service_id is None else Instance.service_id == service_id,
-            )
-        )
         if row:
-            row.last_seen = rec.seen_at
-            if rec.evidence_snippet is not None:
-                row.evidence_snippet = truncate_evidence(rec.evidence_snippet)
+            identity.instances.ids[key] = row.id
+            sha256 = await store_evidence(session, rec.evidence_snippet)
+            if sha256 is not None and sha256 != row.evidence_sha256:
+                row.evidence_sha256 = sha256
+                row.last_seen = rec.seen_at
+            else:
+                touched.instance(key, rec.seen_at)
             return row
 
         row = Instance(
+            id=uuid.uuid4(),
             project_id=project_id,
-            finding_id=finding.id,
-            asset_id=asset.id,
+            finding_id=finding_id,
+            asset_id=asset_id,
             service_id=service_id,
             status=InstanceStatus(rec.status),
-            evidence_snippet=truncate_evidence(rec.evidence_snippet),
+            evidence_sha256=await store_evidence(session, rec.evidence_snippet),
             first_seen=rec.seen_at,
             last_seen=rec.seen_at,
         )
         session.add(row)
+        await session.flush()
+        identity.instances.ids[key] = row.id
         return row
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import re
+from pathlib import Path
+
+from app.ingest.streams import detect_compression
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# Nessus writes plugin output as escaped text, so these byte patterns only match real
+# element boundaries. A closing tag is written without whitespace.
+_HOST_TAG = re.compile(rb"<ReportHost[\s>]|</ReportHost>")
+_OVERLAP = len(b"</ReportHost>")
+
+
+def index_report_hosts(path: str | Path) -> list[tuple[int, int]]:
+    hosts: list[tuple[int, int]] = []
+    start: int | None = None
+
+    def _scan(buf: bytes, base: int, limit: int) -> None:
+        nonlocal start
+        for match in _HOST_TAG.finditer(buf):
+            if match.start() >= limit:
+                break
+            if match.group().startswith(b"</"):
+                if start is not None:
+                    hosts.append((start, base + match.end()))
+                    start = None
+            elif start is None:
+                start = base + match.start()
+
+    with open(path, "rb") as fh:
+        tail = b""
+        base = 0
+        while chunk := fh.read(CHUNK_SIZE):
+            buf = tail + chunk
+            # A tag can straddle two reads; matches starting in the last few bytes are left
+            # for the next round, which sees them whole.
+            limit = max(0, len(buf) - _OVERLAP)
+            _scan(buf, base, limit)
+            tail = buf[limit:]
+            base += limit
+        _scan(tail, base, len(tail))
+    return hosts
+
+
+# Splits an uncompressed .nessus export into runs of whole ReportHost elements of roughly
+# `shard_bytes` each. The dicts go into the job checkpoint as they are: ParserPool fills in
+# "hosts", "bytes_read" and "done" as the shard is handed over, which is what a resumed job
+# continues from.
+def plan_shards(path: str | Path, shard_bytes: int) -> list[dict]:
+    if detect_compression(path) is not None:
+        return []
+    shards: list[dict] = []
+    for start, end in index_report_hosts(path):
+        if shards and shards[-1]["end"] - shards[-1]["start"] < shard_bytes:
+            shards[-1]["end"] = end
+        else:
+            shards.append({"start": start, "end": end, "hosts": 0, "bytes_read": 0, "done": False})
+    return shards
@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import json
+import time
+import uuid
+from collections.abc import Iterable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.ingest.bulk import BulkWriter, project_finding
+from app.ingest.identity import IdentityMap
+from app.ingest.normalize import evidence_sha256, truncate_evidence
+
+STAGING_DDL = [
+    """
+    CREATE TEMP TABLE stage_assets (
+        seq bigint, ip text, primary_hostname text, hostnames text[], os_name text, seen_at timestamptz
+    ) ON COMMIT DROP
+    """,
+    """
+    CREATE TEMP TABLE stage_services (
+        seq bigint, asset_ip text, proto text, port integer, name text, product text, version text,
+        banner text, seen_at timestamptz
+    ) ON COMMIT DROP
+    """,
+    """
+    CREATE TEMP TABLE stage_findings (
+        seq bigint, finding_key text, title text, severity text, description text, remediation text,
+        refs text, scanner text, scanner_id text
+    ) ON COMMIT DROP
+    """,
+    """
+    CREATE TEMP TABLE stage_instances (
+        seq bigint, finding_key text, asset_ip text, proto text, port integer, evidence_sha256 text,
+        status text, seen_at timestamptz
+    ) ON COMMIT DROP
+    """,
+    """
+    CREATE TEMP TABLE stage_evidence (sha256 text, body text) ON COMMIT DROP
+    """,
+]
+
+MERGE_SQL = [
+    # Every flush stages the rows buffered since the last one, so a row can be staged several
+    # times. These collapse them the way BulkWriter merges rows in memory: the first primary
+    # hostname and OS, every hostname, the latest non-empty service detail and the last copy
+    # of a finding.
+    """
+    CREATE TEMP TABLE stage_assets_merged ON COMMIT DROP AS
+    SELECT s.ip,
+        (array_agg(s.primary_hostname ORDER BY s.seq) FILTER (WHERE s.primary_hostname <> ''))[1]
+            AS primary_hostname,
+        ARRAY(
+            SELECT DISTINCT h FROM stage_assets s2, unnest(s2.hostnames) AS h
+            WHERE s2.ip = s.ip ORDER BY h
+        ) AS hostnames,
+        (array_agg(s.os_name ORDER BY s.seq) FILTER (WHERE s.os_name <> ''))[1] AS os_name,
+        max(s.seen_at) AS seen_at
+    FROM stage_assets s
+    GROUP BY s.ip
+    """,
+    """
+    CREATE TEMP TABLE stage_services_merged ON COMMIT DROP AS
+    SELECT s.asset_ip, s.proto, s.port,
+        (array_agg(s.name ORDER BY s.seq DESC) FILTER (WHERE s.name <> ''))[1] AS name,
+        (array_agg(s.product ORDER BY s.seq DESC) FILTER (WHERE s.product <> ''))[1] AS product,
+        (array_agg(s.version ORDER BY s.seq DESC) FILTER (WHERE s.version <> ''))[1] AS version,
+        (array_agg(s.banner ORDER BY s.seq DESC) FILTER (WHERE s.banner <> ''))[1] AS banner,
+        max(s.seen_at) AS seen_at
+    FROM stage_services s
+    GROUP BY s.asset_ip, s.proto, s.port
+    """,
+    """
+    CREATE TEMP TABLE stage_findings_merged ON COMMIT DROP AS
+    SELECT DISTINCT ON (s.finding_key) *
+    FROM stage_findings s
+    ORDER BY s.finding_key, s.seq DESC
+    """,
+    """
+    INSERT INTO assets (project_id, ip, primary_hostname, hostnames, os_name, tags, first_seen, last_seen)
+    SELECT CAST(:project_id AS uuid), s.ip::inet, s.primary_hostname, s.hostnames, s.os_name, '{}'::text[],
+        s.seen_at, s.seen_at
+    FROM stage_assets_merged s
+    ON CONFLICT ON CONSTRAINT uq_assets_project_ip DO UPDATE SET
+        hostnames = ARRAY(SELECT DISTINCT h FROM unnest(assets.hostnames || excluded.hostnames) AS h ORDER BY h),
+        primary_hostname = COALESCE(assets.primary_hostname, excluded.primary_hostname),
+        os_name = COALESCE(assets.os_name, excluded.os_name),
+        last_seen = excluded.last_seen
+    WHERE NOT assets.hostnames @> excluded.hostnames
+        OR (assets.primary_hostname IS NULL AND excluded.primary_hostname IS NOT NULL)
+        OR (assets.os_name IS NULL AND excluded.os_name IS NOT NULL)
+    """,
+    """
+    INSERT INTO services (project_id, asset_id, proto, port, name, product, version, banner, first_seen, last_seen)
+    SELECT CAST(:project_id AS uuid), a.id, s.proto, s.port, s.name, s.product, s.version, s.banner,
+        s.seen_at, s.seen_at
+    FROM stage_services_merged s
+    JOIN assets a ON a.project_id = CAST(:project_id AS uuid) AND a.ip = s.asset_ip::inet
+    ON CONFLICT ON CONSTRAINT uq_services_asset_proto_port DO UPDATE SET
+        name = COALESCE(NULLIF(excluded.name, ''), services.name),
+        product = COALESCE(NULLIF(excluded.product, ''), services.product),
+        version = COALESCE(NULLIF(excluded.version, ''), services.version),
+        banner = COALESCE(NULLIF(excluded.banner, ''), services.banner),
+        last_seen = excluded.last_seen
+    WHERE (NULLIF(excluded.name, '') IS NOT NULL AND excluded.name IS DISTINCT FROM services.name)
+        OR (NULLIF(excluded.product, '') IS NOT NULL AND excluded.product IS DISTINCT FROM services.product)
+        OR (NULLIF(excluded.version, '') IS NOT NULL AND excluded.version IS DISTINCT FROM services.version)
+        OR (NULLIF(excluded.banner, '') IS NOT NULL AND excluded.banner IS DISTINCT FROM services.banner)
+    """,
+    """
+    INSERT INTO findings (
+        project_id, finding_key, title, severity, description_override, remediation_override,
+        references_override, scanner, scanner_id
+    )
+    SELECT CAST(:project_id AS uuid), s.finding_key, s.title, s.severity::severity_enum, s.description,
+        s.remediation, s.refs::jsonb, s.scanner, s.scanner_id
+    FROM stage_findings_merged s
+    ON CONFLICT ON CONSTRAINT uq_findings_project_key DO UPDATE SET
+        title = excluded.title,
+        severity = excluded.severity,
+        description_override = COALESCE(excluded.description_override, findings.description_override),
+        remediation_override = COALESCE(excluded.remediation_override, findings.remediation_override),
+        references_override = COALESCE(excluded.references_override, findings.references_override),
+        scanner = excluded.scanner,
+        scanner_id = excluded.scanner_id
+    WHERE (findings.title, findings.severity, findings.scanner, findings.scanner_id)
+            IS DISTINCT FROM (excluded.title, excluded.severity, excluded.scanner, excluded.scanner_id)
+        OR (excluded.description_override IS NOT NULL
+            AND excluded.description_override IS DISTINCT FROM findings.description_override)
+        OR (excluded.remediation_override IS NOT NULL
+            AND excluded.remediation_override IS DISTINCT FROM findings.remediation_override)
+        OR (excluded.references_override IS NOT NULL
+            AND excluded.references_override IS DISTINCT FROM findings.references_override)
+    """,
+    """
+    INSERT INTO evidence_blobs (sha256, body)
+    SELECT s.sha256, s.body FROM stage_evidence s
+    ORDER BY s.sha256
+    ON CONFLICT (sha256) DO NOTHING
+    """,
+    """
+    INSERT INTO instances (
+        project_id, finding_id, asset_id, service_id, status, evidence_sha256, first_seen, last_seen
+    )
+    SELECT CAST(:project_id AS uuid), f.id, a.id, sv.id,
+        ((array_agg(s.status ORDER BY s.seq))[1])::instance_status_enum,
+        (array_agg(s.evidence_sha256 ORDER BY s.seq DESC) FILTER (WHERE s.evidence_sha256 IS NOT NULL))[1],
+        min(s.seen_at), max(s.seen_at)
+    FROM stage_instances s
+    JOIN findings f ON f.project_id = CAST(:project_id AS uuid) AND f.finding_key = s.finding_key
+    JOIN assets a ON a.project_id = CAST(:project_id AS uuid) AND a.ip = s.asset_ip::inet
+    LEFT JOIN services sv ON sv.asset_id = a.id AND sv.proto = s.proto AND sv.port = s.port
+    GROUP BY f.id, a.id, sv.id
+    ON CONFLICT (
+        project_id, finding_id, asset_id, COALESCE(service_id, '00000000-0000-0000-0000-000000000000'::uuid)
+    )
+    DO UPDATE SET
+        evidence_sha256 = excluded.evidence_sha256,
+        last_seen = excluded.last_seen
+    WHERE excluded.evidence_sha256 IS NOT NULL
+        AND excluded.evidence_sha256 IS DISTINCT FROM instances.evidence_sha256
+    """,
+    # Rows the upserts above left untouched only need last_seen moved forward.
+    """
+    UPDATE assets AS t SET last_seen = s.seen_at
+    FROM stage_assets_merged s
+    WHERE t.project_id = CAST(:project_id AS uuid) AND t.ip = s.ip::inet AND t.last_seen < s.seen_at
+    """,
+    """
+    UPDATE services AS t SET last_seen = s.seen_at
+    FROM stage_services_merged s
+    JOIN assets a ON a.project_id = CAST(:project_id AS uuid) AND a.ip = s.asset_ip::inet
+    WHERE t.asset_id = a.id AND t.proto = s.proto AND t.port = s.port AND t.last_seen < s.seen_at
+    """,
+    """
+    UPDATE instances AS t SET last_seen = k.seen
+    FROM (
+        SELECT f.id AS finding_id, a.id AS asset_id, sv.id AS service_id, max(s.seen_at) AS seen
+        FROM stage_instances s
+        JOIN findings f ON f.project_id = CAST(:project_id AS uuid) AND f.finding_key = s.finding_key
+        JOIN assets a ON a.project_id = CAST(:project_id AS uuid) AND a.ip = s.asset_ip::inet
+        LEFT JOIN services sv ON sv.asset_id = a.id AND sv.proto = s.proto AND sv.port = s.port
+        GROUP BY f.id, a.id, sv.id
+    ) AS k
+    WHERE t.project_id = CAST(:project_id AS uuid)
+        AND t.finding_id = k.finding_id
+        AND t.asset_id = k.asset_id
+        AND t.service_id IS NOT DISTINCT FROM k.service_id
+        AND t.last_seen < k.seen
+    """,
+]
+
+
+# Rows are deduplicated in memory between flushes and COPYed into temp tables on every flush;
+# MERGE_SQL folds them into the real tables once, at the end. The staging tables drop on
+# commit, so the session must not commit until merge() has run.
+class StagingWriter(BulkWriter):
+    def __init__(
+        self,
+        session: AsyncSession,
+        project_id: uuid.UUID,
+        *,
+        identity: IdentityMap | None = None,
+        batch_size: int = 1000,
+        catalog: async_sessionmaker[AsyncSession] | None = None,
+    ):
+        super().__init__(session, project_id, identity=identity, batch_size=batch_size, catalog=catalog)
+        self.copy_seconds = 0.0
+        self.merge_seconds = 0.0
+        self._seq = 0
+        self._driver = None
+
+    async def _copy(self, table: str, columns: list[str], records: list[tuple]) -> None:
+        if self._driver is None:
+            for ddl in STAGING_DDL:
+                await self.session.execute(text(ddl))
+            conn = await self.session.connection()
+            raw = await conn.get_raw_connection()
+            self._driver = raw.driver_connection
+        if not records:
+            return
+        started = time.perf_counter()
+        await self._driver.copy_records_to_table(table, records=records, columns=columns)
+        self.copy_seconds += time.perf_counter() - started
+
+    # Numbers rows in arrival order, which MERGE_SQL uses to pick first or latest values.
+    def _numbered(self, rows: Iterable[tuple]) -> list[tuple]:
+        numbered = []
+        for row in rows:
+            self._seq += 1
+            numbered.append((self._seq, *row))
+        return numbered
+
+    async def flush(self) -> None:
+        await self._copy(
+            "stage_assets",
+            ["seq", "ip", "primary_hostname", "hostnames", "os_name", "seen_at"],
+            self._numbered(self.assets.values()),
+        )
+        await self._copy(
+            "stage_services",
+            ["seq", "asset_ip", "proto", "port", "name", "product", "version", "banner", "seen_at"],
+            self._numbered(self.services.values()),
+        )
+        findings = list(self.findings.values())
+        await self._flush_plugins(findings)
+        await self._copy(
+            "stage_findings",
+            [
+                "seq",
+                "finding_key",
+                "title",
+                "severity",
+                "description",
+                "remediation",
+                "refs",
+                "scanner",
+                "scanner_id",
+            ],
+            self._numbered(
+                (*row[:5], json.dumps(row[5]) if row[5] is not None else None, *row[6:])
+                for row in map(project_finding, findings)
+            ),
+        )
+        self.assets.clear()
+        self.services.clear()
+        self.findings.clear()
+
+        records = []
+        blobs: dict[str, str] = {}
+        for finding_key, ip, proto, port, evidence, status, seen_at in self.instances.values():
+            evidence = truncate_evidence(evidence)
+            sha256 = None
+            if evidence is not None:
+                sha256 = evidence_sha256(evidence)
+                blobs[sha256] = evidence
+            records.append((finding_key, ip, proto, port, sha256, status, seen_at))
+        self.instances.clear()
+        await self._copy("stage_evidence", ["sha256", "body"], await self._new_evidence(blobs))
+        await self._copy(
+            "stage_instances",
+            ["seq", "finding_key", "asset_ip", "proto", "port", "evidence_sha256", "status", "seen_at"],
+            self._numbered(records),
+        )
+
+    async def merge(self) -> None:
+        await self.flush()
+        started = time.perf_counter()
+        for table in ("stage_assets", "stage_services", "stage_findings", "stage_instances"):
+            await self.session.execute(text(f"ANALYZE {table}"))
+        for sql in MERGE_SQL:
+            await self.session.execute(text(sql), {"project_id": self.project_id})
+        self.merge_seconds += time.perf_counter() - started
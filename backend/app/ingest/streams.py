@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import contextlib
+import gzip
+import zipfile
+from collections.abc import Iterator
+from pathlib import Path
+from typing import BinaryIO
+
+MAGIC = {
+    b"\x1f\x8b": "gzip",
+    b"\x28\xb5\x2f\xfd": "zstd",
+    b"PK\x03\x04": "zip",
+}
+
+MIME_TYPES = {
+    "gzip": "application/gzip",
+    "zstd": "application/zstd",
+    "zip": "application/zip",
+}
+
+XML_SUFFIXES = (".nessus", ".xml")
+
+# Root elements, as they appear in the first few KB of an export.
+SOURCE_MARKERS = {
+    b"<nmaprun": "nmap",
+    b"<NessusClientData": "nessus",
+}
+
+
+def compression_from_header(head: bytes) -> str | None:
+    for magic, name in MAGIC.items():
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def detect_compression(path: str | Path) -> str | None:
+    with open(path, "rb") as fh:
+        return compression_from_header(fh.read(4))
+
+
+def _zip_member(archive: zipfile.ZipFile) -> zipfile.ZipInfo:
+    members = [info for info in archive.infolist() if not info.is_dir()]
+    if not members:
+        raise ValueError("zip upload contains no files")
+    for info in members:
+        if info.filename.lower().endswith(XML_SUFFIXES):
+            return info
+    return members[0]
+
+
+# Reads raw[start:end] wrapped in a synthetic root element, so a run of sibling elements cut
+# out of a larger document parses on its own.
+class ByteRangeReader:
+    def __init__(self, raw: BinaryIO, start: int, end: int, root: bytes = b"shard"):
+        raw.seek(start)
+        self._raw = raw
+        self._end = end
+        self._head = b"<" + root + b">"
+        self._tail = b"</" + root + b">"
+
+    def read(self, size: int = -1) -> bytes:
+        if self._head:
+            out, self._head = self._head, b""
+            return out
+        remaining = self._end - self._raw.tell()
+        if remaining > 0:
+            return self._raw.read(remaining if size is None or size < 0 else min(size, remaining))
+        out, self._tail = self._tail, b""
+        return out
+
+
+# Yields (stream, raw): the parser reads decompressed XML from `stream`, while `raw.tell()`
+# reports how far into the file on disk it has got, which is what progress is measured on.
+# `byte_range` restricts an uncompressed file to one shard (see app.ingest.shards).
+@contextlib.contextmanager
+def open_scan(
+    path: str | Path, byte_range: tuple[int, int] | None = None
+) -> Iterator[tuple[BinaryIO, BinaryIO]]:
+    compression = detect_compression(path)
+    with open(path, "rb") as raw:
+        if byte_range is not None:
+            if compression is not None:
+                raise ValueError("byte ranges need an uncompressed upload")
+            yield ByteRangeReader(raw, *byte_range), raw
+        elif compression is None:
+            yield raw, raw
+        elif compression == "gzip":
+            with gzip.GzipFile(fileobj=raw, mode="rb") as stream:
+                yield stream, raw
+        elif compression == "zstd":
+            try:
+                import zstandard
+            except ImportError as exc:
+                raise RuntimeError("zstd uploads require the 'zstandard' package") from exc
+            with zstandard.ZstdDecompressor().stream_reader(raw, closefd=False) as stream:
+                yield stream, raw
+        else:
+            with zipfile.ZipFile(raw) as archive, archive.open(_zip_member(archive)) as stream:
+                yield stream, raw
+
+
+def sniff_source_type(path: str | Path, head_bytes: int = 64 * 1024) -> str | None:
+    with open_scan(path) as (stream, _):
+        head = stream.read(head_bytes)
+    for marker, source_type in SOURCE_MARKERS.items():
+        if marker in head:
+            return source_type
+    return None
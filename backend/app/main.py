@@ -48,8 +48,11 @@ async def startup() -> None:
     token = load_or_create_token(config_path)
     app.state.api_token = token
 
-    runner = IngestRunner(SessionLocal, settings.data_dir)
-    await runner.start()
+    # With INGEST_EMBEDDED_WORKER=false the API only queues jobs, and a separate
+    # doghouse-worker process (app.worker) claims them from the database.
+    runner = IngestRunner.from_settings(SessionLocal, settings)
+    if settings.ingest_embedded_worker:
+        await runner.start()
     app.state.ingest_runner = runner
 
 
@@ -3,7 +3,18 @@ from __future__ import annotations
 import uuid
 from datetime import datetime
 
-from sqlalchemy import DateTime, Enum, ForeignKey, Integer, Text, UniqueConstraint, func
+from sqlalchemy import (
+    BigInteger,
+    DateTime,
+    Enum,
+    ForeignKey,
+    ForeignKeyConstraint,
+    Integer,
+    Text,
+    UniqueConstraint,
+    func,
+    text,
+)
 from sqlalchemy.dialects.postgresql import ARRAY, INET, JSONB, TSVECTOR, UUID
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -58,9 +69,36 @@ class Service(Base):
     last_seen: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
 
 
+# Scanner plugin text shared by every project; findings with the same (scanner, scanner_id)
+# read their description, remediation and references from here unless they override them.
+class PluginCatalog(Base):
+    __tablename__ = "plugin_catalog"
+
+    scanner: Mapped[str] = mapped_column(Text, primary_key=True)
+    scanner_id: Mapped[str] = mapped_column(Text, primary_key=True)
+    title: Mapped[str] = mapped_column(Text, nullable=False)
+    severity: Mapped[Severity] = mapped_column(
+        Enum(Severity, name="severity_enum", native_enum=True, create_constraint=False),
+        nullable=False,
+    )
+    description: Mapped[str | None] = mapped_column(Text)
+    remediation: Mapped[str | None] = mapped_column(Text)
+    references: Mapped[list[str] | dict] = mapped_column(JSONB, default=list)
+    search_vector: Mapped[str] = mapped_column(TSVECTOR, server_default=text("''::tsvector"))
+    search_dirty: Mapped[bool] = mapped_column(default=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
 class Finding(Base):
     __tablename__ = "findings"
-    __table_args__ = (UniqueConstraint("project_id", "finding_key", name="uq_findings_project_key"),)
+    __table_args__ = (
+        UniqueConstraint("project_id", "finding_key", name="uq_findings_project_key"),
+        ForeignKeyConstraint(
+            ["scanner", "scanner_id"],
+            ["plugin_catalog.scanner", "plugin_catalog.scanner_id"],
+            name="fk_findings_plugin_catalog",
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     project_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("projects.id", ondelete="CASCADE"))
@@ -70,16 +108,38 @@ class Finding(Base):
         Enum(Severity, name="severity_enum", native_enum=True, create_constraint=False),
         nullable=False,
     )
-    description: Mapped[str | None] = mapped_column(Text)
-    remediation: Mapped[str | None] = mapped_column(Text)
-    references: Mapped[list[str] | dict] = mapped_column(JSONB, default=list)
+    description_override: Mapped[str | None] = mapped_column(Text)
+    remediation_override: Mapped[str | None] = mapped_column(Text)
+    references_override: Mapped[list[str] | dict | None] = mapped_column(JSONB(none_as_null=True))
     scanner: Mapped[str] = mapped_column(Text, nullable=False)
     scanner_id: Mapped[str | None] = mapped_column(Text)
     tested: Mapped[bool] = mapped_column(default=False)
-    search_vector: Mapped[str] = mapped_column(TSVECTOR)
+    # Left empty on insert; the background indexer fills it in (see reindex_search_vectors).
+    search_vector: Mapped[str] = mapped_column(TSVECTOR, server_default=text("''::tsvector"))
+    search_dirty: Mapped[bool] = mapped_column(default=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
+    plugin: Mapped[PluginCatalog | None] = relationship(lazy="selectin")
+
+    @property
+    def description(self) -> str | None:
+        if self.description_override is not None or self.plugin is None:
+            return self.description_override
+        return self.plugin.description
+
+    @property
+    def remediation(self) -> str | None:
+        if self.remediation_override is not None or self.plugin is None:
+            return self.remediation_override
+        return self.plugin.remediation
+
+    @property
+    def references(self) -> list[str] | dict:
+        if self.references_override is not None:
+            return self.references_override
+        return self.plugin.references if self.plugin is not None else []
+
 
 class Instance(Base):
     __tablename__ = "instances"
@@ -100,15 +160,30 @@ class Instance(Base):
         ),
         nullable=False,
     )
-    evidence_snippet: Mapped[str | None] = mapped_column(Text)
+    evidence_sha256: Mapped[str | None] = mapped_column(ForeignKey("evidence_blobs.sha256"), nullable=True)
     analyst_note: Mapped[str | None] = mapped_column(Text)
-    search_vector: Mapped[str] = mapped_column(TSVECTOR)
     first_seen: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
     last_seen: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
 
     finding: Mapped[Finding] = relationship()
     asset: Mapped[Asset] = relationship()
     service: Mapped[Service | None] = relationship()
+    # selectin fetches each distinct blob once per query, however many instances share it.
+    evidence: Mapped[EvidenceBlob | None] = relationship(lazy="selectin")
+
+    @property
+    def evidence_snippet(self) -> str | None:
+        return self.evidence.body if self.evidence is not None else None
+
+
+class EvidenceBlob(Base):
+    __tablename__ = "evidence_blobs"
+
+    sha256: Mapped[str] = mapped_column(Text, primary_key=True)
+    body: Mapped[str] = mapped_column(Text, nullable=False)
+    search_vector: Mapped[str] = mapped_column(TSVECTOR, server_default=text("''::tsvector"))
+    search_dirty: Mapped[bool] = mapped_column(default=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 
 class Note(Base):
@@ -153,9 +228,17 @@ class IngestJob(Base):
     artifact_id: Mapped[uuid.UUID | None] = mapped_column(
         ForeignKey("artifacts.id", ondelete="SET NULL"), nullable=True
     )
+    upload_sha256: Mapped[str | None] = mapped_column(Text)
+    upload_size: Mapped[int | None] = mapped_column(BigInteger)
+    priority: Mapped[int] = mapped_column(Integer, default=0)
+    cancel_requested_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    lease_owner: Mapped[str | None] = mapped_column(Text)
+    lease_expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    heartbeat_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
 
 
 class LootCredential(Base):
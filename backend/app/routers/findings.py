@@ -62,7 +62,13 @@ async def patch_finding(
     payload: FindingPatch,
     session: AsyncSession = Depends(get_session),
 ) -> FindingOut:
-    row = await crud.patch_finding(session, finding_id, tested=payload.tested)
+    row = await crud.patch_finding(
+        session,
+        finding_id,
+        tested=payload.tested,
+        description=payload.description,
+        remediation=payload.remediation,
+    )
     if not row:
         raise HTTPException(status_code=404, detail="Finding not found")
     return FindingOut.model_validate(row)
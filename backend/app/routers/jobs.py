@@ -2,16 +2,22 @@ from __future__ import annotations
 
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.crud import get_ingest_job, list_jobs
+from app.crud import cancel_ingest_job, get_ingest_job, list_jobs
 from app.deps import get_session
-from app.schemas import IngestJobOut, PageMeta
+from app.enums import IngestStatus
+from app.schemas import IngestJobOut, IngestQueueOut, PageMeta
 
 router = APIRouter(prefix="/api")
 
 
+@router.get("/jobs/queue", response_model=IngestQueueOut)
+async def get_job_queue(request: Request, session: AsyncSession = Depends(get_session)) -> IngestQueueOut:
+    return IngestQueueOut.model_validate(await request.app.state.ingest_runner.snapshot(session))
+
+
 @router.get("/jobs/{job_id}", response_model=IngestJobOut)
 async def get_job(job_id: uuid.UUID, session: AsyncSession = Depends(get_session)) -> IngestJobOut:
     row = await get_ingest_job(session, job_id)
@@ -20,6 +26,17 @@ async def get_job(job_id: uuid.UUID, session: AsyncSession = Depends(get_session
     return IngestJobOut.model_validate(row)
 
 
+# A running job stops at its next commit; poll the job until its status is "cancelled".
+@router.post("/jobs/{job_id}/cancel", response_model=IngestJobOut)
+async def cancel_job(job_id: uuid.UUID, session: AsyncSession = Depends(get_session)) -> IngestJobOut:
+    row = await cancel_ingest_job(session, job_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if row.status in {IngestStatus.succeeded, IngestStatus.failed}:
+        raise HTTPException(status_code=409, detail=f"Job already {row.status}")
+    return IngestJobOut.model_validate(row)
+
+
 @router.get("/projects/{project_id}/jobs")
 async def get_project_jobs(
     project_id: uuid.UUID,
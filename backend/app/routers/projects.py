@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import shutil
 import uuid
 from pathlib import Path
@@ -11,6 +12,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app import crud
 from app.config import settings
 from app.deps import get_session
+from app.ingest.streams import sniff_source_type
 from app.models import Asset
 from app.schemas import (
     AssetPatch,
@@ -28,7 +30,7 @@ from app.schemas import (
     ToolOutputPreflightItem,
     ToolOutputResolutionChoice,
 )
-from app.services.artifacts import store_file_as_gzip_artifact
+from app.services.artifacts import save_upload, store_file_as_gzip_artifact, store_upload_artifact
 from app.services.artifacts import delete_artifact_if_unreferenced
 from app.services.tool_outputs import analyze_tool_output
 
@@ -54,41 +56,140 @@ async def import_scan(
     file: UploadFile = File(...),
     source_type: str = Form(...),
     store_source_file: bool = Form(False),
+    force: bool = Form(False),
+    priority: int = Form(0),
     session: AsyncSession = Depends(get_session),
 ) -> IngestJobOut:
     source_type = source_type.lower().strip()
     if source_type not in {"nmap", "nessus"}:
         raise HTTPException(status_code=400, detail="source_type must be nmap or nessus")
 
-    temp_dir = settings.data_dir / "uploads"
-    temp_dir.mkdir(parents=True, exist_ok=True)
-
-    placeholder_path = f"uploads/pending/{file.filename}"
-    job = await crud.create_ingest_job(session, project_id, source_type, file.filename, placeholder_path)
-
-    upload_dir = settings.data_dir / "uploads" / str(job.id)
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    dest = upload_dir / Path(file.filename).name
-    with dest.open("wb") as f_out:
-        shutil.copyfileobj(file.file, f_out)
-
-    job.stats = {
-        **(job.stats or {}),
-        "upload_relative_path": str(dest.relative_to(settings.data_dir)).replace("\\", "/"),
-    }
+    # The job row is only created once the upload is on disk: workers claim queued rows
+    # straight from the database.
+    job_id = uuid.uuid4()
+    dest = settings.data_dir / "uploads" / str(job_id) / Path(file.filename).name
+    # .gz/.zst/.zip uploads stay compressed on disk; the parsers decompress them as a stream.
+    upload = await asyncio.to_thread(save_upload, file.file, dest)
+    artifact_id = None
     if store_source_file:
-        artifact = await store_file_as_gzip_artifact(
+        artifact = await store_upload_artifact(
             session,
             project_id=project_id,
             data_dir=settings.data_dir,
-            source_file=dest,
+            upload=upload,
             original_name=file.filename,
         )
-        job.artifact_id = artifact.id
-    await session.commit()
-    await session.refresh(job)
+        artifact_id = artifact.id
+    # Re-uploading a file this project has already ingested is answered from the earlier job,
+    # unless the caller forces a fresh pass.
+    original = None if force else await crud.find_ingested_upload(session, project_id, upload.sha256)
+    if original is not None:
+        shutil.rmtree(dest.parent, ignore_errors=True)
+        job = await crud.create_duplicate_ingest_job(
+            session,
+            original,
+            file.filename,
+            upload_sha256=upload.sha256,
+            upload_size=upload.size,
+            artifact_id=artifact_id,
+        )
+        return IngestJobOut.model_validate(job)
+    job = await crud.create_ingest_job(
+        session,
+        project_id,
+        source_type,
+        file.filename,
+        str(dest.relative_to(settings.data_dir)).replace("\\", "/"),
+        job_id=job_id,
+        artifact_id=artifact_id,
+        upload_sha256=upload.sha256,
+        upload_size=upload.size,
+        priority=priority,
+    )
+
+    await request.app.state.ingest_runner.enqueue(job.id, job.project_id)
+    return IngestJobOut.model_validate(job)
+
+
+# Takes every scan of an engagement as one job: the files are parsed side by side and written
+# through one set of caches and buffers. source_type "auto" detects each file's format. Files
+# already ingested by an earlier import, single or batch, are marked as duplicates and not parsed.
+@router.post("/projects/{project_id}/imports/batch", response_model=IngestJobOut)
+async def import_scan_batch(
+    project_id: uuid.UUID,
+    request: Request,
+    files: list[UploadFile] = File(...),
+    source_type: str = Form("auto"),
+    store_source_file: bool = Form(False),
+    force: bool = Form(False),
+    priority: int = Form(0),
+    session: AsyncSession = Depends(get_session),
+) -> IngestJobOut:
+    source_type = source_type.lower().strip()
+    if source_type not in {"auto", "nmap", "nessus"}:
+        raise HTTPException(status_code=400, detail="source_type must be auto, nmap or nessus")
+    if not files:
+        raise HTTPException(status_code=400, detail="At least one file is required")
+
+    job_id = uuid.uuid4()
+    upload_dir = settings.data_dir / "uploads" / str(job_id)
+    uploads = []
+    for index, file in enumerate(files):
+        # Numbered subdirectories keep same-named files from different scanners apart.
+        dest = upload_dir / str(index) / Path(file.filename).name
+        upload = await asyncio.to_thread(save_upload, file.file, dest)
+        file_type = source_type
+        if file_type == "auto":
+            file_type = await asyncio.to_thread(sniff_source_type, dest)
+        uploads.append((file, upload, file_type))
+
+    unknown = [file.filename for file, _, file_type in uploads if file_type is None]
+    if unknown:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        raise HTTPException(
+            status_code=400, detail=f"Not an Nmap or Nessus export: {', '.join(unknown)}"
+        )
+
+    entries = []
+    for file, upload, file_type in uploads:
+        artifact_id = None
+        if store_source_file:
+            artifact = await store_upload_artifact(
+                session,
+                project_id=project_id,
+                data_dir=settings.data_dir,
+                upload=upload,
+                original_name=file.filename,
+            )
+            artifact_id = artifact.id
+        entry = await crud.batch_file_entry(
+            session,
+            project_id,
+            name=file.filename,
+            source_type=file_type,
+            upload_relative_path=str(upload.path.relative_to(settings.data_dir)).replace("\\", "/"),
+            upload_sha256=upload.sha256,
+            upload_size=upload.size,
+            artifact_id=artifact_id,
+            force=force,
+        )
+        if entry["status"] == "duplicate":
+            upload.path.unlink(missing_ok=True)
+        entries.append(entry)
+
+    job = await crud.create_ingest_job(
+        session,
+        project_id,
+        "batch",
+        f"{len(entries)} files",
+        str(upload_dir.relative_to(settings.data_dir)).replace("\\", "/"),
+        job_id=job_id,
+        upload_size=sum(entry["upload_size"] for entry in entries),
+        files=entries,
+        priority=priority,
+    )
 
-    await request.app.state.ingest_runner.enqueue(job.id)
+    await request.app.state.ingest_runner.enqueue(job.id, job.project_id)
     return IngestJobOut.model_validate(job)
 
 
@@ -136,6 +136,9 @@ class IngestJobOut(BaseModel):
     stats: dict
     error: str | None
     artifact_id: uuid.UUID | None
+    upload_sha256: str | None = None
+    priority: int = 0
+    cancel_requested_at: datetime | None = None
     created_at: datetime
     started_at: datetime | None
     finished_at: datetime | None
@@ -144,6 +147,19 @@ class IngestJobOut(BaseModel):
         from_attributes = True
 
 
+class IngestRunningJobOut(BaseModel):
+    project_id: uuid.UUID
+    job_id: uuid.UUID
+    lease_owner: str | None = None
+
+
+class IngestQueueOut(BaseModel):
+    workers: int
+    active_workers: int
+    queue_depth: int
+    running_jobs: list[IngestRunningJobOut]
+
+
 class InstancePatch(BaseModel):
     status: InstanceStatus | None = None
     evidence_snippet: str | None = None
@@ -170,6 +186,8 @@ class HostFindingCreate(BaseModel):
 
 class FindingPatch(BaseModel):
     tested: bool | None = None
+    description: str | None = None
+    remediation: str | None = None
 
 
 class LootCredentialCreate(BaseModel):
@@ -1,54 +1,98 @@
 from __future__ import annotations
 
+import asyncio
 import gzip
 import hashlib
 import mimetypes
 import shutil
+import time
+import uuid
+from collections.abc import Callable, Collection
+from dataclasses import dataclass
 from pathlib import Path
+from typing import BinaryIO
 
-from sqlalchemy import func, select
+from sqlalchemy import func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import Artifact, IngestJob, ToolOutput
+from app.ingest.streams import MIME_TYPES, compression_from_header
+from app.models import Artifact, DomainUserList, IngestJob, ToolOutput
+
+CHUNK_SIZE = 1024 * 1024
 
 
 def _artifact_relpath(sha256_hex: str) -> str:
     return f"artifacts/{sha256_hex[0:2]}/{sha256_hex[2:4]}/{sha256_hex}"
 
 
-def _hash_file(path: Path) -> str:
+def hash_file(path: Path) -> str:
     h = hashlib.sha256()
     with path.open("rb") as f:
-        while chunk := f.read(1024 * 1024):
+        while chunk := f.read(CHUNK_SIZE):
             h.update(chunk)
     return h.hexdigest()
 
 
+# No file name and a zero mtime in the header: the same content always compresses to the
+# same bytes.
 def gzip_copy(src: Path, dst: Path) -> int:
     dst.parent.mkdir(parents=True, exist_ok=True)
-    with src.open("rb") as f_in, gzip.open(dst, "wb") as f_out:
-        shutil.copyfileobj(f_in, f_out)
+    with src.open("rb") as f_in, dst.open("wb") as raw_out:
+        with gzip.GzipFile(filename="", fileobj=raw_out, mode="wb", mtime=0) as f_out:
+            shutil.copyfileobj(f_in, f_out, CHUNK_SIZE)
     return dst.stat().st_size
 
 
-async def store_file_as_gzip_artifact(
+def _plain_copy(src: Path, dst: Path) -> int:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(src, dst)
+    return dst.stat().st_size
+
+
+@dataclass(slots=True)
+class StoredUpload:
+    path: Path
+    size: int
+    sha256: str
+    compression: str | None
+
+
+# Reads the incoming upload exactly once, writing the raw file and its SHA-256 as it goes.
+# Blocking: run it in a thread.
+def save_upload(src: BinaryIO, dest: Path) -> StoredUpload:
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    raw_hash = hashlib.sha256()
+    size = 0
+    chunk = src.read(CHUNK_SIZE)
+    compression = compression_from_header(chunk)
+    with dest.open("wb") as out:
+        while chunk:
+            out.write(chunk)
+            raw_hash.update(chunk)
+            size += len(chunk)
+            chunk = src.read(CHUNK_SIZE)
+    return StoredUpload(path=dest, size=size, sha256=raw_hash.hexdigest(), compression=compression)
+
+
+# Artifacts are keyed on the SHA-256 of the content as it was uploaded, not of the stored
+# copy, so a hit is found before anything is written and `write` (which produces the stored
+# copy and returns its size) only runs for content not seen before.
+async def _save_artifact(
     session: AsyncSession,
     *,
     project_id,
     data_dir: Path,
-    source_file: Path,
+    sha: str,
+    mime: str,
     original_name: str,
+    write: Callable[[Path], int],
 ) -> Artifact:
-    tmp = data_dir / "tmp" / f"{source_file.name}.gz"
-    tmp.parent.mkdir(parents=True, exist_ok=True)
-    size = gzip_copy(source_file, tmp)
-    sha = _hash_file(tmp)
-
     existing = await session.scalar(select(Artifact).where(Artifact.sha256 == sha))
     if existing:
-        tmp.unlink(missing_ok=True)
         return existing
 
+    tmp = data_dir / "tmp" / f"{uuid.uuid4().hex}.artifact"
+    size = await asyncio.to_thread(write, tmp)
     rel = _artifact_relpath(sha)
     final_path = data_dir / rel
     final_path.parent.mkdir(parents=True, exist_ok=True)
@@ -58,7 +102,7 @@ async def store_file_as_gzip_artifact(
         project_id=project_id,
         sha256=sha,
         size=size,
-        mime=mimetypes.guess_type(original_name)[0] or "application/gzip",
+        mime=mime,
         original_name=original_name,
         relative_path=rel,
     )
@@ -68,6 +112,47 @@ async def store_file_as_gzip_artifact(
     return artifact
 
 
+async def store_file_as_gzip_artifact(
+    session: AsyncSession,
+    *,
+    project_id,
+    data_dir: Path,
+    source_file: Path,
+    original_name: str,
+) -> Artifact:
+    return await _save_artifact(
+        session,
+        project_id=project_id,
+        data_dir=data_dir,
+        sha=await asyncio.to_thread(hash_file, source_file),
+        mime=mimetypes.guess_type(original_name)[0] or "application/gzip",
+        original_name=original_name,
+        write=lambda tmp: gzip_copy(source_file, tmp),
+    )
+
+
+# Uploads that are already compressed are kept byte-for-byte; plain XML is gzipped. The raw
+# upload must still be on disk.
+async def store_upload_artifact(
+    session: AsyncSession,
+    *,
+    project_id,
+    data_dir: Path,
+    upload: StoredUpload,
+    original_name: str,
+) -> Artifact:
+    copy = _plain_copy if upload.compression else gzip_copy
+    return await _save_artifact(
+        session,
+        project_id=project_id,
+        data_dir=data_dir,
+        sha=upload.sha256,
+        mime=MIME_TYPES[upload.compression or "gzip"],
+        original_name=original_name,
+        write=lambda tmp: copy(upload.path, tmp),
+    )
+
+
 async def delete_artifact_if_unreferenced(
     session: AsyncSession,
     *,
@@ -81,13 +166,57 @@ async def delete_artifact_if_unreferenced(
     tool_output_refs = await session.scalar(
         select(func.count()).select_from(ToolOutput).where(ToolOutput.artifact_id == artifact_id)
     )
+    # Identical content shares one artifact, so any of these may still point at it; batch
+    # jobs record theirs per file in stats.
     ingest_refs = await session.scalar(
-        select(func.count()).select_from(IngestJob).where(IngestJob.artifact_id == artifact_id)
+        select(func.count())
+        .select_from(IngestJob)
+        .where(
+            or_(
+                IngestJob.artifact_id == artifact_id,
+                IngestJob.stats.contains({"files": [{"artifact_id": str(artifact_id)}]}),
+            )
+        )
     )
-    if int(tool_output_refs or 0) > 0 or int(ingest_refs or 0) > 0:
+    user_list_refs = await session.scalar(
+        select(func.count())
+        .select_from(DomainUserList)
+        .where(DomainUserList.artifact_id == artifact_id)
+    )
+    if int(tool_output_refs or 0) > 0 or int(ingest_refs or 0) > 0 or int(user_list_refs or 0) > 0:
         return
 
     file_path = data_dir / artifact.relative_path
     file_path.unlink(missing_ok=True)
     await session.delete(artifact)
     await session.commit()
+
+
+# Removes files under artifacts/ that no artifact row points at, such as the copies the
+# 20261017_0015 migration superseded. Files modified less than `older_than` seconds ago are
+# kept: _save_artifact moves a file into place before its row is committed.
+def remove_unreferenced_files(
+    data_dir: Path, referenced: Collection[str], *, older_than: float
+) -> list[Path]:
+    root = data_dir / "artifacts"
+    if not root.is_dir():
+        return []
+    cutoff = time.time() - older_than
+    removed = []
+    for path in root.rglob("*"):
+        if not path.is_file() or path.relative_to(data_dir).as_posix() in referenced:
+            continue
+        if path.stat().st_mtime > cutoff:
+            continue
+        path.unlink(missing_ok=True)
+        removed.append(path)
+    return removed
+
+
+async def prune_artifact_files(
+    session: AsyncSession, *, data_dir: Path, older_than: float = 3600
+) -> list[Path]:
+    referenced = set((await session.scalars(select(Artifact.relative_path))).all())
+    return await asyncio.to_thread(
+        remove_unreferenced_files, data_dir, referenced, older_than=older_than
+    )
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import signal
+
+from app.config import settings
+from app.db import SessionLocal, engine
+from app.ingest.runner import IngestRunner
+from app.logging import configure_logging
+
+log = logging.getLogger(__name__)
+
+
+# Runs the ingest loop on its own, against the same database and data directory as the API.
+# Pair it with INGEST_EMBEDDED_WORKER=false on the API; several workers can run side by side
+# since jobs are claimed through leases.
+async def run_worker() -> None:
+    settings.data_dir.mkdir(parents=True, exist_ok=True)
+    (settings.data_dir / "uploads").mkdir(parents=True, exist_ok=True)
+    (settings.data_dir / "artifacts").mkdir(parents=True, exist_ok=True)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    runner = IngestRunner.from_settings(SessionLocal, settings)
+    await runner.start()
+    log.info("ingest worker started", extra={"worker_id": runner.worker_id})
+    try:
+        await stop.wait()
+    finally:
+        # Jobs still running are abandoned mid-lease and resumed from their checkpoint by
+        # whichever worker claims them next.
+        await runner.stop()
+        await engine.dispose()
+        log.info("ingest worker stopped", extra={"worker_id": runner.worker_id})
+
+
+def main() -> None:
+    configure_logging(settings.log_level)
+    asyncio.run(run_worker())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import argparse
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+from app.ingest.pool import PARSERS
+from benchmarks.synthetic import write_scan
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status", encoding="ascii") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sample parser RSS while streaming a large scan")
+    parser.add_argument("path", type=Path, nargs="?", help="existing scan; a synthetic one is written if omitted")
+    parser.add_argument("--source-type", choices=sorted(PARSERS), default="nessus")
+    parser.add_argument("--mb", type=int, default=1024, help="size of the synthetic file")
+    parser.add_argument("--samples", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.path
+        if path is None:
+            path = Path(tmp) / f"synthetic.{args.source_type}"
+            hosts = write_scan(path, args.source_type, args.mb * 1024 * 1024)
+            print(f"synthetic {args.source_type}: {path.stat().st_size / 2**20:.0f} MiB, {hosts} hosts")
+
+        total = path.stat().st_size
+        stats: dict[str, int] = {}
+        step = total / max(1, args.samples)
+        next_sample = step
+        baseline = rss_mb()
+        started = time.perf_counter()
+        records = 0
+        print(f"{'read %':>7} {'hosts':>9} {'records':>10} {'rss MiB':>9}")
+        for _ in PARSERS[args.source_type](str(path), stats=stats):
+            records += 1
+            if stats.get("bytes_read", 0) >= next_sample:
+                next_sample += step
+                pct = 100 * stats["bytes_read"] / total
+                print(f"{pct:7.1f} {stats['hosts']:9d} {records:10d} {rss_mb():9.1f}")
+        elapsed = time.perf_counter() - started
+        print(
+            f"done: {records} records in {elapsed:.1f}s, rss {baseline:.1f} -> {rss_mb():.1f} MiB, "
+            f"peak {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from app.ingest.adapters.xmlstream import lxml_etree
+from app.ingest.pool import BATCH_PARSERS, PARSERS
+from benchmarks.synthetic import write_scan
+
+
+def run(source_type: str, path: Path, backend: str) -> tuple[int, float]:
+    started = time.perf_counter()
+    # Same path the ingest workers take: batches of row tuples, no per-record objects.
+    records = sum(len(batch) for batch in BATCH_PARSERS[source_type](str(path), xml_backend=backend))
+    return records, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare records/sec of the XML parser backends")
+    parser.add_argument("--mb", type=int, default=100, help="size of each synthetic file")
+    parser.add_argument("--source-type", choices=sorted(PARSERS), action="append")
+    args = parser.parse_args()
+
+    backends = ["stdlib"] + (["lxml"] if lxml_etree is not None else [])
+    with tempfile.TemporaryDirectory() as tmp:
+        for source_type in args.source_type or sorted(PARSERS):
+            path = Path(tmp) / f"synthetic.{source_type}"
+            hosts = write_scan(path, source_type, args.mb * 1024 * 1024)
+            print(f"{source_type}: {args.mb} MiB, {hosts} hosts")
+            for backend in backends:
+                records, elapsed = run(source_type, path, backend)
+                print(f"  {backend:>6}: {records} records in {elapsed:6.2f}s = {records / elapsed:10.0f} records/s")
+    if lxml_etree is None:
+        print("lxml is not installed; only the stdlib backend was measured")
+
+
+if __name__ == "__main__":
+    main()
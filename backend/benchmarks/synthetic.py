@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import argparse
+import ipaddress
+from pathlib import Path
+
+PLUGINS = [
+    (10267, 22, "ssh", "SSH Server Type and Version Information", "1"),
+    (19506, 0, "general", "Nessus Scan Information", "0"),
+    (42873, 443, "www", "SSL Medium Strength Cipher Suites Supported (SWEET32)", "2"),
+    (57582, 443, "www", "SSL Self-Signed Certificate", "2"),
+    (104743, 3389, "msrdp", "TLS Version 1.0 Protocol Detection", "2"),
+]
+
+FILLER = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 8
+
+
+def _nessus_host(index: int) -> str:
+    ip = str(ipaddress.IPv4Address(0x0A000000 + index))
+    items = "".join(
+        f'<ReportItem port="{port}" svc_name="{svc}" protocol="tcp" severity="{sev}" '
+        f'pluginID="{plugin_id}" pluginName="{name}" pluginFamily="General">'
+        f"<description>{FILLER}</description><solution>Upgrade.</solution>"
+        f"<see_also>https://example.invalid/{plugin_id}</see_also>"
+        f"<plugin_output>host {ip} plugin {plugin_id} {FILLER}</plugin_output></ReportItem>"
+        for plugin_id, port, svc, name, sev in PLUGINS
+    )
+    return (
+        f'<ReportHost name="{ip}"><HostProperties>'
+        f'<tag name="host-ip">{ip}</tag><tag name="host-fqdn">host{index}.corp.example</tag>'
+        f'<tag name="operating-system">Linux Kernel 5.15</tag></HostProperties>{items}</ReportHost>\n'
+    )
+
+
+def _nmap_host(index: int) -> str:
+    ip = str(ipaddress.IPv4Address(0x0A000000 + index))
+    ports = "".join(
+        f'<port protocol="tcp" portid="{port}"><state state="open"/>'
+        f'<service name="{svc}" product="{svc}d" version="1.{port}" extrainfo="{FILLER[:40]}"/></port>'
+        for _, port, svc, _, _ in PLUGINS
+        if port
+    )
+    return (
+        f'<host><status state="up"/><address addr="{ip}" addrtype="ipv4"/>'
+        f'<hostnames><hostname name="host{index}.corp.example"/></hostnames>'
+        f'<ports>{ports}</ports><os><osmatch name="Linux 5.X"/></os></host>\n'
+    )
+
+
+def write_scan(path: Path, source_type: str, target_bytes: int) -> int:
+    host = _nessus_host if source_type == "nessus" else _nmap_host
+    if source_type == "nessus":
+        head = '<?xml version="1.0" ?>\n<NessusClientData_v2><Report name="synthetic">\n'
+        tail = "</Report></NessusClientData_v2>\n"
+    else:
+        head = '<?xml version="1.0" ?>\n<nmaprun scanner="nmap">\n'
+        tail = "</nmaprun>\n"
+    hosts = 0
+    with path.open("w", encoding="utf-8") as fh:
+        fh.write(head)
+        while fh.tell() < target_bytes:
+            fh.write(host(hosts))
+            hosts += 1
+        fh.write(tail)
+    return hosts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Write a synthetic Nessus or Nmap export")
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--source-type", choices=["nessus", "nmap"], default="nessus")
+    parser.add_argument("--mb", type=int, default=1024)
+    args = parser.parse_args()
+    hosts = write_scan(args.path, args.source_type, args.mb * 1024 * 1024)
+    print(f"wrote {hosts} hosts to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
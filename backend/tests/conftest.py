@@ -1,10 +1,68 @@
 from __future__ import annotations
 
+import importlib.util
 import os
+from pathlib import Path
 
 import pytest
 
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
 
 @pytest.fixture(scope="session")
 def test_db_url() -> str | None:
-    return os.getenv("TEST_DATABASE_URL")
\ No newline at end of file
+    return os.getenv("TEST_DATABASE_URL")
+
+
+# Database tests run against TEST_DATABASE_URL, migrated to head once per session, so they see
+# the real triggers and indexes. The database is wiped first: point it at a scratch database.
+@pytest.fixture(scope="session")
+def db_url(test_db_url: str | None) -> str:
+    if not test_db_url:
+        pytest.skip("Set TEST_DATABASE_URL to run database tests.")
+    if importlib.util.find_spec("pytest_asyncio") is None:
+        pytest.skip("pytest-asyncio is not installed")
+    os.environ.setdefault("DATABASE_URL", test_db_url)
+
+    import asyncio
+
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    async def _reset() -> None:
+        engine = create_async_engine(test_db_url)
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP SCHEMA public CASCADE"))
+            await conn.execute(text("CREATE SCHEMA public"))
+        await engine.dispose()
+
+    asyncio.run(_reset())
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    config.set_main_option("sqlalchemy.url", test_db_url)
+    command.upgrade(config, "head")
+    return test_db_url
+
+
+# A sessionmaker on an emptied database, for tests that need more than one session.
+@pytest.fixture
+async def sessionmaker(db_url: str):
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    from app.models import Base
+
+    engine = create_async_engine(db_url)
+    tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    async with engine.begin() as conn:
+        await conn.execute(text(f"TRUNCATE {tables} CASCADE"))
+    yield async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    await engine.dispose()
+
+
+@pytest.fixture
+async def session(sessionmaker):
+    async with sessionmaker() as session:
+        yield session
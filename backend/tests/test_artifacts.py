@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import io
+import os
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from app.services.artifacts import (  # noqa: E402
+    gzip_copy,
+    remove_unreferenced_files,
+    save_upload,
+)
+
+
+def test_save_upload_writes_raw_file_and_hashes_it(tmp_path):
+    body = b"<NessusClientData_v2>" + b"x" * 3_000_000 + b"</NessusClientData_v2>"
+    upload = save_upload(io.BytesIO(body), tmp_path / "up" / "scan.nessus")
+    assert upload.path.read_bytes() == body
+    assert upload.size == len(body)
+    assert upload.sha256 == hashlib.sha256(body).hexdigest()
+    assert upload.compression is None
+
+
+def test_save_upload_detects_compressed_uploads(tmp_path):
+    body = gzip.compress(b"<NmapRun/>")
+    upload = save_upload(io.BytesIO(body), tmp_path / "scan.xml.gz")
+    assert upload.compression == "gzip"
+    assert upload.sha256 == hashlib.sha256(body).hexdigest()
+
+
+def test_gzip_copy_is_deterministic(tmp_path):
+    src = tmp_path / "nmap-output.txt"
+    src.write_bytes(b"PORT   STATE SERVICE\n22/tcp open  ssh\n" * 1000)
+    size = gzip_copy(src, tmp_path / "a" / "first.gz")
+    other = tmp_path / "renamed-output.txt"
+    other.write_bytes(src.read_bytes())
+    gzip_copy(other, tmp_path / "b" / "second.gz")
+    first = (tmp_path / "a" / "first.gz").read_bytes()
+    assert first == (tmp_path / "b" / "second.gz").read_bytes()
+    assert size == len(first)
+    assert gzip.decompress(first) == src.read_bytes()
+
+
+def test_remove_unreferenced_files_keeps_referenced_and_recent(tmp_path):
+    kept = tmp_path / "artifacts" / "ab" / "cd" / "abcd"
+    stale = tmp_path / "artifacts" / "ef" / "01" / "ef01"
+    recent = tmp_path / "artifacts" / "23" / "45" / "2345"
+    for path in (kept, stale, recent):
+        path.parent.mkdir(parents=True)
+        path.write_bytes(b"x")
+    for path in (kept, stale):
+        os.utime(path, (0, 0))
+    removed = remove_unreferenced_files(tmp_path, {"artifacts/ab/cd/abcd"}, older_than=3600)
+    assert removed == [stale]
+    assert kept.exists() and recent.exists() and not stale.exists()
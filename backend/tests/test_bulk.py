@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import uuid
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from app.ingest.bulk import (  # noqa: E402
+    BulkWriter,
+    LastSeen,
+    merge_asset,
+    merge_instance,
+    merge_service,
+    project_finding,
+)
+from app.ingest.normalize import (  # noqa: E402
+    AssetRecord,
+    InstanceRecord,
+    RecordBatch,
+    ServiceRecord,
+    evidence_sha256,
+    truncate_evidence,
+)
+
+T0 = datetime(2026, 1, 1, tzinfo=UTC)
+T1 = T0 + timedelta(minutes=5)
+
+
+def test_merge_asset_keeps_first_non_null_and_unions_hostnames():
+    first = AssetRecord(ip="10.0.0.1", primary_hostname=None, hostnames=["b"], os_name="Linux", seen_at=T0)
+    second = AssetRecord(ip="10.0.0.1", primary_hostname="a", hostnames=["a", "b"], os_name="Windows", seen_at=T1)
+    merged = merge_asset(first, second)
+    assert merged.primary_hostname == "a"
+    assert merged.hostnames == ["a", "b"]
+    assert merged.os_name == "Linux"
+    assert merged.seen_at == T1
+
+
+def test_merge_service_only_overwrites_with_non_empty_values():
+    first = ServiceRecord("10.0.0.1", "tcp", 22, "ssh", "OpenSSH", "9.6", None, T0)
+    second = ServiceRecord("10.0.0.1", "tcp", 22, None, "", None, "banner", T1)
+    merged = merge_service(first, second)
+    assert (merged.name, merged.product, merged.version, merged.banner) == ("ssh", "OpenSSH", "9.6", "banner")
+
+
+def test_merge_instance_keeps_last_non_null_evidence():
+    first = InstanceRecord("nessus:1", "10.0.0.1", None, None, "old", "open", T0)
+    second = InstanceRecord("nessus:1", "10.0.0.1", None, None, None, "open", T1)
+    assert merge_instance(first, second).evidence_snippet == "old"
+
+
+def test_last_seen_keeps_latest_timestamp_per_row():
+    touched = LastSeen()
+    asset_id = uuid.uuid4()
+    touched.asset(asset_id, T1)
+    touched.asset(asset_id, T0)
+    key = (uuid.uuid4(), asset_id, None)
+    touched.instance(key, T0)
+    touched.instance(key, T1)
+    assert touched.assets == {asset_id: T1}
+    assert touched.instances == {key: T1}
+
+
+def test_add_batch_merges_plain_row_tuples():
+    writer = BulkWriter(None, uuid.uuid4())
+    writer.add_batch(
+        RecordBatch(
+            assets=[("10.0.0.1", None, ["b"], None, T0), ("10.0.0.1", "a", ["a"], "Linux", T1)],
+            services=[("10.0.0.1", "tcp", 22, "ssh", None, None, None, T0)],
+            instances=[
+                ("nessus:1", "10.0.0.1", "tcp", 22, "old", "open", T0),
+                ("nessus:1", "10.0.0.1", "tcp", 22, None, "open", T1),
+            ],
+        )
+    )
+    writer.add(ServiceRecord("10.0.0.1", "tcp", 22, None, "OpenSSH", None, None, T1))
+    assert writer.assets["10.0.0.1"] == ("10.0.0.1", "a", ["a", "b"], "Linux", T1)
+    assert writer.services[("10.0.0.1", "tcp", 22)] == ("10.0.0.1", "tcp", 22, "ssh", "OpenSSH", None, None, T1)
+    assert writer.instances[("nessus:1", "10.0.0.1", "tcp", 22)].evidence_snippet == "old"
+    assert writer.pending == 3
+
+
+def test_evidence_sha256_is_hex_digest_of_utf8_text():
+    # Must match encode(sha256(convert_to(text, 'UTF8')), 'hex'), which the migration used.
+    assert evidence_sha256("") == "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855"
+    assert evidence_sha256("café") == evidence_sha256(truncate_evidence("café"))
+    assert evidence_sha256("café") != evidence_sha256("cafe")
+    assert len(evidence_sha256("x" * 100_000)) == 64
+
+
+def test_project_finding_leaves_plugin_text_to_the_catalog():
+    nessus = ("nessus:1", "Title", "high", "desc", "fix", ["cve:1"], "nessus", "1")
+    assert project_finding(nessus) == ("nessus:1", "Title", "high", None, None, None, "nessus", "1")
+    custom = ("custom:a", "Title", "low", "desc", None, [], "custom", None)
+    assert project_finding(custom) == custom
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+import uuid
+
+from app.ingest.identity import IdentityMap
+
+
+def test_identity_map_counts_hits_and_misses():
+    identity = IdentityMap()
+    asset_id = uuid.uuid4()
+    assert identity.asset_id("10.0.0.1") is None
+    identity.assets.ids["10.0.0.1"] = asset_id
+    assert identity.asset_id("10.0.0.1") == asset_id
+    assert identity.assets.missing(["10.0.0.1", "10.0.0.2"]) == ["10.0.0.2"]
+    assert identity.stats()["assets"] == {"hits": 2, "misses": 2, "size": 1}
+
+
+def test_identity_map_interns_normalized_ips():
+    identity = IdentityMap()
+    first = identity.normalize_ip(" 10.0.0.1 ")
+    assert first == "10.0.0.1"
+    assert identity.normalize_ip(" 10.0.0.1 ") is first
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import asyncio
+import uuid
+from datetime import timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import func, select, update  # noqa: E402
+
+from app import crud  # noqa: E402
+from app.enums import IngestStatus  # noqa: E402
+from app.models import IngestJob, Project  # noqa: E402
+
+SHA = "ab" * 32
+
+
+def _batch_job(
+    project_id: uuid.UUID,
+    status: str = "succeeded",
+    job_status: IngestStatus = IngestStatus.succeeded,
+) -> IngestJob:
+    files = [
+        {
+            "name": "other.xml",
+            "source_type": "nmap",
+            "upload_sha256": "cd" * 32,
+            "status": "succeeded",
+        },
+        {
+            "name": "scan.nessus",
+            "source_type": "nessus",
+            "upload_sha256": SHA,
+            "status": status,
+            "hosts": 4,
+            "findings": 12,
+            "instances": 30,
+        },
+    ]
+    return IngestJob(
+        project_id=project_id,
+        source_type="batch",
+        original_filename="2 files",
+        status=job_status,
+        stats={"files": files, "hosts": 9, "findings": 40},
+    )
+
+
+def test_ingested_upload_entry_reads_batch_file_counts():
+    entry = crud.ingested_upload_entry(_batch_job(uuid.uuid4()), SHA)
+    assert entry["source_type"] == "nessus"
+    assert (entry["hosts"], entry["findings"], entry["instances"]) == (4, 12, 30)
+
+
+def test_ingested_upload_entry_reads_single_job_stats():
+    job = IngestJob(source_type="nmap", upload_sha256=SHA, stats={"hosts": 2})
+    assert crud.ingested_upload_entry(job, SHA) == {"hosts": 2, "source_type": "nmap"}
+
+
+async def _project(session) -> Project:
+    project = Project(name="dedupe")
+    session.add(project)
+    await session.commit()
+    return project
+
+
+async def test_batch_then_batch_marks_file_as_duplicate(session):
+    project = await _project(session)
+    original = _batch_job(project.id)
+    session.add(original)
+    await session.commit()
+
+    entry = await crud.batch_file_entry(
+        session,
+        project.id,
+        name="scan.nessus",
+        source_type="nessus",
+        upload_relative_path="uploads/x/0/scan.nessus",
+        upload_sha256=SHA,
+        upload_size=10,
+    )
+    assert entry["status"] == "duplicate"
+    assert entry["duplicate_of"] == str(original.id)
+
+
+async def test_batch_then_single_reuses_batch_file(session):
+    project = await _project(session)
+    original = _batch_job(project.id)
+    session.add(original)
+    await session.commit()
+
+    found = await crud.find_ingested_upload(session, project.id, SHA)
+    assert found is not None and found.id == original.id
+    job = await crud.create_duplicate_ingest_job(
+        session, found, "scan.nessus", upload_sha256=SHA, upload_size=10
+    )
+    assert job.source_type == "nessus"
+    assert job.stats["findings"] == 12
+    assert job.upload_sha256 == SHA
+
+
+async def test_unfinished_batch_files_are_not_duplicates(session):
+    project = await _project(session)
+    session.add(_batch_job(project.id, status="running"))
+    session.add(_batch_job(project.id, job_status=IngestStatus.failed))
+    await session.commit()
+
+    assert await crud.find_ingested_upload(session, project.id, SHA) is None
+
+
+async def _queued_job(session, project_id: uuid.UUID, **kwargs) -> uuid.UUID:
+    job = await crud.create_ingest_job(
+        session, project_id, "nmap", "scan.xml", "uploads/scan.xml", upload_size=10, **kwargs
+    )
+    return job.id
+
+
+async def _claim(sessionmaker, worker_id: str, max_attempts: int = 3) -> uuid.UUID | None:
+    async with sessionmaker() as session:
+        return await crud.claim_ingest_job(
+            session, worker_id=worker_id, lease_seconds=60, max_attempts=max_attempts
+        )
+
+
+async def _expire_lease(session, job_id: uuid.UUID) -> None:
+    await session.execute(
+        update(IngestJob)
+        .where(IngestJob.id == job_id)
+        .values(lease_expires_at=func.now() - timedelta(seconds=1))
+    )
+    await session.commit()
+
+
+async def test_two_workers_claim_different_jobs(sessionmaker, session):
+    jobs = {await _queued_job(session, (await _project(session)).id) for _ in range(2)}
+
+    claimed = await asyncio.gather(_claim(sessionmaker, "a"), _claim(sessionmaker, "b"))
+
+    assert set(claimed) == jobs
+    rows = (await session.scalars(select(IngestJob).execution_options(populate_existing=True))).all()
+    assert {(row.id, row.lease_owner) for row in rows} == set(zip(claimed, ["a", "b"], strict=True))
+    assert all(row.status == IngestStatus.running and row.attempts == 1 for row in rows)
+
+
+async def test_expired_lease_is_reclaimed_by_another_worker(sessionmaker, session):
+    job_id = await _queued_job(session, (await _project(session)).id)
+    assert await _claim(sessionmaker, "a") == job_id
+    assert await _claim(sessionmaker, "b") is None
+
+    await _expire_lease(session, job_id)
+    assert await _claim(sessionmaker, "b") == job_id
+
+    job = await session.get(IngestJob, job_id, populate_existing=True)
+    assert (job.lease_owner, job.attempts) == ("b", 2)
+    # The first worker finds out at its next heartbeat.
+    assert not await crud.renew_ingest_job_lease(session, job_id, worker_id="a", lease_seconds=60)
+    assert await crud.renew_ingest_job_lease(session, job_id, worker_id="b", lease_seconds=60)
+
+
+async def test_expired_lease_fails_the_job_after_max_attempts(sessionmaker, session):
+    job_id = await _queued_job(session, (await _project(session)).id)
+    assert await _claim(sessionmaker, "a", max_attempts=1) == job_id
+    await _expire_lease(session, job_id)
+
+    assert await _claim(sessionmaker, "b", max_attempts=1) is None
+    job = await session.get(IngestJob, job_id, populate_existing=True)
+    assert job.status == IngestStatus.failed
+
+
+async def test_second_job_in_a_running_project_waits(sessionmaker, session):
+    project = await _project(session)
+    first = await _queued_job(session, project.id, priority=1)
+    second = await _queued_job(session, project.id)
+    other = await _queued_job(session, (await _project(session)).id)
+
+    assert await _claim(sessionmaker, "a") == first
+    # The other project's job is free to run; the project's second job is not.
+    assert await _claim(sessionmaker, "b") == other
+    assert await _claim(sessionmaker, "c") is None
+
+    await crud.update_job_status(session, first, status=IngestStatus.succeeded)
+    assert await _claim(sessionmaker, "c") == second
+
+
+async def _cli_job(session, project_id: uuid.UUID) -> IngestJob | None:
+    return await crud.create_claimed_ingest_job(
+        session, project_id, "batch", "1 files", "/scans", worker_id="cli", lease_seconds=60
+    )
+
+
+async def test_cli_job_waits_for_the_running_job_in_its_project(sessionmaker, session):
+    project = await _project(session)
+    first = await _queued_job(session, project.id)
+    assert await _claim(sessionmaker, "a") == first
+
+    assert await _cli_job(session, project.id) is None
+    assert await session.scalar(select(func.count()).select_from(IngestJob)) == 1
+
+    await crud.update_job_status(session, first, status=IngestStatus.succeeded)
+    job = await _cli_job(session, project.id)
+    assert (job.status, job.lease_owner, job.attempts) == (IngestStatus.running, "cli", 1)
+    # It now blocks the project for workers in turn.
+    await _queued_job(session, project.id)
+    assert await _claim(sessionmaker, "a") is None
@@ -1,11 +1,18 @@
 from __future__ import annotations
 
+import gzip
+import io
+import zipfile
 from pathlib import Path
 
 import pytest
 
-from app.ingest.adapters.nessus import parse_nessus_xml
+from app.ingest import shards as shards_mod
+from app.ingest.adapters.nessus import iter_nessus_batches, parse_nessus_xml
 from app.ingest.adapters.nmap import parse_nmap_xml
+from app.ingest.adapters.xmlstream import iter_elements
+from app.ingest.normalize import AssetRecord, FindingRecord, InstanceRecord
+from app.ingest.streams import sniff_source_type
 
 
 @pytest.fixture
@@ -27,4 +34,105 @@ def test_parse_nmap(sample_path):
 def test_parse_nessus(sample_path):
     rows = list(parse_nessus_xml(str(sample_path("nessus_sample.xml"))))
     assert any(getattr(r, "finding_key", "").startswith("nessus:10267") for r in rows)
-    assert any(getattr(r, "asset_ip", None) == "192.168.1.20" for r in rows)
\ No newline at end of file
+    assert any(getattr(r, "asset_ip", None) == "192.168.1.20" for r in rows)
+
+
+def test_parse_nessus_emits_each_finding_once(sample_path):
+    stats: dict[str, int] = {}
+    rows = list(parse_nessus_xml(str(sample_path("nessus_multi_host.xml")), stats=stats))
+    finding_keys = [r.finding_key for r in rows if isinstance(r, FindingRecord)]
+    instances = [r for r in rows if isinstance(r, InstanceRecord)]
+    assert sorted(finding_keys) == ["nessus:10267", "nessus:19506", "nessus:42873"]
+    assert sum(1 for r in instances if r.finding_key == "nessus:10267") == 3
+    assert stats["duplicate_findings_suppressed"] == 2
+
+
+def test_parse_nessus_resumes_after_committed_hosts(sample_path):
+    path = sample_path("nessus_multi_host.xml")
+    stats: dict[str, int] = {}
+    rows = list(parse_nessus_xml(str(path), stats=stats, skip_hosts=2))
+    assert [r.ip for r in rows if isinstance(r, AssetRecord)] == ["192.168.1.22"]
+    assert stats["hosts"] == 3
+    assert stats["bytes_read"] == path.stat().st_size
+
+
+def test_parse_compressed_uploads(sample_path, tmp_path):
+    raw = sample_path("nessus_multi_host.xml")
+    expected = [r for r in parse_nessus_xml(str(raw)) if not hasattr(r, "seen_at")]
+
+    gz = tmp_path / "scan.nessus.gz"
+    gz.write_bytes(gzip.compress(raw.read_bytes()))
+    archive = tmp_path / "scan.zip"
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.write(raw, "export/scan.nessus")
+
+    for path in (gz, archive):
+        stats: dict[str, int] = {}
+        rows = list(parse_nessus_xml(str(path), stats=stats))
+        assert [r for r in rows if not hasattr(r, "seen_at")] == expected
+        assert stats["hosts"] == 3
+        assert 0 < stats["bytes_read"] <= path.stat().st_size
+
+
+def test_nessus_shards_cover_every_host(sample_path, monkeypatch):
+    path = sample_path("nessus_multi_host.xml")
+    data = path.read_bytes()
+    # Tiny reads make tags straddle chunk boundaries.
+    monkeypatch.setattr(shards_mod, "CHUNK_SIZE", 7)
+    hosts = shards_mod.index_report_hosts(path)
+    assert len(hosts) == 3
+    assert all(data[s:e].startswith(b"<ReportHost ") and data[s:e].endswith(b"</ReportHost>") for s, e in hosts)
+
+    shards = shards_mod.plan_shards(path, shard_bytes=1)
+    assert [(s["start"], s["end"]) for s in shards] == hosts
+    assert shards_mod.plan_shards(path, shard_bytes=len(data))[0]["end"] == hosts[-1][1]
+
+    expected = [r.ip for r in parse_nessus_xml(str(path)) if isinstance(r, AssetRecord)]
+    sharded = [
+        row[0]
+        for s in shards
+        for batch in iter_nessus_batches(str(path), byte_range=(s["start"], s["end"]))
+        for row in batch.assets
+    ]
+    assert sharded == expected
+
+
+def test_sniff_source_type(sample_path, tmp_path):
+    gz = tmp_path / "scan.gz"
+    gz.write_bytes(gzip.compress(sample_path("nmap_sample.xml").read_bytes()))
+    other = tmp_path / "notes.xml"
+    other.write_bytes(b"<?xml version='1.0'?><notes/>")
+    assert sniff_source_type(sample_path("nessus_multi_host.xml")) == "nessus"
+    assert sniff_source_type(gz) == "nmap"
+    assert sniff_source_type(other) is None
+
+
+def test_iter_elements_detaches_processed_hosts():
+    source = io.BytesIO(
+        b"<Root><Policy><p>x</p></Policy><Report>"
+        b"<ReportHost name='a'><ReportItem/></ReportHost><ReportHost name='b'/></Report></Root>"
+    )
+    stream = iter_elements(source, "ReportHost")
+    first = next(stream)
+    assert (first.attrib["name"], len(first)) == ("a", 1)
+    second = next(stream)
+    assert second.attrib["name"] == "b"
+    # The first host was cleared once the consumer moved on.
+    assert len(first) == 0 and not first.attrib
+    assert list(stream) == []
+
+
+@pytest.mark.parametrize(
+    ("parser", "name"),
+    [(parse_nessus_xml, "nessus_multi_host.xml"), (parse_nmap_xml, "nmap_sample.xml")],
+)
+def test_xml_backends_produce_identical_records(sample_path, parser, name):
+    pytest.importorskip("lxml")
+
+    def records(backend):
+        return [
+            r._replace(seen_at=None) if hasattr(r, "seen_at") else r
+            for r in parser(str(sample_path(name)), xml_backend=backend)
+        ]
+
+    assert records("lxml") == records("stdlib")
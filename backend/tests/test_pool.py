@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+from app.ingest.adapters.nessus import parse_nessus_xml
+from app.ingest.normalize import AssetRecord, InstanceRecord, RecordBatch
+from app.ingest.pool import ParserPool
+from app.ingest.shards import plan_shards
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def _collect(pool: ParserPool, source_type: str, path: Path, batch_size: int) -> list[RecordBatch]:
+    async def _run() -> list[RecordBatch]:
+        return [batch async for batch in pool.stream(source_type, str(path), batch_size=batch_size)]
+
+    return asyncio.run(_run())
+
+
+def test_parser_pool_streams_same_records_in_batches():
+    pool = ParserPool(processes=1, queue_size=1)
+    pool.start()
+    try:
+        batches = _collect(pool, "nessus", FIXTURES / "nessus_sample.xml", batch_size=2)
+    finally:
+        pool.stop()
+
+    expected = list(parse_nessus_xml(str(FIXTURES / "nessus_sample.xml")))
+    streamed = [rec for batch in batches for rec in batch.records()]
+    # Batches are cut at the first host boundary past batch_size.
+    assert all(len(batch) >= 2 for batch in batches[:-1])
+    assert [type(r) for r in streamed] == [type(r) for r in expected]
+    assert [getattr(r, "finding_key", None) for r in streamed] == [getattr(r, "finding_key", None) for r in expected]
+
+
+def test_parser_pool_parses_shards_in_parallel():
+    path = FIXTURES / "nessus_multi_host.xml"
+    shards = plan_shards(path, shard_bytes=1)
+    stats: dict = {}
+
+    async def _run() -> list[RecordBatch]:
+        return [b async for b in pool.stream_shards("nessus", str(path), shards, stats=stats)]
+
+    pool = ParserPool(processes=2, queue_size=4)
+    pool.start()
+    try:
+        batches = asyncio.run(_run())
+    finally:
+        pool.stop()
+
+    expected = list(parse_nessus_xml(str(path)))
+    streamed = [rec for batch in batches for rec in batch.records()]
+    assert sorted(r.ip for r in streamed if isinstance(r, AssetRecord)) == sorted(
+        r.ip for r in expected if isinstance(r, AssetRecord)
+    )
+    instances = sorted(r.asset_ip for r in streamed if isinstance(r, InstanceRecord))
+    assert instances == sorted(r.asset_ip for r in expected if isinstance(r, InstanceRecord))
+    assert all(s["done"] for s in shards)
+    assert stats["hosts"] == 3 and stats["shards"] == 3
+
+
+def test_parser_pool_streams_several_files_as_parts():
+    parts = [
+        ("nmap", str(FIXTURES / "nmap_sample.xml"), None),
+        ("nessus", str(FIXTURES / "nessus_multi_host.xml"), None),
+    ]
+    state: list[dict] = [{}, {}]
+
+    async def _run() -> list[tuple[int, RecordBatch]]:
+        return [item async for item in pool.stream_parts(parts, state)]
+
+    pool = ParserPool(processes=2, queue_size=4)
+    pool.start()
+    try:
+        items = asyncio.run(_run())
+    finally:
+        pool.stop()
+
+    assert {index for index, batch in items if batch} == {0, 1}
+    assert all(entry["done"] for entry in state)
+    assert state[1]["hosts"] == 3
+    assert state[1]["bytes_read"] == (FIXTURES / "nessus_multi_host.xml").stat().st_size
+
+
+def test_parser_pool_starts_on_first_parse():
+    parts = [("nmap", str(FIXTURES / "nmap_sample.xml"), None)]
+
+    async def _run(state: list[dict]) -> list[tuple[int, RecordBatch]]:
+        return [item async for item in pool.stream_parts(parts, state)]
+
+    pool = ParserPool(processes=1, queue_size=1)
+    try:
+        # Nothing left to parse, e.g. a batch of duplicate files: no processes are spawned.
+        assert asyncio.run(_run([{"done": True}])) == []
+        assert pool._executor is None
+        assert asyncio.run(_run([{}]))
+        assert pool._executor is not None
+    finally:
+        pool.stop()
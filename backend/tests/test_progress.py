@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from app.ingest.progress import IngestProgress
+
+
+def test_progress_tracks_bytes_consumed():
+    progress = IngestProgress(1000, start_bytes=200, start_hosts=4)
+    progress.records = 50
+    counters = {"bytes_read": 600, "hosts": 10}
+    assert progress.update(counters) == 60
+    assert counters["upload_bytes"] == 1000
+    assert counters["records_per_sec"] > 0
+    assert counters["hosts_per_sec"] > 0
+    assert counters["eta_seconds"] is not None
+
+
+def test_progress_is_capped_until_the_job_finishes():
+    progress = IngestProgress(1000)
+    assert progress.percent(0) == 1
+    assert progress.percent(1000) == 99
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import asyncio
+import shutil
+import uuid
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import select  # noqa: E402
+
+from app import crud  # noqa: E402
+from app.enums import IngestStatus  # noqa: E402
+from app.models import (  # noqa: E402
+    Asset,
+    EvidenceBlob,
+    Finding,
+    IngestJob,
+    Instance,
+    PluginCatalog,
+    Project,
+    Service,
+)
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+class Crash(Exception):
+    pass
+
+
+# app.ingest.runner reads the settings on import, which needs the DATABASE_URL that db_url sets.
+@pytest.fixture
+async def runner(sessionmaker, tmp_path):
+    from app.ingest.runner import IngestRunner
+
+    # One host per batch and per commit.
+    runner = IngestRunner(sessionmaker, tmp_path, batch_size=1, parse_processes=2, shard_threshold_bytes=0)
+    yield runner
+    runner.parsers.stop()
+
+
+async def _nessus_job(runner, session, fixture: str = "nessus_multi_host.xml") -> IngestJob:
+    upload = runner.data_dir / "uploads" / fixture
+    upload.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(FIXTURES / fixture, upload)
+    project = Project(name=f"runner-{uuid.uuid4().hex[:8]}")
+    session.add(project)
+    await session.commit()
+    return await crud.create_ingest_job(
+        session,
+        project.id,
+        "nessus",
+        fixture,
+        f"uploads/{fixture}",
+        upload_size=upload.stat().st_size,
+    )
+
+
+async def _rows(session, project_id: uuid.UUID) -> dict:
+    assets = await session.scalars(select(Asset.ip).where(Asset.project_id == project_id))
+    services = await session.execute(
+        select(Asset.ip, Service.proto, Service.port)
+        .join(Asset, Asset.id == Service.asset_id)
+        .where(Service.project_id == project_id)
+    )
+    findings = await session.scalars(select(Finding.finding_key).where(Finding.project_id == project_id))
+    instances = await session.execute(
+        select(Finding.finding_key, Asset.ip, Service.port)
+        .select_from(Instance)
+        .join(Finding, Finding.id == Instance.finding_id)
+        .join(Asset, Asset.id == Instance.asset_id)
+        .outerjoin(Service, Service.id == Instance.service_id)
+        .where(Instance.project_id == project_id)
+    )
+    return {
+        "assets": sorted(str(ip) for ip in assets),
+        "services": sorted((str(ip), proto, port) for ip, proto, port in services),
+        "findings": sorted(findings),
+        "instances": sorted((key, str(ip), port or 0) for key, ip, port in instances),
+    }
+
+
+async def test_resumed_job_neither_duplicates_nor_drops_rows(runner, session, monkeypatch):
+    import app.ingest.runner as runner_module
+
+    clean = await _nessus_job(runner, session)
+    await runner._process_job(clean.id)
+
+    job = await _nessus_job(runner, session)
+    update_job_status = runner_module.update_job_status
+    checkpoints = []
+
+    # Dies right after the second batch and its checkpoint are committed.
+    async def crash_after_checkpoint(session, job_id, **values):
+        await update_job_status(session, job_id, **values)
+        if "checkpoint" in (values.get("stats") or {}):
+            checkpoints.append(values["stats"])
+            if len(checkpoints) == 2:
+                raise Crash
+
+    monkeypatch.setattr(runner_module, "update_job_status", crash_after_checkpoint)
+    with pytest.raises(Crash):
+        await runner._process_job(job.id)
+    monkeypatch.setattr(runner_module, "update_job_status", update_job_status)
+
+    interrupted = await session.get(IngestJob, job.id, populate_existing=True)
+    assert interrupted.stats["checkpoint"]["hosts"] == 2
+    assert len((await _rows(session, job.project_id))["assets"]) == 2
+
+    await runner._process_job(job.id)
+
+    resumed = await session.get(IngestJob, job.id, populate_existing=True)
+    expected = await session.get(IngestJob, clean.id, populate_existing=True)
+    assert resumed.status == IngestStatus.succeeded
+    assert resumed.stats["resumed"] == 1
+    assert await _rows(session, job.project_id) == await _rows(session, clean.project_id)
+    for key in ("hosts", "assets", "services", "instances"):
+        assert resumed.stats[key] == expected.stats[key]
+    # Duplicates counted before the crash are carried over.
+    suppressed = checkpoints[-1].get("duplicate_findings_suppressed", 0)
+    assert suppressed > 0
+    assert resumed.stats["duplicate_findings_suppressed"] >= suppressed
+
+
+async def _dirty(session, project_id: uuid.UUID) -> dict:
+    findings = await session.scalars(
+        select(Finding.search_dirty).where(Finding.project_id == project_id)
+    )
+    plugins = await session.scalars(select(PluginCatalog.search_dirty))
+    blobs = await session.scalars(select(EvidenceBlob.search_dirty))
+    return {"findings": set(findings), "plugins": set(plugins), "evidence": set(blobs)}
+
+
+async def _search(session, project_id: uuid.UUID, q: str) -> list[str]:
+    _, findings = await crud.list_findings(
+        session, project_id, 50, 0, None, None, None, q, "title", "asc"
+    )
+    return [finding.finding_key for finding in findings]
+
+
+async def test_ingest_defers_search_indexing_to_reindex(runner, session):
+    job = await _nessus_job(runner, session)
+    await runner._process_job(job.id)
+
+    # The import only flags rows; nothing is searchable until the indexer catches up.
+    assert await _dirty(session, job.project_id) == {
+        "findings": {True},
+        "plugins": {True},
+        "evidence": {True},
+    }
+    assert await _search(session, job.project_id, "banner") == []
+
+    assert await runner.reindex() > 0
+
+    assert await _dirty(session, job.project_id) == {
+        "findings": {False},
+        "plugins": {False},
+        "evidence": {False},
+    }
+    assert await _search(session, job.project_id, "banner") == ["nessus:10267"]
+    assert await _search(session, job.project_id, "ciphers") == ["nessus:42873"]
+    assert await runner.reindex() == 0
+
+
+@pytest.mark.parametrize("mode", ["bulk", "copy", "row"])
+async def test_concurrent_jobs_share_catalog_plugins(runner, session, mode):
+    runner.mode = "row" if mode == "row" else "bulk"
+    if mode == "copy":
+        runner.copy_threshold_bytes = 0
+    # Two projects importing the same plugins at once, as parallel workers would.
+    jobs = [await _nessus_job(runner, session) for _ in range(2)]
+
+    await asyncio.wait_for(asyncio.gather(*(runner._process_job(job.id) for job in jobs)), timeout=60)
+
+    for job in jobs:
+        job = await session.get(IngestJob, job.id, populate_existing=True)
+        assert (job.status, job.stats["ingest_mode"]) == (IngestStatus.succeeded, mode)
+    plugins = await session.scalars(select(PluginCatalog.scanner_id).order_by(PluginCatalog.scanner_id))
+    assert list(plugins) == ["10267", "19506", "42873"]
+    assert await _rows(session, jobs[0].project_id) == await _rows(session, jobs[1].project_id)
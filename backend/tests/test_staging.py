@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import select  # noqa: E402
+
+from app.ingest.bulk import BulkWriter  # noqa: E402
+from app.ingest.normalize import RecordBatch  # noqa: E402
+from app.ingest.staging import StagingWriter  # noqa: E402
+from app.models import Asset, Finding, Instance, Project, Service  # noqa: E402
+
+T0 = datetime(2026, 1, 1, tzinfo=UTC)
+T1 = T0 + timedelta(minutes=5)
+T2 = T1 + timedelta(minutes=5)
+
+BATCHES = [
+    RecordBatch(
+        assets=[("10.0.0.1", None, ["b"], None, T0)],
+        services=[("10.0.0.1", "tcp", 22, "ssh", None, None, None, T0)],
+        findings=[("nessus:1", "Old title", "low", "desc", "fix", ["cve:1"], "nessus", "1")],
+        instances=[("nessus:1", "10.0.0.1", "tcp", 22, "old", "open", T0)],
+    ),
+    RecordBatch(
+        assets=[("10.0.0.1", "a", ["a"], "Linux", T1), ("10.0.0.2", None, [], None, T1)],
+        services=[("10.0.0.1", "tcp", 22, "", "OpenSSH", None, None, T1)],
+        findings=[
+            ("nessus:1", "New title", "high", "desc", "fix", ["cve:1"], "nessus", "1"),
+            ("custom:a", "Manual", "medium", "text", None, [], "custom", None),
+        ],
+        instances=[
+            ("nessus:1", "10.0.0.1", "tcp", 22, None, "open", T1),
+            ("custom:a", "10.0.0.2", None, None, None, "open", T1),
+        ],
+    ),
+    RecordBatch(instances=[("nessus:1", "10.0.0.1", "tcp", 22, "new", "open", T2)]),
+]
+
+
+async def _project(session) -> Project:
+    project = Project(name="staging")
+    session.add(project)
+    await session.commit()
+    return project
+
+
+async def _snapshot(session, project_id) -> dict:
+    assets = await session.execute(
+        select(Asset.ip, Asset.primary_hostname, Asset.hostnames, Asset.os_name, Asset.last_seen)
+        .where(Asset.project_id == project_id)
+        .order_by(Asset.ip)
+    )
+    services = await session.execute(
+        select(
+            Asset.ip,
+            Service.proto,
+            Service.port,
+            Service.name,
+            Service.product,
+            Service.version,
+            Service.banner,
+            Service.last_seen,
+        )
+        .join(Asset, Asset.id == Service.asset_id)
+        .where(Service.project_id == project_id)
+        .order_by(Asset.ip, Service.port)
+    )
+    findings = await session.execute(
+        select(
+            Finding.finding_key,
+            Finding.title,
+            Finding.severity,
+            Finding.description_override,
+            Finding.references_override,
+            Finding.scanner_id,
+        )
+        .where(Finding.project_id == project_id)
+        .order_by(Finding.finding_key)
+    )
+    instances = await session.execute(
+        select(
+            Finding.finding_key,
+            Asset.ip,
+            Instance.evidence_sha256,
+            Instance.first_seen,
+            Instance.last_seen,
+        )
+        .join(Finding, Finding.id == Instance.finding_id)
+        .join(Asset, Asset.id == Instance.asset_id)
+        .where(Instance.project_id == project_id)
+        .order_by(Finding.finding_key)
+    )
+    return {
+        "assets": [tuple(row) for row in assets],
+        "services": [tuple(row) for row in services],
+        "findings": [tuple(row) for row in findings],
+        "instances": [tuple(row) for row in instances],
+    }
+
+
+async def test_staged_flushes_merge_like_bulk_writes(sessionmaker):
+    async with sessionmaker() as session:
+        bulk_project = await _project(session)
+        writer = BulkWriter(session, bulk_project.id)
+        for batch in BATCHES:
+            writer.add_batch(batch)
+            await writer.sync()
+        await session.commit()
+        expected = await _snapshot(session, bulk_project.id)
+
+    async with sessionmaker() as session:
+        staged_project = await _project(session)
+        async with sessionmaker() as staging:
+            writer = StagingWriter(staging, staged_project.id)
+            # One flush per batch, so every row is staged more than once.
+            for batch in BATCHES:
+                writer.add_batch(batch)
+                await writer.flush()
+            await writer.merge()
+            await staging.commit()
+        staged = await _snapshot(session, staged_project.id)
+
+    assert staged == expected
+    assert expected["assets"][0][1:4] == ("a", ["a", "b"], "Linux")
+    assert expected["services"][0][3:5] == ("ssh", "OpenSSH")
+    assert expected["findings"][1][1] == "New title"
+    assert expected["instances"][1][2:] == (staged["instances"][1][2], T0, T2)
+
+
+async def test_nmap_only_batches_flush_mid_job(sessionmaker):
+    async with sessionmaker() as session:
+        project = await _project(session)
+    hosts = [f"10.0.1.{n}" for n in range(1, 6)]
+    async with sessionmaker() as staging:
+        writer = StagingWriter(staging, project.id, batch_size=2)
+        flushes = 0
+        for ip in hosts:
+            writer.add_batch(
+                RecordBatch(
+                    assets=[(ip, None, [], None, T0)],
+                    services=[(ip, "tcp", 80, "http", None, None, None, T0)],
+                )
+            )
+            if writer.full:
+                await writer.flush()
+                flushes += 1
+                assert writer.pending == 0
+        await writer.merge()
+        await staging.commit()
+
+    assert flushes == len(hosts)
+    async with sessionmaker() as session:
+        snapshot = await _snapshot(session, project.id)
+    assert [str(row[0]) for row in snapshot["assets"]] == hosts
+    assert len(snapshot["services"]) == len(hosts)